@@ -0,0 +1,22 @@
+"""Add time-to-first-token to ia_logs."""
+
+import os
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0003_ia_logs_ttft"
+down_revision = "0002_create_core_tables"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+
+
+def upgrade() -> None:
+    op.add_column("ia_logs", sa.Column("ttft_ms", sa.Integer()), schema=SCHEMA)
+
+
+def downgrade() -> None:
+    op.drop_column("ia_logs", "ttft_ms", schema=SCHEMA)
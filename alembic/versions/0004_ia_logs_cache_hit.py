@@ -0,0 +1,22 @@
+"""Add cache_hit flag to ia_logs."""
+
+import os
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0004_ia_logs_cache_hit"
+down_revision = "0003_ia_logs_ttft"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+
+
+def upgrade() -> None:
+    op.add_column("ia_logs", sa.Column("cache_hit", sa.Boolean()), schema=SCHEMA)
+
+
+def downgrade() -> None:
+    op.drop_column("ia_logs", "cache_hit", schema=SCHEMA)
@@ -0,0 +1,64 @@
+"""NOTIFY on technician_mapping changes for cache invalidation."""
+
+import os
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0005_technician_mapping_notify"
+down_revision = "0004_ia_logs_cache_hit"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+CHANNEL = "copilot_technician_mapping"
+
+
+def upgrade() -> None:
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION "{SCHEMA}".notify_technician_mapping() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM pg_notify('{CHANNEL}', OLD.user_upn);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND (TG_OP = 'INSERT' OR NEW.user_upn IS DISTINCT FROM OLD.user_upn) THEN
+                PERFORM pg_notify('{CHANNEL}', NEW.user_upn);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER technician_mapping_notify
+        AFTER INSERT OR UPDATE OR DELETE ON "{SCHEMA}".technician_mapping
+        FOR EACH ROW EXECUTE FUNCTION "{SCHEMA}".notify_technician_mapping()
+        """
+    )
+    # TRUNCATE no dispara triggers por fila: payload vacío = invalidar todo.
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION "{SCHEMA}".notify_technician_mapping_truncate() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{CHANNEL}', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER technician_mapping_notify_truncate
+        AFTER TRUNCATE ON "{SCHEMA}".technician_mapping
+        FOR EACH STATEMENT EXECUTE FUNCTION "{SCHEMA}".notify_technician_mapping_truncate()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(f'DROP TRIGGER IF EXISTS technician_mapping_notify_truncate ON "{SCHEMA}".technician_mapping')
+    op.execute(f'DROP TRIGGER IF EXISTS technician_mapping_notify ON "{SCHEMA}".technician_mapping')
+    op.execute(f'DROP FUNCTION IF EXISTS "{SCHEMA}".notify_technician_mapping_truncate()')
+    op.execute(f'DROP FUNCTION IF EXISTS "{SCHEMA}".notify_technician_mapping()')
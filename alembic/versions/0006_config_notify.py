@@ -0,0 +1,42 @@
+"""NOTIFY on settings / persona_config / org_profile changes."""
+
+import os
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0006_config_notify"
+down_revision = "0005_technician_mapping_notify"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+CHANNEL = "copilot_config"
+TABLES = ("settings", "persona_config", "org_profile")
+
+
+def upgrade() -> None:
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION "{SCHEMA}".notify_config_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{CHANNEL}', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for table in TABLES:
+        op.execute(
+            f"""
+            CREATE TRIGGER {table}_config_notify
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "{SCHEMA}".{table}
+            FOR EACH STATEMENT EXECUTE FUNCTION "{SCHEMA}".notify_config_change()
+            """
+        )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_config_notify ON "{SCHEMA}".{table}')
+    op.execute(f'DROP FUNCTION IF EXISTS "{SCHEMA}".notify_config_change()')
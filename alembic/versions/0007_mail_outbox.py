@@ -0,0 +1,58 @@
+"""Create mail_outbox table."""
+
+import os
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0007_mail_outbox"
+down_revision = "0006_config_notify"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mail_outbox",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("idempotency_key", sa.String(), nullable=False, unique=True),
+        sa.Column("ticket_id", sa.String()),
+        sa.Column("requested_by", sa.String()),
+        sa.Column("to_addresses", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("subject", sa.Text(), nullable=False),
+        sa.Column("plain_body", sa.Text(), nullable=False),
+        sa.Column("html_body", sa.Text()),
+        sa.Column("status", sa.String(), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("last_error", sa.Text()),
+        sa.Column("sent_at", sa.DateTime(timezone=True)),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+            onupdate=sa.text("now()"),
+        ),
+        schema=SCHEMA,
+    )
+    op.create_index("ix_mail_outbox_ticket_id", "mail_outbox", ["ticket_id"], schema=SCHEMA)
+    # El worker solo recorre filas pendientes/en curso: índice parcial pequeño.
+    op.create_index(
+        "ix_mail_outbox_due",
+        "mail_outbox",
+        ["next_attempt_at"],
+        schema=SCHEMA,
+        postgresql_where=sa.text("status IN ('pending', 'sending')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_mail_outbox_due", table_name="mail_outbox", schema=SCHEMA)
+    op.drop_index("ix_mail_outbox_ticket_id", table_name="mail_outbox", schema=SCHEMA)
+    op.drop_table("mail_outbox", schema=SCHEMA)
@@ -0,0 +1,86 @@
+"""Create review invitation job tables."""
+
+import os
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0008_review_invitations"
+down_revision = "0007_mail_outbox"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+
+
+def _timestamps() -> list:
+    return [
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+            onupdate=sa.text("now()"),
+        ),
+    ]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "review_invitation_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("status", sa.String(), nullable=False, server_default="queued"),
+        sa.Column("phase", sa.String(), nullable=False, server_default="discover"),
+        sa.Column("requested_by", sa.String()),
+        sa.Column("closed_after", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("closed_before", sa.DateTime(timezone=True)),
+        sa.Column("next_page", sa.Integer(), nullable=False, server_default="1"),
+        sa.Column("discovered", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sent", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("failed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("skipped", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.Text()),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True)),
+        sa.Column("finished_at", sa.DateTime(timezone=True)),
+        *_timestamps(),
+        schema=SCHEMA,
+    )
+    op.create_table(
+        "review_invitations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "job_id",
+            sa.Integer(),
+            sa.ForeignKey(f"{SCHEMA}.review_invitation_jobs.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("ticket_id", sa.String(), nullable=False, unique=True),
+        sa.Column("display_id", sa.String()),
+        sa.Column("ticket_subject", sa.Text()),
+        sa.Column("requester_name", sa.String()),
+        sa.Column("email", sa.String()),
+        sa.Column("status", sa.String(), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("error", sa.Text()),
+        sa.Column("sent_at", sa.DateTime(timezone=True)),
+        *_timestamps(),
+        schema=SCHEMA,
+    )
+    # El runner solo recorre invitaciones pendientes de su job.
+    op.create_index(
+        "ix_review_invitations_job_pending",
+        "review_invitations",
+        ["job_id", "id"],
+        schema=SCHEMA,
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+    op.create_index("ix_review_invitations_job_id", "review_invitations", ["job_id"], schema=SCHEMA)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_review_invitations_job_id", table_name="review_invitations", schema=SCHEMA)
+    op.drop_index("ix_review_invitations_job_pending", table_name="review_invitations", schema=SCHEMA)
+    op.drop_table("review_invitations", schema=SCHEMA)
+    op.drop_table("review_invitation_jobs", schema=SCHEMA)
@@ -0,0 +1,53 @@
+"""Create note_outbox table."""
+
+import os
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0009_note_outbox"
+down_revision = "0008_review_invitations"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "note_outbox",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("dedup_key", sa.String(), nullable=False, unique=True),
+        sa.Column("ticket_id", sa.String(), nullable=False),
+        sa.Column("technician_id", sa.String()),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("last_error", sa.Text()),
+        sa.Column("sent_at", sa.DateTime(timezone=True)),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+            onupdate=sa.text("now()"),
+        ),
+        schema=SCHEMA,
+    )
+    op.create_index("ix_note_outbox_ticket_id", "note_outbox", ["ticket_id"], schema=SCHEMA)
+    op.create_index(
+        "ix_note_outbox_due",
+        "note_outbox",
+        ["next_attempt_at"],
+        schema=SCHEMA,
+        postgresql_where=sa.text("status IN ('pending', 'sending')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_note_outbox_due", table_name="note_outbox", schema=SCHEMA)
+    op.drop_index("ix_note_outbox_ticket_id", table_name="note_outbox", schema=SCHEMA)
+    op.drop_table("note_outbox", schema=SCHEMA)
@@ -0,0 +1,42 @@
+"""Create UNLOGGED shared_cache table."""
+
+import os
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0010_shared_cache"
+down_revision = "0009_note_outbox"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+
+
+def upgrade() -> None:
+    # UNLOGGED: sin WAL ni réplica; Postgres la trunca tras un crash, aceptable para una cache.
+    op.create_table(
+        "shared_cache",
+        sa.Column("namespace", sa.String(), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("value", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+            onupdate=sa.text("now()"),
+        ),
+        sa.PrimaryKeyConstraint("namespace", "key"),
+        schema=SCHEMA,
+        prefixes=["UNLOGGED"],
+    )
+    op.create_index("ix_shared_cache_expires_at", "shared_cache", ["expires_at"], schema=SCHEMA)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_shared_cache_expires_at", table_name="shared_cache", schema=SCHEMA)
+    op.drop_table("shared_cache", schema=SCHEMA)
@@ -0,0 +1,57 @@
+"""Create ticket_snapshots and technician_sync_state tables."""
+
+import os
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0011_ticket_snapshots"
+down_revision = "0010_shared_cache"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ticket_snapshots",
+        sa.Column("ticket_id", sa.String(), primary_key=True),
+        sa.Column("technician_id", sa.String(), nullable=False),
+        sa.Column("subject", sa.Text()),
+        sa.Column("requester", postgresql.JSONB(astext_type=sa.Text())),
+        sa.Column("position", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("synced_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        schema=SCHEMA,
+    )
+    op.create_index(
+        "ix_ticket_snapshots_technician_id", "ticket_snapshots", ["technician_id", "position"], schema=SCHEMA
+    )
+    op.create_table(
+        "technician_sync_state",
+        sa.Column("technician_id", sa.String(), primary_key=True),
+        sa.Column("user_upn", sa.String()),
+        sa.Column("last_requested_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("last_synced_at", sa.DateTime(timezone=True)),
+        sa.Column("next_sync_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.Column("ticket_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.Text()),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("now()"),
+            onupdate=sa.text("now()"),
+        ),
+        schema=SCHEMA,
+    )
+    op.create_index("ix_technician_sync_state_next_sync_at", "technician_sync_state", ["next_sync_at"], schema=SCHEMA)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_technician_sync_state_next_sync_at", table_name="technician_sync_state", schema=SCHEMA)
+    op.drop_table("technician_sync_state", schema=SCHEMA)
+    op.drop_index("ix_ticket_snapshots_technician_id", table_name="ticket_snapshots", schema=SCHEMA)
+    op.drop_table("ticket_snapshots", schema=SCHEMA)
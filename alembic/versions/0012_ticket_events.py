@@ -0,0 +1,53 @@
+"""Create ticket_events and ticket_event_sync tables."""
+
+import os
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0012_ticket_events"
+down_revision = "0011_ticket_snapshots"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ticket_events",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("ticket_id", sa.String(), nullable=False),
+        sa.Column("event_key", sa.String(), nullable=False),
+        sa.Column("event_id", sa.BigInteger()),
+        sa.Column("type", sa.String()),
+        sa.Column("author_name", sa.String()),
+        sa.Column("author_type", sa.String()),
+        sa.Column("visibility", sa.String()),
+        sa.Column("occurred_at", sa.DateTime(timezone=True)),
+        sa.Column("text", sa.Text()),
+        sa.Column("old_value", sa.Text()),
+        sa.Column("new_value", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.UniqueConstraint("ticket_id", "event_key", name="uq_ticket_events_ticket_event_key"),
+        schema=SCHEMA,
+    )
+    op.create_index(
+        "ix_ticket_events_ticket_occurred", "ticket_events", ["ticket_id", "occurred_at", "id"], schema=SCHEMA
+    )
+    op.create_table(
+        "ticket_event_sync",
+        sa.Column("ticket_id", sa.String(), primary_key=True),
+        sa.Column("last_event_id", sa.BigInteger()),
+        sa.Column("last_event_at", sa.DateTime(timezone=True)),
+        sa.Column("event_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("synced_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        schema=SCHEMA,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ticket_event_sync", schema=SCHEMA)
+    op.drop_index("ix_ticket_events_ticket_occurred", table_name="ticket_events", schema=SCHEMA)
+    op.drop_table("ticket_events", schema=SCHEMA)
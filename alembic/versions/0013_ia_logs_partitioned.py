@@ -0,0 +1,134 @@
+"""Partition ia_logs by month (BRIN on timestamp) and add ia_usage_rollups."""
+
+import os
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0013_ia_logs_partitioned"
+down_revision = "0012_ticket_events"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+
+COLUMNS = (
+    'id, "timestamp", user_upn, ticket_id, operation, message_type, model, success, '
+    "latency_ms, ttft_ms, cache_hit, prompt_chars, response_chars, error_message"
+)
+
+
+def upgrade() -> None:
+    op.execute(f'ALTER TABLE "{SCHEMA}".ia_logs RENAME TO ia_logs_unpartitioned')
+    op.execute(f'ALTER INDEX "{SCHEMA}".ia_logs_pkey RENAME TO ia_logs_unpartitioned_pkey')
+    op.execute(f'ALTER INDEX "{SCHEMA}".ix_ia_logs_ticket_id RENAME TO ix_ia_logs_unpartitioned_ticket_id')
+    op.execute(f'ALTER INDEX "{SCHEMA}".ix_ia_logs_user_upn RENAME TO ix_ia_logs_unpartitioned_user_upn')
+    op.execute(
+        f"""
+        CREATE TABLE "{SCHEMA}".ia_logs (
+            id INTEGER NOT NULL DEFAULT nextval('"{SCHEMA}".ia_logs_id_seq'),
+            "timestamp" TIMESTAMPTZ NOT NULL DEFAULT now(),
+            user_upn VARCHAR,
+            ticket_id VARCHAR,
+            operation VARCHAR,
+            message_type VARCHAR,
+            model VARCHAR,
+            success BOOLEAN,
+            latency_ms INTEGER,
+            ttft_ms INTEGER,
+            cache_hit BOOLEAN,
+            prompt_chars INTEGER,
+            response_chars INTEGER,
+            error_message TEXT,
+            PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+        """
+    )
+    op.execute(f'ALTER SEQUENCE "{SCHEMA}".ia_logs_id_seq OWNED BY "{SCHEMA}".ia_logs.id')
+
+    # Particiones mensuales desde el primer log hasta 3 meses adelante; la app crea las siguientes.
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            month_start date := date_trunc('month', COALESCE(
+                (SELECT min("timestamp") FROM "{SCHEMA}".ia_logs_unpartitioned), now()))::date;
+            last_month date := (date_trunc('month', now()) + interval '3 months')::date;
+        BEGIN
+            WHILE month_start <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I.%I PARTITION OF %I.ia_logs FOR VALUES FROM (%L) TO (%L)',
+                    '{SCHEMA}', 'ia_logs_p' || to_char(month_start, 'YYYYMM'), '{SCHEMA}',
+                    month_start, (month_start + interval '1 month')::date
+                );
+                month_start := (month_start + interval '1 month')::date;
+            END LOOP;
+        END $$
+        """
+    )
+    op.execute(
+        f'INSERT INTO "{SCHEMA}".ia_logs ({COLUMNS}) SELECT {COLUMNS} FROM "{SCHEMA}".ia_logs_unpartitioned'
+    )
+    op.execute(f'DROP TABLE "{SCHEMA}".ia_logs_unpartitioned')
+
+    op.create_index("ix_ia_logs_ticket_id", "ia_logs", ["ticket_id"], schema=SCHEMA)
+    op.create_index("ix_ia_logs_user_upn", "ia_logs", ["user_upn"], schema=SCHEMA)
+    op.create_index("ix_ia_logs_timestamp_brin", "ia_logs", ["timestamp"], schema=SCHEMA, postgresql_using="brin")
+
+    op.create_table(
+        "ia_usage_rollups",
+        sa.Column("granularity", sa.String(), nullable=False),  # hour / day
+        sa.Column("bucket_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("user_upn", sa.String(), nullable=False),
+        sa.Column("operation", sa.String(), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("calls", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("errors", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("cache_hits", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("latency_p50_ms", sa.Float()),
+        sa.Column("latency_p95_ms", sa.Float()),
+        sa.Column("prompt_chars", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("response_chars", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.PrimaryKeyConstraint("granularity", "bucket_start", "user_upn", "operation", "model"),
+        schema=SCHEMA,
+    )
+    op.create_index(
+        "ix_ia_usage_rollups_bucket", "ia_usage_rollups", ["granularity", "bucket_start"], schema=SCHEMA
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ia_usage_rollups_bucket", table_name="ia_usage_rollups", schema=SCHEMA)
+    op.drop_table("ia_usage_rollups", schema=SCHEMA)
+
+    op.execute(f'ALTER TABLE "{SCHEMA}".ia_logs RENAME TO ia_logs_partitioned')
+    op.execute(f'ALTER INDEX "{SCHEMA}".ia_logs_pkey RENAME TO ia_logs_partitioned_pkey')
+    op.execute(f'ALTER INDEX "{SCHEMA}".ix_ia_logs_ticket_id RENAME TO ix_ia_logs_partitioned_ticket_id')
+    op.execute(f'ALTER INDEX "{SCHEMA}".ix_ia_logs_user_upn RENAME TO ix_ia_logs_partitioned_user_upn')
+    op.execute(
+        f"""
+        CREATE TABLE "{SCHEMA}".ia_logs (
+            id INTEGER PRIMARY KEY DEFAULT nextval('"{SCHEMA}".ia_logs_id_seq'),
+            "timestamp" TIMESTAMPTZ NOT NULL DEFAULT now(),
+            user_upn VARCHAR,
+            ticket_id VARCHAR,
+            operation VARCHAR,
+            message_type VARCHAR,
+            model VARCHAR,
+            success BOOLEAN,
+            latency_ms INTEGER,
+            ttft_ms INTEGER,
+            cache_hit BOOLEAN,
+            prompt_chars INTEGER,
+            response_chars INTEGER,
+            error_message TEXT
+        )
+        """
+    )
+    op.execute(f'ALTER SEQUENCE "{SCHEMA}".ia_logs_id_seq OWNED BY "{SCHEMA}".ia_logs.id')
+    op.execute(f'INSERT INTO "{SCHEMA}".ia_logs ({COLUMNS}) SELECT {COLUMNS} FROM "{SCHEMA}".ia_logs_partitioned')
+    op.execute(f'DROP TABLE "{SCHEMA}".ia_logs_partitioned CASCADE')
+    op.create_index("ix_ia_logs_ticket_id", "ia_logs", ["ticket_id"], schema=SCHEMA)
+    op.create_index("ix_ia_logs_user_upn", "ia_logs", ["user_upn"], schema=SCHEMA)
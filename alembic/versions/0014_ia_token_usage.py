@@ -0,0 +1,57 @@
+"""Token usage/cost on ia_logs and rollups, technician team and ia_quota_usage."""
+
+import os
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0014_ia_token_usage"
+down_revision = "0013_ia_logs_partitioned"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+
+
+def upgrade() -> None:
+    # En la tabla particionada el ADD COLUMN se propaga a todas las particiones.
+    op.add_column("ia_logs", sa.Column("prompt_tokens", sa.Integer()), schema=SCHEMA)
+    op.add_column("ia_logs", sa.Column("completion_tokens", sa.Integer()), schema=SCHEMA)
+    op.add_column("ia_logs", sa.Column("cached_tokens", sa.Integer()), schema=SCHEMA)
+    op.add_column("ia_logs", sa.Column("cost_usd", sa.Numeric(12, 6)), schema=SCHEMA)
+
+    op.add_column(
+        "ia_usage_rollups", sa.Column("prompt_tokens", sa.BigInteger(), nullable=False, server_default="0"), schema=SCHEMA
+    )
+    op.add_column(
+        "ia_usage_rollups",
+        sa.Column("completion_tokens", sa.BigInteger(), nullable=False, server_default="0"),
+        schema=SCHEMA,
+    )
+    op.add_column(
+        "ia_usage_rollups", sa.Column("cost_usd", sa.Numeric(14, 6), nullable=False, server_default="0"), schema=SCHEMA
+    )
+
+    op.add_column("technician_mapping", sa.Column("team", sa.String()), schema=SCHEMA)
+
+    op.create_table(
+        "ia_quota_usage",
+        sa.Column("subject", sa.String(), nullable=False),  # user:<upn> / team:<team>
+        sa.Column("bucket_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("tokens", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("subject", "bucket_start"),
+        schema=SCHEMA,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ia_quota_usage", schema=SCHEMA)
+    op.drop_column("technician_mapping", "team", schema=SCHEMA)
+    op.drop_column("ia_usage_rollups", "cost_usd", schema=SCHEMA)
+    op.drop_column("ia_usage_rollups", "completion_tokens", schema=SCHEMA)
+    op.drop_column("ia_usage_rollups", "prompt_tokens", schema=SCHEMA)
+    op.drop_column("ia_logs", "cost_usd", schema=SCHEMA)
+    op.drop_column("ia_logs", "cached_tokens", schema=SCHEMA)
+    op.drop_column("ia_logs", "completion_tokens", schema=SCHEMA)
+    op.drop_column("ia_logs", "prompt_tokens", schema=SCHEMA)
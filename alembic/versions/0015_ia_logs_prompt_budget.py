@@ -0,0 +1,24 @@
+"""Prompt token estimate and dropped sections on ia_logs."""
+
+import os
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0015_ia_logs_prompt_budget"
+down_revision = "0014_ia_token_usage"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+
+
+def upgrade() -> None:
+    op.add_column("ia_logs", sa.Column("prompt_tokens_estimate", sa.Integer()), schema=SCHEMA)
+    op.add_column("ia_logs", sa.Column("prompt_dropped", sa.Text()), schema=SCHEMA)
+
+
+def downgrade() -> None:
+    op.drop_column("ia_logs", "prompt_dropped", schema=SCHEMA)
+    op.drop_column("ia_logs", "prompt_tokens_estimate", schema=SCHEMA)
@@ -0,0 +1,21 @@
+"""DEFAULT partition for ia_logs, so inserts never fail for lack of a monthly partition."""
+
+import os
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0016_ia_logs_default_partition"
+down_revision = "0015_ia_logs_prompt_budget"
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.getenv("DB_SCHEMA", "copilot")
+
+
+def upgrade() -> None:
+    op.execute(f'CREATE TABLE IF NOT EXISTS "{SCHEMA}".ia_logs_default PARTITION OF "{SCHEMA}".ia_logs DEFAULT')
+
+
+def downgrade() -> None:
+    op.execute(f'DROP TABLE IF EXISTS "{SCHEMA}".ia_logs_default')
@@ -0,0 +1,183 @@
+"""Endpoints de administración (requieren UPN en ADMIN_UPNS)."""
+
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth import AdminUser
+from app.core.config import settings
+from app.core.review_invitations import create_job, review_invitation_runner
+from app.db.session import get_db
+from app.models.ia_usage import IAUsageRollup
+from app.models.review_invitations import ReviewInvitation, ReviewInvitationJob
+from app.schemas.admin import (
+    IAUsageResponse,
+    IAUsageRow,
+    ReviewInvitationJobCreate,
+    ReviewInvitationJobStatus,
+)
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Fechas de query/body en UTC; sin zona horaria se asumen UTC (comparar naive con aware da TypeError)."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+async def _job_status(db: AsyncSession, job: ReviewInvitationJob, running_here: bool) -> ReviewInvitationJobStatus:
+    pending = await db.scalar(
+        select(func.count(ReviewInvitation.id)).where(
+            ReviewInvitation.job_id == job.id, ReviewInvitation.status == "pending"
+        )
+    )
+    return ReviewInvitationJobStatus(
+        id=job.id,
+        status=job.status,
+        phase=job.phase,
+        requested_by=job.requested_by,
+        closed_after=job.closed_after,
+        closed_before=job.closed_before,
+        next_page=job.next_page,
+        discovered=job.discovered,
+        sent=job.sent,
+        failed=job.failed,
+        skipped=job.skipped,
+        pending=pending or 0,
+        last_error=job.last_error,
+        heartbeat_at=job.heartbeat_at,
+        finished_at=job.finished_at,
+        created_at=job.created_at,
+        running_here=running_here,
+    )
+
+
+def _require_review_invitations() -> None:
+    # El descubrimiento usa GET /request/closed del gateway; sin él el job falla siempre.
+    if not settings.review_invitations_enabled:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="review_invitations_disabled")
+
+
+async def _get_job(db: AsyncSession, job_id: int) -> ReviewInvitationJob:
+    job = await db.get(ReviewInvitationJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="job_not_found")
+    return job
+
+
+@router.post(
+    "/review_invitations",
+    response_model=ReviewInvitationJobStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def start_review_invitations(
+    body: ReviewInvitationJobCreate,
+    current_user: AdminUser,
+    db: AsyncSession = Depends(get_db),
+) -> ReviewInvitationJobStatus:
+    """Crea un job de invitaciones para tickets cerrados en el rango y lo lanza en segundo plano."""
+    _require_review_invitations()
+    closed_after = _as_utc(body.closed_after)
+    closed_before = _as_utc(body.closed_before)
+    if closed_before is not None and closed_before <= closed_after:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_date_range")
+    job = await create_job(
+        db,
+        requested_by=current_user,
+        closed_after=closed_after,
+        closed_before=closed_before,
+    )
+    launched = review_invitation_runner.launch(job.id)
+    return await _job_status(db, job, launched)
+
+
+@router.get("/review_invitations/{job_id}", response_model=ReviewInvitationJobStatus)
+async def review_invitations_status(
+    job_id: int,
+    current_user: AdminUser,
+    db: AsyncSession = Depends(get_db),
+) -> ReviewInvitationJobStatus:
+    """Progreso del job (contadores persistidos)."""
+    job = await _get_job(db, job_id)
+    return await _job_status(db, job, review_invitation_runner.is_running(job_id))
+
+
+@router.post("/review_invitations/{job_id}/resume", response_model=ReviewInvitationJobStatus)
+async def resume_review_invitations(
+    job_id: int,
+    current_user: AdminUser,
+    db: AsyncSession = Depends(get_db),
+) -> ReviewInvitationJobStatus:
+    """Reanuda un job fallido o interrumpido desde la última página/invitación persistida."""
+    _require_review_invitations()
+    job = await _get_job(db, job_id)
+    if job.status == "completed":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="job_completed")
+    launched = review_invitation_runner.launch(job.id)
+    return await _job_status(db, job, launched)
+
+
+@router.get("/ia_usage", response_model=IAUsageResponse)
+async def ia_usage(
+    current_user: AdminUser,
+    granularity: Literal["hour", "day"] = Query("day"),
+    since: Optional[datetime] = Query(None, description="Por defecto 7 días (day) o 48 horas (hour) atrás"),
+    until: Optional[datetime] = Query(None),
+    user_upn: Optional[str] = Query(None),
+    operation: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db),
+) -> IAUsageResponse:
+    """Volumen, tasa de error, latencias p50/p95, caracteres, tokens y costo desde ia_usage_rollups (sin leer ia_logs)."""
+    until = _as_utc(until) or datetime.now(tz=timezone.utc)
+    since = _as_utc(since) or until - (timedelta(days=7) if granularity == "day" else timedelta(hours=48))
+    if since >= until:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_date_range")
+
+    stmt = select(IAUsageRollup).where(
+        IAUsageRollup.granularity == granularity,
+        IAUsageRollup.bucket_start >= since,
+        IAUsageRollup.bucket_start < until,
+    )
+    for column, value in (
+        (IAUsageRollup.user_upn, user_upn),
+        (IAUsageRollup.operation, operation),
+        (IAUsageRollup.model, model),
+    ):
+        if value is not None:
+            stmt = stmt.where(column == value)
+    stmt = stmt.order_by(IAUsageRollup.bucket_start, IAUsageRollup.user_upn, IAUsageRollup.operation).limit(limit)
+    rollups = (await db.execute(stmt)).scalars().all()
+    return IAUsageResponse(
+        granularity=granularity,
+        since=since,
+        until=until,
+        rows=[
+            IAUsageRow(
+                bucket_start=r.bucket_start,
+                user_upn=r.user_upn or None,
+                operation=r.operation or None,
+                model=r.model or None,
+                calls=r.calls,
+                errors=r.errors,
+                error_rate=round(r.errors / r.calls, 4) if r.calls else 0.0,
+                cache_hits=r.cache_hits,
+                latency_p50_ms=r.latency_p50_ms,
+                latency_p95_ms=r.latency_p95_ms,
+                prompt_chars=r.prompt_chars,
+                response_chars=r.response_chars,
+                prompt_tokens=r.prompt_tokens,
+                completion_tokens=r.completion_tokens,
+                cost_usd=float(r.cost_usd or 0),
+            )
+            for r in rollups
+        ],
+    )
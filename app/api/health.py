@@ -5,6 +5,16 @@ from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.conversation_clean import conversation_cleaner
+from app.core.ia_log_sink import ia_log_sink
+from app.core.ia_quota import ia_quota_tracker
+from app.core.ia_usage import ia_usage_maintainer
+from app.core.mail_outbox import mail_outbox_worker
+from app.core.note_outbox import note_outbox_worker
+from app.core.sdp_client import get_cache_stats
+from app.core.smtp_pool import get_smtp_pool_stats
+from app.core.suggestion_cache import suggestion_cache
+from app.core.ticket_snapshots import ticket_sync_worker
 from app.db.session import get_db
 
 router = APIRouter()
@@ -18,3 +28,39 @@ async def health(db: AsyncSession = Depends(get_db)) -> dict[str, str]:
     except SQLAlchemyError as exc:
         raise HTTPException(status_code=503, detail="database_unavailable") from exc
     return {"status": "ok"}
+
+
+@router.get("/health/gateway_cache", tags=["health"])
+async def gateway_cache_stats() -> dict:
+    """Hit/miss counters of this worker's gateway response cache."""
+    return get_cache_stats()
+
+
+@router.get("/health/ia_cache", tags=["health"])
+async def ia_cache_stats() -> dict:
+    """Hit/miss counters of this worker's IA suggestion cache and conversation-cleaning memo."""
+    return {**suggestion_cache.stats(), "conversation_clean": conversation_cleaner.stats()}
+
+
+@router.get("/health/ia_logs", tags=["health"])
+async def ia_log_sink_stats() -> dict:
+    """ia_logs writer counters (queue, written/dropped/delayed), partition/rollup maintenance and IA quotas."""
+    return {**ia_log_sink.stats(), "maintenance": ia_usage_maintainer.stats(), "quota": ia_quota_tracker.stats()}
+
+
+@router.get("/health/mail_outbox", tags=["health"])
+async def mail_outbox_stats() -> dict:
+    """Delivery counters of this worker's mail outbox drainer and SMTP session pools."""
+    return {**mail_outbox_worker.stats(), "smtp_pools": get_smtp_pool_stats()}
+
+
+@router.get("/health/note_outbox", tags=["health"])
+async def note_outbox_stats() -> dict:
+    """Delivery counters of this worker's gateway note outbox drainer."""
+    return note_outbox_worker.stats()
+
+
+@router.get("/health/ticket_sync", tags=["health"])
+async def ticket_sync_stats() -> dict:
+    """Counters of this worker's ticket snapshot sync loop."""
+    return ticket_sync_worker.stats()
@@ -1,24 +1,31 @@
 """Endpoints IA (hito 6)."""
 
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from openai import OpenAIError
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import CurrentUser
 from app.core.config import settings
-from app.core.ia_client import IAClient
-from app.core.sdp_client import SdpClient
+from app.core.config_store import OrgSnapshot, PersonaSnapshot
+from app.core.conversation_clean import clean_message
+from app.core.ia_client import IAClient, TokenUsage, estimate_cost, get_ia_client
+from app.core.ia_log_sink import ia_log_sink
+from app.core.ia_quota import estimate_tokens, ia_quota_tracker
+from app.core.prompt_budget import PromptPacker, count_tokens
+from app.core.sdp_client import SdpClient, get_sdp_client
+from app.core.suggestion_cache import suggestion_cache, suggestion_key
+from app.core.technicians import get_technician
+from app.core.ticket_context import TicketContext, load_ticket_context
 from app.db.session import get_db
 from app.models.ia_logs import IALog
-from app.models.org_profile import OrgProfile
-from app.models.persona_config import PersonaConfig
-from app.models.services_catalog import ServiceCatalog
-from app.models.settings import Setting
-from app.models.technician_mapping import TechnicianMapping
 from app.schemas.ia import (
     GenerateReplyRequest,
     GenerateReplyResponse,
@@ -29,55 +36,6 @@ from app.schemas.ia import (
 router = APIRouter(prefix="/api/ia", tags=["ia"])
 
 
-def get_sdp_client() -> SdpClient:
-    return SdpClient()
-
-
-def get_ia_client() -> IAClient:
-    return IAClient()
-
-
-async def _resolve_technician_id(db: AsyncSession, user_upn: str) -> str:
-    result = await db.execute(
-        select(TechnicianMapping).where(TechnicianMapping.user_upn == user_upn, TechnicianMapping.active.is_(True))
-    )
-    mapping = result.scalar_one_or_none()
-    if not mapping:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="user_not_configured")
-    return mapping.technician_id_sdp
-
-
-async def _load_settings(db: AsyncSession) -> Dict[str, str]:
-    result = await db.execute(select(Setting))
-    rows = result.scalars().all()
-    return {row.key: row.value for row in rows}
-
-
-async def _load_persona(db: AsyncSession) -> PersonaConfig:
-    result = await db.execute(select(PersonaConfig).where(PersonaConfig.active.is_(True)).order_by(PersonaConfig.id.desc()))
-    persona = result.scalar_one_or_none()
-    if not persona:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="persona_not_configured")
-    return persona
-
-
-async def _load_org_profile(db: AsyncSession) -> OrgProfile:
-    result = await db.execute(select(OrgProfile).order_by(OrgProfile.id.asc()))
-    org = result.scalar_one_or_none()
-    if not org:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="org_profile_not_configured")
-    return org
-
-
-async def _load_service(db: AsyncSession, service_code: Optional[str]) -> Optional[ServiceCatalog]:
-    if not service_code:
-        return None
-    result = await db.execute(
-        select(ServiceCatalog).where(ServiceCatalog.service_code == str(service_code))
-    )
-    return result.scalar_one_or_none()
-
-
 def _parse_dt(value: Optional[str]) -> Optional[datetime]:
     if not value:
         return None
@@ -90,7 +48,7 @@ def _parse_dt(value: Optional[str]) -> Optional[datetime]:
         return None
 
 
-def _build_system_prompt(persona: PersonaConfig, org: OrgProfile) -> str:
+def _build_system_prompt(persona: PersonaSnapshot, org: OrgSnapshot) -> str:
     parts: List[str] = []
     if persona.system_prompt_template:
         parts.append(persona.system_prompt_template.strip())
@@ -116,33 +74,37 @@ def _build_system_prompt(persona: PersonaConfig, org: OrgProfile) -> str:
     return "\n".join(parts)
 
 
-def _format_history(events: List[dict], limit: int) -> str:
-    trimmed = events[-limit:] if limit and limit > 0 else events
-    lines: List[str] = []
-    for ev in trimmed:
-        ts = ev.get("timestamp")
-        lines.append(
-            f"[{ts}] ({ev.get('visibility')}/{ev.get('author_type')}) {ev.get('author_name')}: {ev.get('text')}"
-        )
-    return "\n".join(lines)
+def _format_event(ev: dict) -> str:
+    return f"[{ev.get('timestamp')}] ({ev.get('visibility')}/{ev.get('author_type')}) {ev.get('author_name')}: {ev.get('text')}"
+
+
+def _format_note(ev: dict) -> str:
+    return f"[{ev.get('timestamp')}] {ev.get('author_name')}: {ev.get('text')}"
 
 
-def _format_internal(events: List[dict], limit: int) -> str:
-    internal = [e for e in events if (e.get("visibility") or "").lower() == "interno"]
-    trimmed = internal[-limit:] if limit and limit > 0 else internal
-    return "\n".join(
-        f"[{e.get('timestamp')}] {e.get('author_name')}: {e.get('text')}" for e in trimmed
+def _is_internal(ev: dict) -> bool:
+    return (ev.get("visibility") or "").lower() == "interno"
+
+
+def _new_packer(settings_map: Mapping[str, Any], system_prompt: str) -> PromptPacker:
+    """Presupuesto del prompt (system + user) desde settings, con el system prompt ya reservado."""
+    packer = PromptPacker(
+        budget=int(settings_map.get("max_prompt_tokens", settings.ia_prompt_max_tokens)),
+        max_item_tokens=int(settings_map.get("max_item_tokens_in_prompt", settings.ia_prompt_max_item_tokens)),
     )
+    packer.reserve(system_prompt)
+    return packer
 
 
 def _build_user_prompt(
-    detail: dict,
-    history: List[dict],
-    service: Optional[ServiceCatalog],
-    settings_map: Dict[str, str],
-    req: GenerateReplyRequest,
-    draft: Optional[str],
+    ctx: TicketContext, req: GenerateReplyRequest, draft: Optional[str], packer: PromptPacker
 ) -> str:
+    """
+    Prompt de generate_reply. Se empaqueta por prioridad: cabecera del ticket
+    (y borrador), últimos mensajes públicos, notas internas y descripción; se
+    renderiza en el orden de la plantilla.
+    """
+    detail, history, service, settings_map = ctx.detail, ctx.history, ctx.service, ctx.settings_map
     requester = detail.get("requester") or {}
     requester_name = requester.get("name") or detail.get("requester_name")
     requester_email = requester.get("email") or requester.get("email_id") or detail.get("requester_email")
@@ -152,15 +114,13 @@ def _build_user_prompt(
     max_hist = int(settings_map.get("max_history_messages_in_prompt", 10))
     max_notes = int(settings_map.get("max_internal_notes_in_prompt", 5))
 
-    history_txt = _format_history(history, max_hist)
-    internal_txt = _format_internal(history, max_notes)
     service_line = None
     if service:
         service_line = f"{service.name} (code {service.service_code})"
     else:
         service_line = str(detail.get("service_code") or "N/D")
 
-    return (
+    header = packer.reserve(
         f"Tipo de mensaje: {req.message_type}\n"
         f"Ticket: {detail.get('id')} / {detail.get('display_id')}\n"
         f"Asunto: {detail.get('subject')}\n"
@@ -169,29 +129,103 @@ def _build_user_prompt(
         f"Solicitante: {requester_name} ({requester_email})\n"
         f"Creado: {created_time}\n"
         f"Último contacto usuario: {last_contact}\n"
-        f"Descripción: {detail.get('description')}\n"
+    )
+    draft_txt = packer.text("borrador", draft) or "N/A"
+    footer = packer.reserve("Entrega una sola respuesta sugerida y accionable, breve, en español.")
+    public = packer.items(
+        "historial", [_format_event(e) for e in history if not _is_internal(e)], limit=max_hist
+    )
+    internal = packer.items("notas_internas", [_format_note(e) for e in history if _is_internal(e)], limit=max_notes)
+    description = packer.text("descripcion", clean_message(detail.get("description")))
+    history_txt = "\n".join(public)
+    internal_txt = "\n".join(internal)
+
+    return (
+        header
+        + f"Descripción: {description or 'N/D'}\n"
         f"Historial reciente:\n{history_txt}\n"
         f"Notas internas recientes:\n{internal_txt}\n"
-        f"Borrador del técnico (si hay): {draft or 'N/A'}\n"
-        "Entrega una sola respuesta sugerida y accionable, breve, en español."
+        f"Borrador del técnico (si hay): {draft_txt}\n"
+        + footer
     )
 
 
-def _build_interpret_prompt(
-    detail: dict,
-    history: List[dict],
-    settings_map: Dict[str, str],
-) -> str:
+def _build_interpret_prompt(ctx: TicketContext, packer: PromptPacker) -> str:
+    detail, history, settings_map = ctx.detail, ctx.history, ctx.settings_map
     max_hist = int(settings_map.get("max_history_messages_in_prompt", 10))
-    history_txt = _format_history(history, max_hist)
-    return (
+    header = packer.reserve(
         "Analiza el historial del ticket y sugiere enfoque/acción próxima.\n"
         f"Ticket: {detail.get('id')} / {detail.get('display_id')}\n"
         f"Asunto: {detail.get('subject')}\n"
         f"Estado: {detail.get('status')} | Prioridad: {detail.get('priority')}\n"
-        f"Historial reciente:\n{history_txt}\n"
-        "Devuelve solo una sugerencia breve (no redactes el mensaje final)."
     )
+    footer = packer.reserve("Devuelve solo una sugerencia breve (no redactes el mensaje final).")
+    history_txt = "\n".join(packer.items("historial", [_format_event(e) for e in history], limit=max_hist))
+    return header + f"Historial reciente:\n{history_txt}\n" + footer
+
+
+def _interpret_messages(ctx: TicketContext) -> Tuple[List[Dict[str, str]], PromptPacker]:
+    system_prompt = _build_system_prompt(ctx.persona, ctx.org)
+    packer = _new_packer(ctx.settings_map, system_prompt)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": _build_interpret_prompt(ctx, packer)},
+    ]
+    return messages, packer
+
+
+def _reply_messages(
+    ctx: TicketContext, req: GenerateReplyRequest
+) -> Tuple[List[Dict[str, str]], float, int, PromptPacker]:
+    """Construye mensajes y parámetros de generate_reply (normal y streaming)."""
+    temperature = float(ctx.settings_map.get("temperature", 0.3))
+    max_tokens = int(ctx.settings_map.get("max_tokens", 400))
+    system_prompt = _build_system_prompt(ctx.persona, ctx.org)
+    packer = _new_packer(ctx.settings_map, system_prompt)
+    user_prompt = _build_user_prompt(ctx, req, req.draft, packer)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+    return messages, temperature, max_tokens, packer
+
+
+def _log_prompt(log: IALog, messages: List[Dict[str, str]], packer: PromptPacker) -> None:
+    log.prompt_chars = sum(len(m["content"]) for m in messages)
+    log.prompt_tokens_estimate = sum(count_tokens(m["content"]) for m in messages)
+    log.prompt_dropped = packer.report()
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _log_cache_hit(log: IALog, response: str, started: datetime) -> None:
+    log.success = True
+    log.cache_hit = True
+    log.response_chars = len(response)
+    log.latency_ms = int((datetime.now(tz=timezone.utc) - started).total_seconds() * 1000)
+
+
+async def _check_quota(db: AsyncSession, user_upn: str) -> Optional[str]:
+    """Raise 429 ia_quota_exceeded if the user or their team used up the window; returns the team."""
+    team = (await get_technician(db, user_upn)).team
+    if await ia_quota_tracker.exceeded(user_upn, team):
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="ia_quota_exceeded")
+    return team
+
+
+def _log_usage(log: IALog, usage: TokenUsage, deployment: str, team: Optional[str]) -> None:
+    """Tokens/costo en el log y consumo contra la cuota (estimado localmente si Azure no lo reporta)."""
+    if usage.reported:
+        log.prompt_tokens = usage.prompt_tokens
+        log.completion_tokens = usage.completion_tokens
+        log.cached_tokens = usage.cached_tokens
+        log.cost_usd = estimate_cost(deployment, usage)
+        tokens = usage.total_tokens
+    else:
+        tokens = (log.prompt_tokens_estimate or 0) + estimate_tokens(log.response_chars or 0)
+    ia_quota_tracker.record(log.user_upn or "", team, tokens)
 
 
 @router.post("/generate_reply", response_model=GenerateReplyResponse)
@@ -204,27 +238,12 @@ async def generate_reply(
 ) -> GenerateReplyResponse:
     """Genera mensaje sugerido con IA para un ticket."""
     user_upn = current_user
-    # valida mapeo
-    await _resolve_technician_id(db, user_upn)
-
-    detail = await sdp_client.get_request_detail(req.ticket_id)
-    history = await sdp_client.get_request_history(req.ticket_id)
-
-    settings_map = await _load_settings(db)
-    persona = await _load_persona(db)
-    org = await _load_org_profile(db)
-    service_entry = await _load_service(db, detail.get("service_code"))
+    team = await _check_quota(db, user_upn)
+    # valida mapeo y carga gateway + configuración en paralelo
+    ctx = await load_ticket_context(db, sdp_client, user_upn, req.ticket_id)
 
     # Construir mensajes
-    temperature = float(settings_map.get("temperature", 0.3))
-    max_tokens = int(settings_map.get("max_tokens", 400))
-    system_prompt = _build_system_prompt(persona, org)
-    user_prompt = _build_user_prompt(detail, history, service_entry, settings_map, req, req.draft)
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt},
-    ]
+    messages, temperature, max_tokens, packer = _reply_messages(ctx, req)
 
     # Llamar IA y registrar log
     started = datetime.now(tz=timezone.utc)
@@ -233,22 +252,35 @@ async def generate_reply(
         ticket_id=req.ticket_id,
         operation="generate_reply",
         message_type=req.message_type,
-        model=settings.azure_openai_deployment_gpt,
+        model=ia_client.deployment,
+        cache_hit=False,
     )
-    db.add(log)
+    _log_prompt(log, messages, packer)
+    cache_key = suggestion_key(
+        "generate_reply", messages, temperature=temperature, max_tokens=max_tokens, deployment=ia_client.deployment
+    )
+    cached = None if req.force_regenerate else await suggestion_cache.get(cache_key)
+    if cached is not None:
+        _log_cache_hit(log, cached, started)
+        ia_log_sink.submit(log)
+        return GenerateReplyResponse(suggested_message=cached, cached=True)
+    usage = TokenUsage()
     try:
-        reply = await ia_client.generate_reply(messages, temperature=temperature, max_tokens=max_tokens)
+        reply = await ia_client.generate_reply(
+            messages, temperature=temperature, max_tokens=max_tokens, usage=usage
+        )
+        await suggestion_cache.set(cache_key, reply)
         log.success = True
         log.response_chars = len(reply)
-        log.prompt_chars = sum(len(m["content"]) for m in messages)
         log.latency_ms = int((datetime.now(tz=timezone.utc) - started).total_seconds() * 1000)
-        await db.commit()
+        _log_usage(log, usage, ia_client.deployment, team)
+        ia_log_sink.submit(log)
         return GenerateReplyResponse(suggested_message=reply)
     except OpenAIError as exc:
         log.success = False
         log.error_message = str(exc)
         log.latency_ms = int((datetime.now(tz=timezone.utc) - started).total_seconds() * 1000)
-        await db.commit()
+        ia_log_sink.submit(log)
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="ia_provider_error") from exc
 
 
@@ -262,23 +294,12 @@ async def interpret_conversation(
 ) -> InterpretConversationResponse:
     """Sugiere enfoque para la siguiente respuesta, basado en historial."""
     user_upn = current_user
-    await _resolve_technician_id(db, user_upn)
+    team = await _check_quota(db, user_upn)
+    ctx = await load_ticket_context(db, sdp_client, user_upn, req.ticket_id, with_service=False)
 
-    detail = await sdp_client.get_request_detail(req.ticket_id)
-    history = await sdp_client.get_request_history(req.ticket_id)
-    settings_map = await _load_settings(db)
-    persona = await _load_persona(db)
-    org = await _load_org_profile(db)
-
-    temperature = float(settings_map.get("temperature", 0.3))
-    max_tokens = int(settings_map.get("max_tokens", 400))
-    system_prompt = _build_system_prompt(persona, org)
-    user_prompt = _build_interpret_prompt(detail, history, settings_map)
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt},
-    ]
+    temperature = float(ctx.settings_map.get("temperature", 0.3))
+    max_tokens = int(ctx.settings_map.get("max_tokens", 400))
+    messages, packer = _interpret_messages(ctx)
 
     started = datetime.now(tz=timezone.utc)
     log = IALog(
@@ -286,20 +307,110 @@ async def interpret_conversation(
         ticket_id=req.ticket_id,
         operation="interpret_conversation",
         message_type="interpretacion",
-        model=settings.azure_openai_deployment_gpt,
+        model=ia_client.deployment,
+        cache_hit=False,
+    )
+    _log_prompt(log, messages, packer)
+    cache_key = suggestion_key(
+        "interpret_conversation", messages, temperature=temperature, max_tokens=max_tokens, deployment=ia_client.deployment
     )
-    db.add(log)
+    cached = None if req.force_regenerate else await suggestion_cache.get(cache_key)
+    if cached is not None:
+        _log_cache_hit(log, cached, started)
+        ia_log_sink.submit(log)
+        return InterpretConversationResponse(suggestion=cached, cached=True)
+    usage = TokenUsage()
     try:
-        suggestion = await ia_client.interpret_conversation(messages, temperature=temperature, max_tokens=max_tokens)
+        suggestion = await ia_client.interpret_conversation(
+            messages, temperature=temperature, max_tokens=max_tokens, usage=usage
+        )
+        await suggestion_cache.set(cache_key, suggestion)
         log.success = True
         log.response_chars = len(suggestion)
-        log.prompt_chars = sum(len(m["content"]) for m in messages)
         log.latency_ms = int((datetime.now(tz=timezone.utc) - started).total_seconds() * 1000)
-        await db.commit()
+        _log_usage(log, usage, ia_client.deployment, team)
+        ia_log_sink.submit(log)
         return InterpretConversationResponse(suggestion=suggestion)
     except OpenAIError as exc:
         log.success = False
         log.error_message = str(exc)
         log.latency_ms = int((datetime.now(tz=timezone.utc) - started).total_seconds() * 1000)
-        await db.commit()
+        ia_log_sink.submit(log)
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="ia_provider_error") from exc
+
+
+@router.post("/generate_reply/stream")
+async def generate_reply_stream(
+    req: GenerateReplyRequest,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db),
+    sdp_client: SdpClient = Depends(get_sdp_client),
+    ia_client: IAClient = Depends(get_ia_client),
+) -> StreamingResponse:
+    """
+    Igual que /generate_reply pero emite la respuesta como Server-Sent Events.
+
+    Eventos: ``token`` ({"text"}) por fragmento, ``done`` ({"suggested_message"}) al final
+    o ``error`` ({"detail"}) si el proveedor falla a mitad del stream.
+    """
+    user_upn = current_user
+    team = await _check_quota(db, user_upn)
+    ctx = await load_ticket_context(db, sdp_client, user_upn, req.ticket_id)
+    messages, temperature, max_tokens, packer = _reply_messages(ctx, req)
+    # Misma clave que /generate_reply: ambos modos comparten sugerencias cacheadas.
+    cache_key = suggestion_key(
+        "generate_reply", messages, temperature=temperature, max_tokens=max_tokens, deployment=ia_client.deployment
+    )
+    cached = None if req.force_regenerate else await suggestion_cache.get(cache_key)
+
+    async def _events() -> AsyncIterator[str]:
+        started = time.monotonic()
+        parts: List[str] = []
+        usage = TokenUsage()
+        log = IALog(
+            user_upn=user_upn,
+            ticket_id=req.ticket_id,
+            operation="generate_reply_stream",
+            message_type=req.message_type,
+            model=ia_client.deployment,
+            success=False,
+            cache_hit=cached is not None,
+        )
+        _log_prompt(log, messages, packer)
+        try:
+            if cached is not None:
+                log.ttft_ms = 0
+                parts.append(cached)
+                log.success = True
+                yield _sse("token", {"text": cached})
+                yield _sse("done", {"suggested_message": cached, "cached": True})
+                return
+            async for delta in ia_client.stream_reply(
+                messages, temperature=temperature, max_tokens=max_tokens, usage=usage
+            ):
+                if log.ttft_ms is None:
+                    log.ttft_ms = int((time.monotonic() - started) * 1000)
+                parts.append(delta)
+                yield _sse("token", {"text": delta})
+            log.success = True
+            await suggestion_cache.set(cache_key, "".join(parts))
+            yield _sse("done", {"suggested_message": "".join(parts)})
+        except OpenAIError as exc:
+            log.error_message = str(exc)
+            yield _sse("error", {"detail": "ia_provider_error"})
+        except asyncio.CancelledError:
+            log.error_message = "client_disconnected"
+            raise
+        finally:
+            log.response_chars = sum(len(p) for p in parts)
+            log.latency_ms = int((time.monotonic() - started) * 1000)
+            if not log.cache_hit and (usage.reported or parts):
+                # También si el cliente cortó: lo generado hasta ahí se cobra igual.
+                _log_usage(log, usage, ia_client.deployment, team)
+            ia_log_sink.submit(log)
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,20 +1,31 @@
 """Endpoints for tickets list."""
 
+import asyncio
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import CurrentUser
 from app.core.config import settings
-from app.core.email_client import EmailSendError, get_mail_sender_from_db
-from app.core.sdp_client import SdpClient
+from app.core.email_client import get_mail_sender
+from app.core.mail_outbox import enqueue_mail, mail_outbox_worker, message_id_for, new_idempotency_key
+from app.core.sdp_client import SdpClient, get_sdp_client
+from app.core.technicians import resolve_technician_id
+from app.core.ticket_events import decode_cursor, encode_cursor, event_dict, page_ticket_events
+from app.core.ticket_snapshots import (
+    is_gateway_failure,
+    load_snapshot,
+    parse_datetime,
+    refresh_in_background,
+    sync_technician,
+    touch_activity,
+)
 from app.db.session import get_db
+from app.db.ticket_flags import upsert_ticket_flags
 from app.models.services_catalog import ServiceCatalog
-from app.models.ticket_flags import TicketFlags
-from app.models.technician_mapping import TechnicianMapping
 from app.schemas.tickets import (
     ServiceCatalogItem,
     TicketDetail,
@@ -29,39 +40,6 @@ from app.schemas.tickets import (
 router = APIRouter(prefix="/api", tags=["tickets"])
 
 
-def get_sdp_client() -> SdpClient:
-    return SdpClient()
-
-
-async def _resolve_technician_id(db: AsyncSession, user_upn: str) -> str:
-    result = await db.execute(
-        select(TechnicianMapping).where(TechnicianMapping.user_upn == user_upn, TechnicianMapping.active.is_(True))
-    )
-    mapping = result.scalar_one_or_none()
-    if not mapping:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="user_not_configured")
-    return mapping.technician_id_sdp
-
-
-def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
-    if not value:
-        return None
-    # Try ISO first
-    try:
-        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        return dt.astimezone(timezone.utc)
-    except Exception:
-        return None
-
-
-def _select_sla_hours(service_code: Optional[str], priority: Optional[str], comm_default: float) -> float:
-    # Placeholder: service_code is not available from gateway today.
-    # Return default SLA for now.
-    return comm_default
-
-
 def _select_comm_sla(service: Optional[ServiceCatalog], priority: Optional[str], default_hours: float) -> float:
     """Pick SLA from service catalog given priority; fallback to default."""
     if not service:
@@ -90,68 +68,50 @@ def _extract_name(obj: Optional[dict | str]) -> Optional[str]:
 @router.get("/tickets", response_model=TicketsResponse)
 async def list_tickets(
     current_user: CurrentUser,
+    fresh: bool = Query(False, description="Ignora el snapshot y consulta el gateway"),
     db: AsyncSession = Depends(get_db),
     sdp_client: SdpClient = Depends(get_sdp_client),
 ) -> TicketsResponse:
     """Return tickets assigned to the authenticated technician with communication info."""
-    technician_id = await _resolve_technician_id(db, current_user)
+    technician_id = await resolve_technician_id(db, current_user)
+    await touch_activity(db, technician_id, current_user)
+
+    # Último resultado bueno del gateway (lo mantiene ticket_sync_worker y cada consulta en vivo).
+    snapshot = await load_snapshot(db, technician_id)
+    age = None
+    if snapshot is not None:
+        age = (datetime.now(tz=timezone.utc) - snapshot[1]).total_seconds()
+        if not fresh and age <= settings.ticket_snapshot_max_age_seconds:
+            if age > settings.ticket_list_fresh_seconds:
+                refresh_in_background(technician_id)
+            await db.commit()
+            return _snapshot_response(snapshot, age)
 
-    # Call gateway
-    tickets = await sdp_client.get_assigned_requests(technician_id)
-
-    now = datetime.now(tz=timezone.utc)
-    comm_default = settings.comm_sla_default_hours
-    response_items: List[TicketItem] = []
-
-    for t in tickets:
-        service_code = t.get("service_code")
-        if service_code is not None:
-            service_code = str(service_code)
-        # El gateway expone la última comunicación como last_user_contact_at (alias de last_public_reply_time).
-        last_contact_dt = _parse_datetime(t.get("last_user_contact_at") or t.get("last_public_reply_time"))
-        hours_since = None
-        if last_contact_dt:
-            hours_since = (now - last_contact_dt).total_seconds() / 3600
-
-        comm_sla = _select_sla_hours(t.get("service_code"), t.get("priority"), comm_default)
-        is_silent = False
-        if hours_since is not None and comm_sla is not None:
-            is_silent = hours_since >= comm_sla
-
-        # Upsert ticket_flags
-        result = await db.execute(select(TicketFlags).where(TicketFlags.ticket_id == str(t.get("id"))))
-        flags = result.scalar_one_or_none()
-        if not flags:
-            flags = TicketFlags(ticket_id=str(t.get("id")))
-            db.add(flags)
-        flags.display_id = t.get("display_id")
-        flags.service_code = service_code
-        flags.status = t.get("status")
-        flags.priority = t.get("priority")
-        flags.last_user_contact_at = last_contact_dt
-        flags.hours_since_last_user_contact = hours_since
-        flags.communication_sla_hours = comm_sla
-        flags.is_silent = is_silent
-
-        response_items.append(
-            TicketItem(
-                id=str(t.get("id")),
-                display_id=str(t.get("display_id") or t.get("id")),
-                subject=t.get("subject"),
-                requester=t.get("requester"),
-                status=t.get("status"),
-                priority=t.get("priority"),
-                service_code=service_code,
-                last_user_contact_at=last_contact_dt,
-                hours_since_last_user_contact=hours_since,
-                communication_sla_hours=comm_sla,
-                is_silent=is_silent,
-                experience_review_requested=bool(flags.experience_review_requested),
-            )
+    try:
+        items_data, synced_at = await sync_technician(
+            db, sdp_client, technician_id, timeout=settings.ticket_list_gateway_timeout_seconds
         )
-
+    except Exception as exc:
+        if snapshot is None or not is_gateway_failure(exc):
+            if isinstance(exc, asyncio.TimeoutError):
+                raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="gateway_timeout") from exc
+            raise
+        # Degradación: el gateway falló, se sirve el snapshot vencido marcado como stale.
+        await db.commit()
+        return _snapshot_response(snapshot, age, stale=True)
     await db.commit()
-    return TicketsResponse(tickets=response_items)
+    return TicketsResponse(tickets=[TicketItem(**data) for data in items_data], synced_at=synced_at, source="gateway")
+
+
+def _snapshot_response(snapshot: Tuple[List[dict], datetime], age: float, stale: bool = False) -> TicketsResponse:
+    items_data, synced_at = snapshot
+    return TicketsResponse(
+        tickets=[TicketItem(**data) for data in items_data],
+        synced_at=synced_at,
+        source="snapshot",
+        age_seconds=round(age, 1),
+        stale=stale,
+    )
 
 
 async def _get_service_entry(db: AsyncSession, service_code: Optional[str]) -> Optional[ServiceCatalog]:
@@ -176,7 +136,7 @@ async def ticket_detail(
 ) -> TicketDetail:
     """Detalle del ticket combinando gateway, SLA de servicio y flags locales."""
     # Valida que el usuario esté mapeado (aunque no usemos el id aquí).
-    await _resolve_technician_id(db, current_user)
+    await resolve_technician_id(db, current_user)
 
     detail = await sdp_client.get_request_detail(ticket_id)
     if not detail:
@@ -215,7 +175,7 @@ async def ticket_detail(
     site_name = _extract_name(detail.get("site"))
     group_name = _extract_name(detail.get("group"))
 
-    last_contact_dt = _parse_datetime(
+    last_contact_dt = parse_datetime(
         detail.get("last_user_contact_at") or detail.get("last_public_reply_time")
     )
     now = datetime.now(tz=timezone.utc)
@@ -224,19 +184,22 @@ async def ticket_detail(
     is_silent = bool(hours_since is not None and comm_sla is not None and hours_since >= comm_sla)
 
     # Upsert flags
-    result = await db.execute(select(TicketFlags).where(TicketFlags.ticket_id == str(detail.get("id"))))
-    flags = result.scalar_one_or_none()
-    if not flags:
-        flags = TicketFlags(ticket_id=str(detail.get("id")))
-        db.add(flags)
-    flags.display_id = display_id
-    flags.service_code = service_code
-    flags.status = status_name
-    flags.priority = priority_name
-    flags.last_user_contact_at = last_contact_dt
-    flags.hours_since_last_user_contact = hours_since
-    flags.communication_sla_hours = comm_sla
-    flags.is_silent = is_silent
+    review_flags = await upsert_ticket_flags(
+        db,
+        [
+            {
+                "ticket_id": str(detail.get("id")),
+                "display_id": display_id,
+                "service_code": service_code,
+                "status": status_name,
+                "priority": priority_name,
+                "last_user_contact_at": last_contact_dt,
+                "hours_since_last_user_contact": hours_since,
+                "communication_sla_hours": comm_sla,
+                "is_silent": is_silent,
+            }
+        ],
+    )
 
     await db.commit()
 
@@ -251,7 +214,7 @@ async def ticket_detail(
         site=site_name,
         group=group_name,
         technician_id=detail.get("technician_id"),
-        created_time=_parse_datetime(detail.get("created_time")),
+        created_time=parse_datetime(detail.get("created_time")),
         sla=detail.get("sla"),
         service_code=service_code,
         service=service_out,
@@ -259,7 +222,7 @@ async def ticket_detail(
         hours_since_last_user_contact=hours_since,
         communication_sla_hours=comm_sla,
         is_silent=is_silent,
-        experience_review_requested=bool(flags.experience_review_requested),
+        experience_review_requested=review_flags.get(str(detail.get("id")), False),
     )
 
 
@@ -267,31 +230,50 @@ async def ticket_detail(
 async def ticket_history(
     ticket_id: str,
     current_user: CurrentUser,
+    before: Optional[str] = Query(None, description="Cursor: eventos anteriores a este"),
+    after: Optional[str] = Query(None, description="Cursor: eventos posteriores a este"),
+    limit: int = Query(50, ge=1, le=500),
+    visibility: List[str] = Query(default_factory=list),
+    event_type: List[str] = Query(default_factory=list, alias="type"),
+    author_type: List[str] = Query(default_factory=list),
+    db: AsyncSession = Depends(get_db),
     sdp_client: SdpClient = Depends(get_sdp_client),
 ) -> TicketHistoryResponse:
-    """Historial cronológico de eventos del ticket."""
-    events = await sdp_client.get_request_history(ticket_id)
-    # Orden cronológico ascendente por timestamp si viene.
-    def _sort_key(ev: dict) -> float:
-        dt = _parse_datetime(ev.get("timestamp"))
-        return dt.timestamp() if dt else 0.0
-
-    events_sorted = sorted(events, key=_sort_key)
-    parsed_events = [
-        TicketHistoryEvent(
-            event_id=e.get("event_id"),
-            type=e.get("type"),
-            author_name=e.get("author_name"),
-            author_type=e.get("author_type"),
-            visibility=e.get("visibility"),
-            timestamp=_parse_datetime(e.get("timestamp")),
-            text=e.get("text"),
-            old_value=e.get("old_value"),
-            new_value=e.get("new_value"),
-        )
-        for e in events_sorted
-    ]
-    return TicketHistoryResponse(events=parsed_events)
+    """
+    Ventana del historial en orden cronológico (desde ticket_events). Sin cursor
+    devuelve los últimos ``limit`` eventos; ``before``/``after`` paginan hacia
+    atrás/adelante. Filtros repetibles o separados por coma.
+    """
+    if before and after:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="before_and_after_exclusive")
+    try:
+        before_key = decode_cursor(before) if before else None
+        after_key = decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_cursor")
+
+    page = await page_ticket_events(
+        db,
+        sdp_client,
+        ticket_id,
+        limit=limit,
+        before=before_key,
+        after=after_key,
+        visibility=_split_values(visibility),
+        types=_split_values(event_type),
+        author_types=_split_values(author_type),
+    )
+    # Solo se serializa la ventana pedida.
+    return TicketHistoryResponse(
+        events=[TicketHistoryEvent(**event_dict(row)) for row in page.events],
+        has_more=page.has_more,
+        before_cursor=encode_cursor(page.events[0]) if page.events else before,
+        after_cursor=encode_cursor(page.events[-1]) if page.events else after,
+    )
+
+
+def _split_values(values: List[str]) -> List[str]:
+    return [part for value in values for part in value.split(",") if part.strip()]
 
 
 @router.post("/tickets/{ticket_id}/send_reply", response_model=SendReplyResponse)
@@ -301,13 +283,15 @@ async def send_reply(
     current_user: CurrentUser,
     db: AsyncSession = Depends(get_db),
     sdp_client: SdpClient = Depends(get_sdp_client),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
 ):
     """
-    Envía un correo al solicitante (To) y Bcc al buzón SDP configurado.
-    Actualiza flags locales de comunicación.
+    Encola un correo al solicitante (To) y Bcc al buzón SDP configurado.
+    Actualiza flags locales de comunicación en la misma transacción; un worker
+    async lo entrega. Reenviar con el mismo Idempotency-Key no duplica el correo.
     """
     # Valida que el usuario esté mapeado
-    await _resolve_technician_id(db, current_user)
+    await resolve_technician_id(db, current_user)
 
     detail = await sdp_client.get_request_detail(ticket_id)
     if not detail:
@@ -326,29 +310,36 @@ async def send_reply(
     subject = f"[SDP #{display_id}] {detail.get('subject') or ''}".strip()
     plain_body = payload.message
 
-    email_client = await get_mail_sender_from_db(db)
-    try:
-        email_client.send(to=[requester_email], subject=subject, plain_body=plain_body)
-    except EmailSendError as exc:
-        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"email_failed: {exc}") from exc
+    # Falla rápido (500 email_not_configured) si no hay transporte; el envío real lo hace el worker.
+    await get_mail_sender()
+    key = idempotency_key or new_idempotency_key()
+    outbox_id = await enqueue_mail(
+        db,
+        idempotency_key=key,
+        to=[requester_email],
+        subject=subject,
+        plain_body=plain_body,
+        ticket_id=str(detail.get("id") or ticket_id),
+        requested_by=current_user,
+    )
 
-    # Actualizar flags locales
+    # Actualizar flags locales (misma transacción que el outbox)
     now_utc = datetime.now(tz=timezone.utc)
-    result = await db.execute(select(TicketFlags).where(TicketFlags.ticket_id == str(detail.get("id") or ticket_id)))
-    flags = result.scalar_one_or_none()
-    if not flags:
-        flags = TicketFlags(ticket_id=str(detail.get("id") or ticket_id))
-        db.add(flags)
-    flags.last_user_contact_at = now_utc
-    flags.hours_since_last_user_contact = 0.0
-    flags.is_silent = False
-    flags.display_id = display_id
+    flag_row = {
+        "ticket_id": str(detail.get("id") or ticket_id),
+        "last_user_contact_at": now_utc,
+        "hours_since_last_user_contact": 0.0,
+        "is_silent": False,
+        "display_id": display_id,
+    }
     if detail.get("priority"):
-        flags.priority = _extract_name(detail.get("priority"))
+        flag_row["priority"] = _extract_name(detail.get("priority"))
     if detail.get("status"):
-        flags.status = _extract_name(detail.get("status"))
+        flag_row["status"] = _extract_name(detail.get("status"))
     if detail.get("service_code"):
-        flags.service_code = str(detail.get("service_code"))
+        flag_row["service_code"] = str(detail.get("service_code"))
+    await upsert_ticket_flags(db, [flag_row])
     await db.commit()
+    mail_outbox_worker.wake()
 
-    return SendReplyResponse(ok=True)
+    return SendReplyResponse(ok=True, queued=True, outbox_id=outbox_id, message_id=message_id_for(key))
@@ -4,6 +4,8 @@ from typing import Annotated, Optional
 
 from fastapi import Depends, Header, HTTPException, status
 
+from app.core.config import settings
+
 
 async def get_current_user(authorization: Optional[str] = Header(default=None)) -> str:
     """
@@ -21,3 +23,14 @@ async def get_current_user(authorization: Optional[str] = Header(default=None))
 
 
 CurrentUser = Annotated[str, Depends(get_current_user)]
+
+
+async def get_admin_user(current_user: CurrentUser) -> str:
+    """Allow only UPNs listed in ADMIN_UPNS."""
+    admins = {upn.strip().lower() for upn in settings.admin_upns.split(",") if upn.strip()}
+    if current_user.lower() not in admins:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="admin_required")
+    return current_user
+
+
+AdminUser = Annotated[str, Depends(get_admin_user)]
@@ -0,0 +1,334 @@
+"""
+Cache con backends intercambiables: LRU en proceso y tier compartido en Postgres.
+
+El tier compartido es una tabla UNLOGGED (``shared_cache``, migración 0010):
+sin WAL, barata de escribir, y se vacía sola si Postgres se reinicia en caliente,
+lo que es aceptable para datos de cache. Todas las instancias la ven.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Mapping, Optional, Protocol, Sequence, Set, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.shared_cache import SharedCacheEntry
+
+_background: Set["asyncio.Task[Any]"] = set()
+
+
+def _spawn(coro) -> None:  # noqa: ANN001 - coroutine
+    """Fire-and-forget keeping a strong reference until the task finishes."""
+    try:
+        task = asyncio.get_running_loop().create_task(coro)
+    except RuntimeError:  # pragma: no cover - sin loop (scripts): se descarta
+        coro.close()
+        return
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+class CacheBackend(Protocol):
+    """Namespaced key/value cache; values must be JSON-serializable for the shared tier."""
+
+    async def get_many(self, namespace: str, keys: Sequence[str]) -> Dict[str, Any]:
+        ...
+
+    async def set_many(self, namespace: str, items: Mapping[str, Any], ttl_seconds: float) -> None:
+        ...
+
+    async def delete_many(self, namespace: str, keys: Sequence[str]) -> None:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+
+class MemoryCache:
+    """Bounded LRU with a TTL per entry (per worker, no locking needed on the event loop)."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_local(self, namespace: str, key: str) -> Optional[Any]:
+        item = self._entries.get((namespace, key))
+        if item is None or item[0] <= time.monotonic():
+            if item is not None:
+                del self._entries[(namespace, key)]
+            self.misses += 1
+            return None
+        self._entries.move_to_end((namespace, key))
+        self.hits += 1
+        return item[1]
+
+    def set_local(self, namespace: str, key: str, value: Any, ttl_seconds: float) -> None:
+        if ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        self._entries[(namespace, key)] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end((namespace, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_many(self, namespace: str, keys: Sequence[str]) -> Dict[str, Any]:
+        found: Dict[str, Any] = {}
+        for key in keys:
+            value = self.get_local(namespace, key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    async def set_many(self, namespace: str, items: Mapping[str, Any], ttl_seconds: float) -> None:
+        for key, value in items.items():
+            self.set_local(namespace, key, value, ttl_seconds)
+
+    async def delete_many(self, namespace: str, keys: Sequence[str]) -> None:
+        for key in keys:
+            self._entries.pop((namespace, key), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class PostgresCache:
+    """
+    Shared tier on the UNLOGGED ``shared_cache`` table.
+
+    Best effort: every call is bounded by ``timeout_seconds`` and errors are
+    counted and swallowed, so a slow or unavailable DB degrades to a miss.
+    Expired rows are ignored on read and deleted by a periodic sweep.
+    """
+
+    def __init__(self, *, timeout_seconds: float, sweep_interval_seconds: float) -> None:
+        self.timeout_seconds = timeout_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._sweeper: Optional["asyncio.Task[None]"] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+        self.swept = 0
+
+    async def _bounded(self, coro) -> Any:  # noqa: ANN001 - coroutine
+        try:
+            return await asyncio.wait_for(coro, timeout=self.timeout_seconds)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.errors += 1
+            return None
+
+    async def _get_many(self, namespace: str, keys: Sequence[str]) -> Dict[str, Any]:
+        async with SessionLocal() as session:
+            result = await session.execute(
+                select(SharedCacheEntry.key, SharedCacheEntry.value).where(
+                    SharedCacheEntry.namespace == namespace,
+                    SharedCacheEntry.key.in_(list(keys)),
+                    SharedCacheEntry.expires_at > func.now(),
+                )
+            )
+            return {key: value for key, value in result.all()}
+
+    async def get_many(self, namespace: str, keys: Sequence[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        found = await self._bounded(self._get_many(namespace, keys)) or {}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def _set_many(self, namespace: str, items: Mapping[str, Any], ttl_seconds: float) -> None:
+        expires_at = func.now() + timedelta(seconds=ttl_seconds)
+        stmt = insert(SharedCacheEntry).values(
+            [{"namespace": namespace, "key": key, "value": value, "expires_at": expires_at} for key, value in items.items()]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SharedCacheEntry.namespace, SharedCacheEntry.key],
+            set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at, "updated_at": func.now()},
+        )
+        async with SessionLocal() as session:
+            await session.execute(stmt)
+            await session.commit()
+        self.writes += len(items)
+
+    async def set_many(self, namespace: str, items: Mapping[str, Any], ttl_seconds: float) -> None:
+        if items and ttl_seconds > 0:
+            await self._bounded(self._set_many(namespace, items, ttl_seconds))
+
+    async def _delete_many(self, namespace: str, keys: Sequence[str]) -> None:
+        async with SessionLocal() as session:
+            await session.execute(
+                delete(SharedCacheEntry).where(
+                    SharedCacheEntry.namespace == namespace, SharedCacheEntry.key.in_(list(keys))
+                )
+            )
+            await session.commit()
+
+    async def delete_many(self, namespace: str, keys: Sequence[str]) -> None:
+        if keys:
+            await self._bounded(self._delete_many(namespace, keys))
+
+    async def sweep(self) -> int:
+        """Delete expired rows; returns how many were removed."""
+        async with SessionLocal() as session:
+            result = await session.execute(delete(SharedCacheEntry).where(SharedCacheEntry.expires_at <= func.now()))
+            await session.commit()
+        removed = result.rowcount or 0
+        self.swept += removed
+        return removed
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval_seconds)
+            try:
+                await self.sweep()
+            except Exception:  # pragma: no cover - BD caída: siguiente ciclo
+                self.errors += 1
+
+    def start_sweeper(self) -> None:
+        if self._sweeper is None and self.sweep_interval_seconds > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop(), name="shared-cache-sweeper")
+
+    async def stop_sweeper(self) -> None:
+        if self._sweeper is None:
+            return
+        self._sweeper.cancel()
+        try:
+            await self._sweeper
+        except asyncio.CancelledError:
+            pass
+        self._sweeper = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+            "swept": self.swept,
+        }
+
+
+class TieredCache:
+    """
+    Local MemoryCache in front of an optional shared backend.
+
+    Reads go local first and backfill from the shared tier (local copy kept
+    for at most ``local_ttl_seconds`` so instances do not drift for long).
+    Writes hit the local tier immediately; shared writes and deletes run in
+    the background (write-behind) unless ``wait=True``.
+    """
+
+    def __init__(self, local: MemoryCache, shared: Optional[CacheBackend], *, local_ttl_seconds: float) -> None:
+        self.local = local
+        self.shared = shared
+        self.local_ttl_seconds = local_ttl_seconds
+
+    async def get_many(self, namespace: str, keys: Sequence[str]) -> Dict[str, Any]:
+        found = await self.local.get_many(namespace, keys)
+        missing = [key for key in keys if key not in found]
+        if missing and self.shared is not None:
+            remote = await self.shared.get_many(namespace, missing)
+            for key, value in remote.items():
+                self.local.set_local(namespace, key, value, self.local_ttl_seconds)
+            found.update(remote)
+        return found
+
+    async def set_many(
+        self, namespace: str, items: Mapping[str, Any], ttl_seconds: float, *, wait: bool = False
+    ) -> None:
+        for key, value in items.items():
+            self.local.set_local(namespace, key, value, min(ttl_seconds, self.local_ttl_seconds))
+        if self.shared is not None and items:
+            if wait:
+                await self.shared.set_many(namespace, items, ttl_seconds)
+            else:
+                _spawn(self.shared.set_many(namespace, dict(items), ttl_seconds))
+
+    async def delete_many(self, namespace: str, keys: Sequence[str], *, wait: bool = False) -> None:
+        await self.local.delete_many(namespace, keys)
+        if self.shared is not None and keys:
+            if wait:
+                await self.shared.delete_many(namespace, keys)
+            else:
+                _spawn(self.shared.delete_many(namespace, list(keys)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "local": self.local.stats(),
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+
+class CacheNamespace:
+    """A namespace + default TTL bound to a backend: ``ns.get(key)`` / ``ns.set(key, value)``."""
+
+    def __init__(self, backend: Any, name: str, ttl_seconds: float) -> None:
+        self.backend = backend
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self.backend.get_many(self.name, [key])).get(key)
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        return await self.backend.get_many(self.name, keys)
+
+    async def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        await self.set_many({key: value}, ttl_seconds)
+
+    async def set_many(self, items: Mapping[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        await self.backend.set_many(self.name, items, self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+
+    async def delete(self, *keys: str) -> None:
+        await self.backend.delete_many(self.name, list(keys))
+
+    def delete_later(self, *keys: str) -> None:
+        """Schedule a delete without waiting (usable from sync code running on the loop)."""
+        _spawn(self.backend.delete_many(self.name, list(keys)))
+
+    def set_later(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        _spawn(self.set(key, value, ttl_seconds))
+
+
+# Tier compartido: None si SHARED_CACHE_ENABLED=false (cada instancia usa solo su memoria).
+shared_cache: Optional[PostgresCache] = (
+    PostgresCache(
+        timeout_seconds=settings.shared_cache_timeout_seconds,
+        sweep_interval_seconds=settings.shared_cache_sweep_interval_seconds,
+    )
+    if settings.shared_cache_enabled
+    else None
+)
+
+
+def shared_namespace(name: str, ttl_seconds: float) -> Optional[CacheNamespace]:
+    """Namespace on the shared tier only, for callers that already keep their own local cache."""
+    if shared_cache is None:
+        return None
+    return CacheNamespace(shared_cache, name, ttl_seconds)
+
+
+def tiered_namespace(name: str, ttl_seconds: float, *, local_max_entries: int) -> CacheNamespace:
+    """Namespace with its own local LRU and, when enabled, the shared tier behind it."""
+    tiers = TieredCache(
+        MemoryCache(local_max_entries),
+        shared_cache,
+        local_ttl_seconds=settings.shared_cache_local_ttl_seconds if shared_cache is not None else ttl_seconds,
+    )
+    return CacheNamespace(tiers, name, ttl_seconds)
@@ -1,5 +1,7 @@
 """Application settings."""
 
+from typing import Dict
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from sqlalchemy.engine.url import URL, make_url
@@ -19,6 +21,25 @@ class Settings(BaseSettings):
     gateway_base_url: str = Field(default="https://criteria-sdp-api-gw-op.onrender.com", alias="SDP_GATEWAY_URL")
     gateway_client: str = Field(default="Minera Chinalco", alias="SDP_GATEWAY_CLIENT")
     gateway_api_key: str = Field(default="", alias="SDP_GATEWAY_API_KEY")
+    # Pool HTTP compartido hacia el gateway (uno por worker).
+    gateway_timeout_seconds: float = Field(default=30.0, alias="SDP_GATEWAY_TIMEOUT_SECONDS")
+    gateway_connect_timeout_seconds: float = Field(default=10.0, alias="SDP_GATEWAY_CONNECT_TIMEOUT_SECONDS")
+    gateway_max_connections: int = Field(default=50, alias="SDP_GATEWAY_MAX_CONNECTIONS")
+    gateway_max_keepalive_connections: int = Field(default=20, alias="SDP_GATEWAY_MAX_KEEPALIVE_CONNECTIONS")
+    gateway_keepalive_expiry_seconds: float = Field(default=60.0, alias="SDP_GATEWAY_KEEPALIVE_EXPIRY_SECONDS")
+    gateway_http2: bool = Field(default=False, alias="SDP_GATEWAY_HTTP2")
+    # Cache de respuestas del gateway (TTL en segundos; 0 desactiva).
+    gateway_cache_max_entries: int = Field(default=500, alias="SDP_GATEWAY_CACHE_MAX_ENTRIES")
+    gateway_cache_detail_ttl_seconds: float = Field(default=30.0, alias="SDP_GATEWAY_CACHE_DETAIL_TTL_SECONDS")
+    gateway_cache_history_ttl_seconds: float = Field(default=30.0, alias="SDP_GATEWAY_CACHE_HISTORY_TTL_SECONDS")
+    # Historial local (ticket_events): antigüedad máxima antes de re-sincronizar y filtro since_event_id del gateway.
+    ticket_events_sync_ttl_seconds: float = Field(default=30.0, alias="TICKET_EVENTS_SYNC_TTL_SECONDS")
+    gateway_history_incremental: bool = Field(default=True, alias="SDP_GATEWAY_HISTORY_INCREMENTAL")
+    # Tier de cache compartido entre instancias (tabla UNLOGGED shared_cache, migración 0010).
+    shared_cache_enabled: bool = Field(default=False, alias="SHARED_CACHE_ENABLED")
+    shared_cache_timeout_seconds: float = Field(default=0.5, alias="SHARED_CACHE_TIMEOUT_SECONDS")
+    shared_cache_local_ttl_seconds: float = Field(default=15.0, alias="SHARED_CACHE_LOCAL_TTL_SECONDS")
+    shared_cache_sweep_interval_seconds: float = Field(default=300.0, alias="SHARED_CACHE_SWEEP_INTERVAL_SECONDS")
     # Email / O365
     smtp_server: str = Field(default="smtp.office365.com", alias="SMTP_SERVER")
     smtp_port: int = Field(default=587, alias="SMTP_PORT")
@@ -29,19 +50,115 @@ class Settings(BaseSettings):
     smtp_oauth_tenant_id: str = Field(default="", alias="SMTP_OAUTH_TENANT_ID")
     smtp_oauth_client_id: str = Field(default="", alias="SMTP_OAUTH_CLIENT_ID")
     smtp_oauth_client_secret: str = Field(default="", alias="SMTP_OAUTH_CLIENT_SECRET")
+    # Pool de sesiones SMTP autenticadas (por servidor/cuenta).
+    smtp_pool_size: int = Field(default=4, alias="SMTP_POOL_SIZE")
+    smtp_pool_max_messages_per_connection: int = Field(default=50, alias="SMTP_POOL_MAX_MESSAGES_PER_CONNECTION")
+    smtp_pool_idle_timeout_seconds: float = Field(default=60.0, alias="SMTP_POOL_IDLE_TIMEOUT_SECONDS")
+    smtp_pool_noop_after_seconds: float = Field(default=15.0, alias="SMTP_POOL_NOOP_AFTER_SECONDS")
+    # Cache UPN → técnico; NOTIFY invalida antes, el TTL acota si el listener está caído.
+    technician_cache_ttl_seconds: float = Field(default=300.0, alias="TECHNICIAN_CACHE_TTL_SECONDS")
+    db_notify_listener_enabled: bool = Field(default=True, alias="DB_NOTIFY_LISTENER_ENABLED")
+    # Snapshot de settings/persona/org: si el listener NOTIFY está caído, se compara el watermark cada N s.
+    config_poll_interval_seconds: float = Field(default=30.0, alias="CONFIG_POLL_INTERVAL_SECONDS")
+    # Outbox de correo (worker async en cada instancia).
+    mail_outbox_enabled: bool = Field(default=True, alias="MAIL_OUTBOX_ENABLED")
+    mail_outbox_batch_size: int = Field(default=20, alias="MAIL_OUTBOX_BATCH_SIZE")
+    mail_outbox_concurrency: int = Field(default=4, alias="MAIL_OUTBOX_CONCURRENCY")
+    mail_outbox_max_attempts: int = Field(default=6, alias="MAIL_OUTBOX_MAX_ATTEMPTS")
+    mail_outbox_base_backoff_seconds: float = Field(default=10.0, alias="MAIL_OUTBOX_BASE_BACKOFF_SECONDS")
+    mail_outbox_max_backoff_seconds: float = Field(default=900.0, alias="MAIL_OUTBOX_MAX_BACKOFF_SECONDS")
+    mail_outbox_poll_interval_seconds: float = Field(default=5.0, alias="MAIL_OUTBOX_POLL_INTERVAL_SECONDS")
+    mail_outbox_lease_seconds: float = Field(default=300.0, alias="MAIL_OUTBOX_LEASE_SECONDS")
+    # Outbox de notas internas hacia el gateway (write-behind de submit_review).
+    note_outbox_enabled: bool = Field(default=True, alias="NOTE_OUTBOX_ENABLED")
+    note_outbox_batch_size: int = Field(default=20, alias="NOTE_OUTBOX_BATCH_SIZE")
+    note_outbox_concurrency: int = Field(default=4, alias="NOTE_OUTBOX_CONCURRENCY")
+    note_outbox_max_attempts: int = Field(default=10, alias="NOTE_OUTBOX_MAX_ATTEMPTS")
+    note_outbox_base_backoff_seconds: float = Field(default=15.0, alias="NOTE_OUTBOX_BASE_BACKOFF_SECONDS")
+    note_outbox_max_backoff_seconds: float = Field(default=1800.0, alias="NOTE_OUTBOX_MAX_BACKOFF_SECONDS")
+    note_outbox_poll_interval_seconds: float = Field(default=5.0, alias="NOTE_OUTBOX_POLL_INTERVAL_SECONDS")
+    note_outbox_lease_seconds: float = Field(default=120.0, alias="NOTE_OUTBOX_LEASE_SECONDS")
     comm_sla_default_hours: float = Field(default=48.0, alias="COMM_SLA_DEFAULT_HOURS")
+    # Snapshot de tickets asignados: sync en segundo plano con cadencia según actividad del técnico.
+    ticket_sync_enabled: bool = Field(default=True, alias="TICKET_SYNC_ENABLED")
+    ticket_sync_tick_seconds: float = Field(default=5.0, alias="TICKET_SYNC_TICK_SECONDS")
+    ticket_sync_batch_size: int = Field(default=20, alias="TICKET_SYNC_BATCH_SIZE")
+    ticket_sync_concurrency: int = Field(default=4, alias="TICKET_SYNC_CONCURRENCY")
+    ticket_sync_active_interval_seconds: float = Field(default=30.0, alias="TICKET_SYNC_ACTIVE_INTERVAL_SECONDS")
+    ticket_sync_warm_interval_seconds: float = Field(default=120.0, alias="TICKET_SYNC_WARM_INTERVAL_SECONDS")
+    ticket_sync_idle_interval_seconds: float = Field(default=900.0, alias="TICKET_SYNC_IDLE_INTERVAL_SECONDS")
+    ticket_sync_active_window_seconds: float = Field(default=300.0, alias="TICKET_SYNC_ACTIVE_WINDOW_SECONDS")
+    ticket_sync_warm_window_seconds: float = Field(default=3600.0, alias="TICKET_SYNC_WARM_WINDOW_SECONDS")
+    ticket_sync_dormant_after_seconds: float = Field(default=86400.0, alias="TICKET_SYNC_DORMANT_AFTER_SECONDS")
+    ticket_snapshot_max_age_seconds: float = Field(default=900.0, alias="TICKET_SNAPSHOT_MAX_AGE_SECONDS")
+    # Stale-while-revalidate: más nuevo que esto se sirve tal cual; hasta max_age se sirve y se refresca en segundo plano.
+    ticket_list_fresh_seconds: float = Field(default=60.0, alias="TICKET_LIST_FRESH_SECONDS")
+    ticket_list_gateway_timeout_seconds: float = Field(default=8.0, alias="TICKET_LIST_GATEWAY_TIMEOUT_SECONDS")
     azure_openai_endpoint: str = Field(default="", alias="AZURE_OPENAI_ENDPOINT")
     azure_openai_api_key: str = Field(default="", alias="AZURE_OPENAI_API_KEY")
     azure_openai_api_version: str = Field(default="", alias="AZURE_OPENAI_API_VERSION")
     azure_openai_deployment_gpt: str = Field(default="", alias="AZURE_OPENAI_DEPLOYMENT_GPT")
+    azure_openai_timeout_seconds: float = Field(default=60.0, alias="AZURE_OPENAI_TIMEOUT_SECONDS")
+    azure_openai_connect_timeout_seconds: float = Field(default=10.0, alias="AZURE_OPENAI_CONNECT_TIMEOUT_SECONDS")
+    azure_openai_max_connections: int = Field(default=20, alias="AZURE_OPENAI_MAX_CONNECTIONS")
+    azure_openai_max_keepalive_connections: int = Field(default=10, alias="AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS")
+    azure_openai_keepalive_expiry_seconds: float = Field(default=120.0, alias="AZURE_OPENAI_KEEPALIVE_EXPIRY_SECONDS")
+    azure_openai_max_retries: int = Field(default=2, alias="AZURE_OPENAI_MAX_RETRIES")
+    # Pide el uso de tokens en el último chunk del stream (stream_options.include_usage);
+    # Azure lo acepta desde la api-version 2024-09-01-preview, con versiones anteriores no se envía.
+    azure_openai_stream_usage: bool = Field(default=True, alias="AZURE_OPENAI_STREAM_USAGE")
+    # Cache de sugerencias IA por prompt exacto (0 desactiva).
+    ia_suggestion_cache_ttl_seconds: float = Field(default=900.0, alias="IA_SUGGESTION_CACHE_TTL_SECONDS")
+    ia_suggestion_cache_max_entries: int = Field(default=1000, alias="IA_SUGGESTION_CACHE_MAX_ENTRIES")
+    # ia_logs se escribe en lote desde una cola en memoria (fuera del request).
+    ia_log_batch_size: int = Field(default=100, alias="IA_LOG_BATCH_SIZE")
+    ia_log_flush_interval_ms: float = Field(default=500.0, alias="IA_LOG_FLUSH_INTERVAL_MS")
+    ia_log_max_queue: int = Field(default=10000, alias="IA_LOG_MAX_QUEUE")
+    ia_log_delay_warn_ms: float = Field(default=5000.0, alias="IA_LOG_DELAY_WARN_MS")
+    # Mantenimiento de ia_logs particionada: particiones adelantadas, retención y rollups de uso.
+    ia_usage_maintenance_enabled: bool = Field(default=True, alias="IA_USAGE_MAINTENANCE_ENABLED")
+    ia_usage_rollup_interval_seconds: float = Field(default=300.0, alias="IA_USAGE_ROLLUP_INTERVAL_SECONDS")
+    ia_logs_partition_months_ahead: int = Field(default=3, alias="IA_LOGS_PARTITION_MONTHS_AHEAD")
+    ia_logs_retention_months: int = Field(default=12, alias="IA_LOGS_RETENTION_MONTHS")  # 0 = sin retención
+    ia_logs_drop_detached: bool = Field(default=False, alias="IA_LOGS_DROP_DETACHED")
+    # Presupuesto de tokens del prompt IA (system + user) y tope por mensaje/sección; las claves
+    # max_prompt_tokens / max_item_tokens_in_prompt de la tabla settings tienen prioridad.
+    ia_prompt_max_tokens: int = Field(default=6000, alias="IA_PROMPT_MAX_TOKENS")
+    ia_prompt_max_item_tokens: int = Field(default=800, alias="IA_PROMPT_MAX_ITEM_TOKENS")
+    # Limpieza de la conversación para prompts: memo por hash de texto y pool de procesos
+    # para historiales grandes (IA_CLEAN_WORKERS=0 limpia en un hilo).
+    ia_clean_cache_max_entries: int = Field(default=5000, alias="IA_CLEAN_CACHE_MAX_ENTRIES")
+    ia_clean_offload_chars: int = Field(default=200000, alias="IA_CLEAN_OFFLOAD_CHARS")
+    ia_clean_workers: int = Field(default=2, alias="IA_CLEAN_WORKERS")
+    # Precios USD por millón de tokens por deployment (JSON), p. ej.
+    # {"gpt-4o": {"prompt": 2.5, "cached_prompt": 1.25, "completion": 10}}.
+    ia_prices_per_million: Dict[str, Dict[str, float]] = Field(default_factory=dict, alias="IA_PRICES_PER_MILLION")
+    # Cuotas de tokens IA en ventana deslizante (0 = sin límite); el equipo sale de technician_mapping.team.
+    ia_quota_window_seconds: float = Field(default=3600.0, alias="IA_QUOTA_WINDOW_SECONDS")
+    ia_quota_user_tokens: int = Field(default=0, alias="IA_QUOTA_USER_TOKENS")
+    ia_quota_team_tokens: int = Field(default=0, alias="IA_QUOTA_TEAM_TOKENS")
+    ia_quota_refresh_seconds: float = Field(default=15.0, alias="IA_QUOTA_REFRESH_SECONDS")
     # Microsoft Graph (correo sin SMTP básico)
     graph_tenant_id: str = Field(default="", alias="GRAPH_TENANT_ID")
     graph_client_id: str = Field(default="", alias="GRAPH_CLIENT_ID")
     graph_client_secret: str = Field(default="", alias="GRAPH_CLIENT_SECRET")
     graph_sender: str = Field(default="", alias="GRAPH_SENDER")
+    # Tokens OAuth (Graph / SMTP XOAUTH2): se renuevan en segundo plano N s antes de expirar.
+    oauth_token_refresh_margin_seconds: float = Field(default=300.0, alias="OAUTH_TOKEN_REFRESH_MARGIN_SECONDS")
     # Experiencia / reviews
     review_token_secret: str = Field(default="", alias="REVIEW_TOKEN_SECRET")
     experience_review_token_ttl_hours: int = Field(default=24, alias="EXPERIENCE_REVIEW_TOKEN_TTL_HOURS")
+    review_link_base_url: str = Field(default="http://localhost:5173/experience/review", alias="REVIEW_LINK_BASE_URL")
+    # Invitaciones masivas de review (job admin, envío por Graph $batch). Requiere que el gateway
+    # exponga GET /request/closed (aún no existe): apagado, los endpoints responden 501.
+    review_invitations_enabled: bool = Field(default=False, alias="REVIEW_INVITATIONS_ENABLED")
+    review_invitation_page_size: int = Field(default=100, alias="REVIEW_INVITATION_PAGE_SIZE")
+    review_invitation_batch_concurrency: int = Field(default=2, alias="REVIEW_INVITATION_BATCH_CONCURRENCY")
+    review_invitation_batch_interval_seconds: float = Field(default=1.0, alias="REVIEW_INVITATION_BATCH_INTERVAL_SECONDS")
+    review_invitation_max_attempts: int = Field(default=5, alias="REVIEW_INVITATION_MAX_ATTEMPTS")
+    review_invitation_lease_seconds: float = Field(default=300.0, alias="REVIEW_INVITATION_LEASE_SECONDS")
+    # UPNs (separados por coma) con acceso a /api/admin.
+    admin_upns: str = Field(default="", alias="ADMIN_UPNS")
 
     def sanitized_database_url(self) -> str:
         """Return DB URL without unsupported sslmode query parameter."""
@@ -0,0 +1,202 @@
+"""Snapshot inmutable de settings, persona_config y org_profile."""
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.org_profile import OrgProfile
+from app.models.persona_config import PersonaConfig
+from app.models.settings import Setting
+
+# Canal emitido por los triggers de la migración 0006 (payload = nombre de la tabla).
+CONFIG_CHANNEL = "copilot_config"
+
+Watermark = Tuple[Any, ...]
+
+
+@dataclass(frozen=True)
+class PersonaSnapshot:
+    id: int
+    role_description: Optional[str]
+    tone_attributes: Any
+    rules: Any
+    max_reply_length: Optional[int]
+    system_prompt_template: Optional[str]
+
+
+@dataclass(frozen=True)
+class OrgSnapshot:
+    id: int
+    industry: Optional[str]
+    context: Optional[str]
+    critical_services: Any
+    tone_notes: Optional[str]
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Read-only view of the configuration tables at a given version."""
+
+    version: int
+    loaded_at: datetime
+    watermark: Watermark
+    settings: Mapping[str, Any] = field(default_factory=lambda: MappingProxyType({}))
+    persona: Optional[PersonaSnapshot] = None
+    org: Optional[OrgSnapshot] = None
+
+    def setting(self, key: str, default: Any = None) -> Any:
+        return self.settings.get(key, default)
+
+    def require_persona(self) -> PersonaSnapshot:
+        if self.persona is None:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="persona_not_configured")
+        return self.persona
+
+    def require_org(self) -> OrgSnapshot:
+        if self.org is None:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="org_profile_not_configured")
+        return self.org
+
+
+def _watermark_query():
+    return select(
+        select(func.max(Setting.updated_at)).scalar_subquery(),
+        select(func.count(Setting.id)).scalar_subquery(),
+        select(func.max(PersonaConfig.updated_at)).scalar_subquery(),
+        select(func.count(PersonaConfig.id)).scalar_subquery(),
+        select(func.max(OrgProfile.updated_at)).scalar_subquery(),
+        select(func.count(OrgProfile.id)).scalar_subquery(),
+    )
+
+
+async def _read_watermark(db: AsyncSession) -> Watermark:
+    return tuple((await db.execute(_watermark_query())).one())
+
+
+class ConfigStore:
+    """
+    Serves the current ConfigSnapshot without touching the DB on the hot path.
+
+    A reload happens on first use, after a NOTIFY on ``copilot_config`` and,
+    while the NOTIFY listener is down, when the periodic watermark check
+    (max(updated_at) + count per table) detects a change.
+    """
+
+    def __init__(self, poll_interval_seconds: float) -> None:
+        self.poll_interval_seconds = poll_interval_seconds
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._dirty = True
+        self._lock = asyncio.Lock()
+        self._poll_task: Optional["asyncio.Task[None]"] = None
+        self.reloads = 0
+
+    @property
+    def snapshot(self) -> Optional[ConfigSnapshot]:
+        return self._snapshot
+
+    async def get(self) -> ConfigSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not self._dirty:
+            return snapshot
+        return await self.reload()
+
+    async def reload(self, *, force: bool = False) -> ConfigSnapshot:
+        async with self._lock:
+            # Otro waiter ya recargó mientras esperábamos el lock.
+            if self._snapshot is not None and not self._dirty and not force:
+                return self._snapshot
+            self._dirty = False
+            try:
+                async with SessionLocal() as session:
+                    self._snapshot = await self._load(session)
+            except Exception:
+                self._dirty = True
+                raise
+            self.reloads += 1
+            return self._snapshot
+
+    async def _load(self, db: AsyncSession) -> ConfigSnapshot:
+        watermark = await _read_watermark(db)
+        rows = (await db.execute(select(Setting))).scalars().all()
+        persona_row = (
+            await db.execute(
+                select(PersonaConfig).where(PersonaConfig.active.is_(True)).order_by(PersonaConfig.id.desc()).limit(1)
+            )
+        ).scalar_one_or_none()
+        org_row = (await db.execute(select(OrgProfile).order_by(OrgProfile.id.asc()).limit(1))).scalar_one_or_none()
+
+        persona = None
+        if persona_row is not None:
+            persona = PersonaSnapshot(
+                id=persona_row.id,
+                role_description=persona_row.role_description,
+                tone_attributes=persona_row.tone_attributes,
+                rules=persona_row.rules,
+                max_reply_length=persona_row.max_reply_length,
+                system_prompt_template=persona_row.system_prompt_template,
+            )
+        org = None
+        if org_row is not None:
+            org = OrgSnapshot(
+                id=org_row.id,
+                industry=org_row.industry,
+                context=org_row.context,
+                critical_services=org_row.critical_services,
+                tone_notes=org_row.tone_notes,
+            )
+        previous = self._snapshot
+        return ConfigSnapshot(
+            version=(previous.version + 1) if previous else 1,
+            loaded_at=datetime.now(tz=timezone.utc),
+            watermark=watermark,
+            settings=MappingProxyType({row.key: row.value for row in rows}),
+            persona=persona,
+            org=org,
+        )
+
+    def invalidate(self, _payload: str = "") -> None:
+        """NOTIFY handler: the next get() reloads."""
+        self._dirty = True
+
+    async def _poll(self, listener_connected) -> None:  # noqa: ANN001 - callable() -> bool
+        while True:
+            await asyncio.sleep(self.poll_interval_seconds)
+            if listener_connected() or self._snapshot is None:
+                continue
+            try:
+                async with SessionLocal() as session:
+                    watermark = await _read_watermark(session)
+                if watermark != self._snapshot.watermark:
+                    self._dirty = True
+            except Exception:  # pragma: no cover - DB caída: seguimos con el snapshot actual
+                pass
+
+    def start_polling(self, listener_connected) -> None:  # noqa: ANN001
+        if self._poll_task is None and self.poll_interval_seconds > 0:
+            self._poll_task = asyncio.create_task(self._poll(listener_connected), name="config-watermark-poll")
+
+    async def stop(self) -> None:
+        if self._poll_task is None:
+            return
+        self._poll_task.cancel()
+        try:
+            await self._poll_task
+        except asyncio.CancelledError:
+            pass
+        self._poll_task = None
+
+
+config_store = ConfigStore(poll_interval_seconds=settings.config_poll_interval_seconds)
+
+
+async def get_config() -> ConfigSnapshot:
+    """Current configuration snapshot (also usable as a FastAPI dependency)."""
+    return await config_store.get()
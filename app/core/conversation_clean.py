@@ -0,0 +1,282 @@
+"""
+Limpieza de la conversación de un ticket antes de llevarla a los prompts IA.
+
+Los cuerpos de correo llegan con HTML, respuestas citadas, firmas, avisos de
+confidencialidad y banners repetidos. Cada texto se limpia una sola vez
+(memoizado por hash del contenido) y luego se quitan los eventos casi
+duplicados. La limpieza corre en un hilo, y los historiales muy grandes en un
+pool de procesos (creado en el lifespan), para no bloquear el event loop.
+"""
+
+import asyncio
+import hashlib
+import html
+import multiprocessing
+import re
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from app.core.config import settings
+
+_BLOCK_TAG_RE = re.compile(r"<\s*(?:br|/p|/div|/li|/tr)\s*/?\s*>", re.IGNORECASE)
+_STRIP_BLOCK_RE = re.compile(r"<\s*(style|script|head)\b.*?<\s*/\s*\1\s*>", re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACES_RE = re.compile(r"[ \t\f\v]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+# Desde aquí todo es la respuesta citada.
+_QUOTE_START_RE = re.compile(
+    r"^\s*(?:"
+    r"-{2,}\s*(?:original message|mensaje original|forwarded message|mensaje reenviado)\s*-{2,}"
+    r"|(?:on|el)\s.{0,200}\s(?:wrote|escribió):\s*"
+    r"|_{10,}\s*"
+    r")$",
+    re.IGNORECASE,
+)
+_OUTLOOK_FROM_RE = re.compile(r"^\s*\*?(?:from|de)\s*:\*?\s", re.IGNORECASE)
+_OUTLOOK_HEADER_RE = re.compile(r"^\s*\*?(?:sent|enviado el|enviado|date|fecha|to|para|subject|asunto)\s*:", re.IGNORECASE)
+_QUOTED_LINE_RE = re.compile(r"^\s*>")
+# Firma: delimitador estándar, "enviado desde mi…" o despedida seguida de pocas líneas.
+_SIGNATURE_START_RE = re.compile(
+    r"^\s*(?:--\s*|(?:enviado desde mi|sent from my|obtener outlook para|get outlook for)\b.*)$", re.IGNORECASE
+)
+_CLOSING_RE = re.compile(
+    r"^\s*(?:saludos(?: cordiales)?|atentamente|cordialmente|un saludo|quedo atento|quedo atenta"
+    r"|best regards|kind regards|regards|thanks and regards)[,.!]*\s*$",
+    re.IGNORECASE,
+)
+_SIGNATURE_MAX_LINES = 10
+_DISCLAIMER_RE = re.compile(
+    r"(?:aviso de confidencialidad|aviso legal|confidentiality notice|disclaimer"
+    r"|este (?:mensaje|correo)[^\n]{0,120}(?:confidencial|destinatario)"
+    r"|this (?:e-?mail|message)[^\n]{0,120}(?:confidential|intended recipient)"
+    r"|antes de imprimir (?:este|esta) (?:mensaje|correo|e-?mail)|piense en el medio ambiente"
+    r"|please consider the environment)",
+    re.IGNORECASE,
+)
+# Largo mínimo para tratar como aviso un párrafo que solo menciona la fórmula (o la trae en medio del texto).
+_DISCLAIMER_MIN_CHARS = 120
+_BANNER_RE = re.compile(
+    r"^\s*\[?(?:external|externo|caution|precaución|precaucion)\]?\s*[:\-].{0,300}$", re.IGNORECASE
+)
+_NON_WORD_RE = re.compile(r"\W+")
+
+# Eventos más cortos que esto no se comparan como casi duplicados ("ok", "gracias").
+_DEDUPE_MIN_CHARS = 40
+_DEDUPE_WINDOW = 20
+_DEDUPE_THRESHOLD = 0.9
+
+
+def clean_text(value: Any) -> Optional[str]:
+    """Plain text from a gateway event body: HTML tags/entities removed, whitespace collapsed."""
+    if value is None:
+        return None
+    text = str(value)
+    if "<" in text and ">" in text:
+        text = _TAG_RE.sub("", _BLOCK_TAG_RE.sub("\n", _STRIP_BLOCK_RE.sub("", text)))
+    text = html.unescape(text).replace("\r\n", "\n").replace("\r", "\n").replace("\xa0", " ")
+    lines = [_SPACES_RE.sub(" ", line).strip() for line in text.split("\n")]
+    text = _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+    return text or None
+
+
+def _quote_start(lines: List[str]) -> Optional[int]:
+    for i, line in enumerate(lines):
+        if _QUOTE_START_RE.match(line):
+            return i
+        if _OUTLOOK_FROM_RE.match(line) and any(_OUTLOOK_HEADER_RE.match(l) for l in lines[i + 1 : i + 5]):
+            return i
+    return None
+
+
+def _signature_start(lines: List[str]) -> Optional[int]:
+    for i, line in enumerate(lines):
+        if _SIGNATURE_START_RE.match(line):
+            return i
+        if _CLOSING_RE.match(line) and len(lines) - i - 1 <= _SIGNATURE_MAX_LINES:
+            return i
+    return None
+
+
+def _drop_disclaimers(paragraphs: List[str]) -> List[str]:
+    """
+    Remove confidentiality/legal boilerplate. At the end of the message (never
+    the first paragraph) a paragraph goes if it starts with the boilerplate or
+    is long and mentions it; elsewhere only long paragraphs that start with it.
+    """
+
+    def _trailing_disclaimer(p: str) -> bool:
+        return bool(_DISCLAIMER_RE.match(p) or (len(p) >= _DISCLAIMER_MIN_CHARS and _DISCLAIMER_RE.search(p)))
+
+    end = len(paragraphs)
+    while end > 1 and _trailing_disclaimer(paragraphs[end - 1]):
+        end -= 1
+    return [p for p in paragraphs[:end] if not (len(p) >= _DISCLAIMER_MIN_CHARS and _DISCLAIMER_RE.match(p))]
+
+
+def clean_message(value: Any) -> Optional[str]:
+    """
+    Prompt-ready text of one message: HTML to text, quoted replies, signatures,
+    disclaimers and external-mail banners removed, whitespace collapsed. A
+    message that is only a quote/forward is kept as is.
+    """
+    text = clean_text(value)
+    if not text:
+        return text
+    lines = [line for line in text.split("\n") if not _BANNER_RE.match(line)]
+    for find in (_quote_start, _signature_start):
+        cut = find(lines)
+        if cut is not None and any(line.strip() for line in lines[:cut]):
+            lines = lines[:cut]
+    lines = [line for line in lines if not _QUOTED_LINE_RE.match(line)]
+    paragraphs = [p.strip() for p in "\n".join(lines).split("\n\n") if p.strip()]
+    return clean_text("\n\n".join(_drop_disclaimers(paragraphs)))
+
+
+def clean_many(texts: Sequence[str]) -> List[Optional[str]]:
+    """Batch entry point for the worker processes."""
+    return [clean_message(text) for text in texts]
+
+
+def _shingles(text: str) -> Set[str]:
+    words = _NON_WORD_RE.sub(" ", text.lower()).split()
+    if len(words) < 3:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + 3]) for i in range(len(words) - 2)}
+
+
+def drop_near_duplicates(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop events whose text repeats (Jaccard of word 3-grams ≥ 0.9) one of the recent kept ones."""
+    kept: List[Dict[str, Any]] = []
+    recent: List[Set[str]] = []
+    for event in events:
+        text = event.get("text") or ""
+        if len(text) >= _DEDUPE_MIN_CHARS:
+            shingles = _shingles(text)
+            if any(len(shingles & seen) >= _DEDUPE_THRESHOLD * len(shingles | seen) for seen in recent):
+                continue
+            recent = (recent + [shingles])[-_DEDUPE_WINDOW:]
+        kept.append(event)
+    return kept
+
+
+class ConversationCleaner:
+    """Memoized ``clean_message`` over whole histories, offloading big batches to a process pool."""
+
+    def __init__(self, *, max_entries: int, offload_chars: int, workers: int) -> None:
+        self.max_entries = max_entries
+        self.offload_chars = offload_chars
+        self.workers = workers
+        self._memo: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._pool: Optional[Executor] = None
+        self.hits = 0
+        self.misses = 0
+        self.offloaded = 0
+        self.duplicates = 0
+        self.chars_in = 0
+        self.chars_out = 0
+
+    @staticmethod
+    def _key(text: str) -> str:
+        # Por contenido y no por event_id: un evento editado conserva su id.
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, cleaned: Optional[str]) -> None:
+        self._memo[key] = cleaned
+        self._memo.move_to_end(key)
+        while len(self._memo) > self.max_entries:
+            self._memo.popitem(last=False)
+
+    async def _clean_batch(self, texts: List[str]) -> List[Optional[str]]:
+        # Lotes chicos en un hilo (las regex no bloquean el event loop); los grandes, en el pool.
+        if self._pool is None or sum(len(text) for text in texts) < self.offload_chars:
+            return await asyncio.to_thread(clean_many, texts)
+        self.offloaded += 1
+        loop = asyncio.get_running_loop()
+        size = -(-len(texts) // self.workers)
+        chunks = [texts[i : i + size] for i in range(0, len(texts), size)]
+        try:
+            results = await asyncio.gather(*(loop.run_in_executor(self._pool, clean_many, c) for c in chunks))
+        except BrokenProcessPool:
+            # Proceso muerto: se recrea el pool y este lote se limpia en un hilo.
+            self.shutdown()
+            self.start()
+            return await asyncio.to_thread(clean_many, texts)
+        return [cleaned for chunk in results for cleaned in chunk]
+
+    async def clean_history(self, events: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Copies of the events with cleaned ``text``, without near-duplicates or messages left empty."""
+        keys: List[Optional[str]] = []
+        resolved: Dict[str, Optional[str]] = {}
+        pending: Dict[str, str] = {}
+        for event in events:
+            text = event.get("text")
+            key = self._key(text) if text else None
+            keys.append(key)
+            if key is None or key in resolved or key in pending:
+                continue
+            if key in self._memo:
+                self.hits += 1
+                self._memo.move_to_end(key)
+                resolved[key] = self._memo[key]
+            else:
+                self.misses += 1
+                pending[key] = text  # type: ignore[assignment]
+        if pending:
+            cleaned = await self._clean_batch(list(pending.values()))
+            for key, value in zip(pending, cleaned):
+                self._remember(key, value)
+                resolved[key] = value
+
+        result: List[Dict[str, Any]] = []
+        for event, key in zip(events, keys):
+            if key is None:
+                result.append(dict(event))
+                continue
+            text = resolved[key]
+            if not text:
+                continue
+            self.chars_in += len(event["text"])
+            self.chars_out += len(text)
+            result.append({**event, "text": text})
+        deduped = drop_near_duplicates(result)
+        self.duplicates += len(result) - len(deduped)
+        return deduped
+
+    def start(self) -> None:
+        """
+        Create the worker pool (lifespan). Uses ``spawn``: forking this process
+        would copy its threads, sockets and connection pools into the workers.
+        """
+        if self._pool is None and self.workers > 0:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            # Arranca los procesos ahora y no en el primer historial grande.
+            for _ in range(self.workers):
+                self._pool.submit(clean_many, [])
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._memo),
+            "hits": self.hits,
+            "misses": self.misses,
+            "offloaded": self.offloaded,
+            "duplicates": self.duplicates,
+            "chars_in": self.chars_in,
+            "chars_out": self.chars_out,
+        }
+
+
+conversation_cleaner = ConversationCleaner(
+    max_entries=settings.ia_clean_cache_max_entries,
+    offload_chars=settings.ia_clean_offload_chars,
+    workers=settings.ia_clean_workers,
+)
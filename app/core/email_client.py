@@ -2,30 +2,101 @@
 
 from __future__ import annotations
 
+import asyncio
 import base64
 import smtplib
 from dataclasses import dataclass
 from email.message import EmailMessage
-from time import time
-from typing import Iterable, Optional, Protocol
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Sequence
 
 import httpx
 from fastapi import HTTPException, status
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.models.settings import Setting
+from app.core.config_store import get_config
+from app.core.oauth_tokens import ClientCredentials, OAuthTokenCache, OAuthTokenError
+from app.core.smtp_pool import get_smtp_pool
 
 
 class EmailSendError(Exception):
     """Raised when email delivery fails."""
 
 
+@dataclass
+class OutgoingMail:
+    to: List[str]
+    subject: str
+    plain_body: str
+    html_body: Optional[str] = None
+    message_id: Optional[str] = None
+
+
+@dataclass
+class BatchItemResult:
+    ok: bool
+    error: Optional[str] = None
+    # Segundos sugeridos por el servidor (429/503): el mensaje no se envió pero puede reintentarse.
+    retry_after: Optional[float] = None
+
+
+# Máximo de requests por llamada a Graph JSON batching.
+GRAPH_BATCH_LIMIT = 20
+
+
 class MailSender(Protocol):
     def send(self, to: Iterable[str], subject: str, plain_body: str, html_body: Optional[str] = None) -> None:
         ...
 
+    async def asend(
+        self,
+        to: Iterable[str],
+        subject: str,
+        plain_body: str,
+        html_body: Optional[str] = None,
+        *,
+        message_id: Optional[str] = None,
+    ) -> None:
+        ...
+
+    async def asend_batch(self, mails: Sequence[OutgoingMail]) -> List[BatchItemResult]:
+        ...
+
+
+# Pool async compartido para Graph (y token endpoints); se cierra en el shutdown de la app.
+_mail_http: Optional[httpx.AsyncClient] = None
+
+
+def get_mail_http_client() -> httpx.AsyncClient:
+    global _mail_http
+    if _mail_http is None or _mail_http.is_closed:
+        _mail_http = httpx.AsyncClient(timeout=httpx.Timeout(15, connect=10))
+    return _mail_http
+
+
+async def close_mail_http_client() -> None:
+    global _mail_http
+    if _mail_http is not None:
+        await _mail_http.aclose()
+    _mail_http = None
+
+
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+GRAPH_BATCH_URL = "https://graph.microsoft.com/v1.0/$batch"
+SMTP_SCOPE = "https://outlook.office365.com/.default"
+
+# Compartido por todos los senders: recargar la config o crear un cliente nuevo no pierde tokens válidos.
+token_cache = OAuthTokenCache(
+    get_mail_http_client,
+    refresh_margin_seconds=settings.oauth_token_refresh_margin_seconds,
+)
+
+
+def _retry_after(value: Optional[str], default: float = 10.0) -> float:
+    try:
+        return max(float(value), 0.0) if value is not None else default
+    except ValueError:
+        return default
+
 
 # ---------- SMTP ----------
 
@@ -48,75 +119,115 @@ class EmailConfig:
 
 
 class EmailClient:
-    """SMTP client with basic auth or OAuth2 XOAUTH2."""
+    """SMTP client with basic auth or OAuth2 XOAUTH2 over pooled sessions (see smtp_pool)."""
 
     def __init__(self, config: EmailConfig):
         self.cfg = config
-        self._oauth_token: Optional[str] = None
-        self._token_expires_at: Optional[float] = None
 
-    def send(
+    @property
+    def credentials(self) -> ClientCredentials:
+        return ClientCredentials(
+            tenant_id=self.cfg.oauth_tenant_id or "",
+            client_id=self.cfg.oauth_client_id or "",
+            client_secret=self.cfg.oauth_client_secret or "",
+            scope=SMTP_SCOPE,
+        )
+
+    def _build_message(
         self,
         to: Iterable[str],
         subject: str,
         plain_body: str,
-        html_body: Optional[str] = None,
-    ) -> None:
+        html_body: Optional[str],
+        message_id: Optional[str],
+    ) -> EmailMessage:
         msg = EmailMessage()
         msg["From"] = self.cfg.sender or self.cfg.username
         msg["To"] = ",".join([x for x in to if x])
         if self.cfg.bcc:
             msg["Bcc"] = self.cfg.bcc
         msg["Subject"] = subject
+        if message_id:
+            msg["Message-ID"] = message_id
         msg.set_content(plain_body)
         if html_body:
             msg.add_alternative(html_body, subtype="html")
+        return msg
+
+    def _deliver(self, msg: EmailMessage, token: Optional[str]) -> None:
+        def authenticate(smtp: smtplib.SMTP) -> None:
+            # Solo al abrir una sesión nueva; las reutilizadas ya están autenticadas.
+            if self.cfg.use_oauth:
+                self._authenticate_xoauth2(smtp, token or self._ensure_token())
+            else:
+                smtp.login(self.cfg.username, self.cfg.password)
 
+        pool = get_smtp_pool(self.cfg.server, self.cfg.port, self.cfg.username, self.cfg.use_oauth)
         try:
-            with smtplib.SMTP(self.cfg.server, self.cfg.port, timeout=15) as smtp:
-                smtp.starttls()
-                if self.cfg.use_oauth:
-                    token = self._ensure_token()
-                    self._authenticate_xoauth2(smtp, token)
-                else:
-                    smtp.login(self.cfg.username, self.cfg.password)
-                smtp.send_message(msg)
+            pool.send_message(msg, authenticate)
+        except EmailSendError:
+            raise
         except Exception as exc:  # pragma: no cover - external dependency
             raise EmailSendError(str(exc)) from exc
 
+    def send(
+        self,
+        to: Iterable[str],
+        subject: str,
+        plain_body: str,
+        html_body: Optional[str] = None,
+        *,
+        message_id: Optional[str] = None,
+    ) -> None:
+        self._deliver(self._build_message(to, subject, plain_body, html_body, message_id), None)
+
+    async def asend(
+        self,
+        to: Iterable[str],
+        subject: str,
+        plain_body: str,
+        html_body: Optional[str] = None,
+        *,
+        message_id: Optional[str] = None,
+    ) -> None:
+        """smtplib es bloqueante: se ejecuta en un hilo; el token se obtiene antes, en el event loop."""
+        token = await self._aensure_token() if self.cfg.use_oauth else None
+        msg = self._build_message(list(to), subject, plain_body, html_body, message_id)
+        await asyncio.to_thread(self._deliver, msg, token)
+
+    async def asend_batch(self, mails: Sequence[OutgoingMail]) -> List[BatchItemResult]:
+        """SMTP no tiene batch: envío secuencial sobre la sesión del pool."""
+        results: List[BatchItemResult] = []
+        for mail in mails:
+            try:
+                await self.asend(mail.to, mail.subject, mail.plain_body, mail.html_body, message_id=mail.message_id)
+            except EmailSendError as exc:
+                results.append(BatchItemResult(ok=False, error=str(exc) or "email_send_error"))
+            else:
+                results.append(BatchItemResult(ok=True))
+        return results
+
     def _ensure_token(self) -> str:
-        if self._oauth_token and self._token_expires_at and time() < self._token_expires_at - 60:
-            return self._oauth_token
-        token, expires_in = self._fetch_oauth_token()
-        self._oauth_token = token
-        self._token_expires_at = time() + expires_in
-        return token
-
-    def _fetch_oauth_token(self) -> tuple[str, int]:
         if not self.cfg.use_oauth:
             raise EmailSendError("oauth_not_configured")
-        resp = httpx.post(
-            f"https://login.microsoftonline.com/{self.cfg.oauth_tenant_id}/oauth2/v2.0/token",
-            data={
-                "client_id": self.cfg.oauth_client_id,
-                "client_secret": self.cfg.oauth_client_secret,
-                "scope": "https://outlook.office365.com/.default",
-                "grant_type": "client_credentials",
-            },
-            timeout=10,
-        )
         try:
-            resp.raise_for_status()
-        except Exception as exc:
+            return token_cache.get_token_sync(self.credentials)
+        except OAuthTokenError as exc:
+            raise EmailSendError(f"oauth_token_error: {exc}") from exc
+
+    async def _aensure_token(self) -> str:
+        try:
+            return await token_cache.get_token(self.credentials)
+        except OAuthTokenError as exc:
             raise EmailSendError(f"oauth_token_error: {exc}") from exc
-        data = resp.json()
-        return data["access_token"], int(data.get("expires_in", 3600))
 
     def _authenticate_xoauth2(self, smtp, token: str) -> None:
         auth_string = base64.b64encode(
             f"user={self.cfg.username}\x01auth=Bearer {token}\x01\x01".encode("utf-8")
         ).decode("utf-8")
-        smtp.docmd("AUTH", "XOAUTH2 " + auth_string)
+        code, resp = smtp.docmd("AUTH", "XOAUTH2 " + auth_string)
+        if code != 235:
+            raise smtplib.SMTPAuthenticationError(code, resp)
 
 
 # ---------- Graph ----------
@@ -139,15 +250,24 @@ class GraphMailClient:
 
     def __init__(self, config: GraphConfig):
         self.cfg = config
-        self._token: Optional[str] = None
-        self._token_expires_at: Optional[float] = None
 
-    def send(self, to: Iterable[str], subject: str, plain_body: str, html_body: Optional[str] = None) -> None:
-        token = self._ensure_token()
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json",
-        }
+    @property
+    def credentials(self) -> ClientCredentials:
+        return ClientCredentials(
+            tenant_id=self.cfg.tenant_id,
+            client_id=self.cfg.client_id,
+            client_secret=self.cfg.client_secret,
+            scope=GRAPH_SCOPE,
+        )
+
+    def _build_payload(
+        self,
+        to: Iterable[str],
+        subject: str,
+        plain_body: str,
+        html_body: Optional[str],
+        message_id: Optional[str],
+    ) -> dict:
         body_content = {
             "contentType": "HTML" if html_body else "Text",
             "content": html_body or plain_body,
@@ -157,42 +277,128 @@ class GraphMailClient:
             "body": body_content,
             "toRecipients": [{"emailAddress": {"address": addr}} for addr in to if addr],
         }
-        payload = {"message": message, "saveToSentItems": "true"}
-        url = f"https://graph.microsoft.com/v1.0/users/{self.cfg.sender}/sendMail"
+        if message_id:
+            message["internetMessageId"] = message_id
+        return {"message": message, "saveToSentItems": "true"}
+
+    @property
+    def send_url(self) -> str:
+        return f"https://graph.microsoft.com/v1.0/users/{self.cfg.sender}/sendMail"
+
+    def send(
+        self,
+        to: Iterable[str],
+        subject: str,
+        plain_body: str,
+        html_body: Optional[str] = None,
+        *,
+        message_id: Optional[str] = None,
+    ) -> None:
+        token = self._ensure_token()
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+        payload = self._build_payload(to, subject, plain_body, html_body, message_id)
         try:
-            resp = httpx.post(url, headers=headers, json=payload, timeout=15)
-            if resp.status_code >= 400:
-                # devolver detalle para entender 403/401
-                raise EmailSendError(f"graph_send_error {resp.status_code}: {resp.text}")
+            resp = httpx.post(self.send_url, headers=headers, json=payload, timeout=15)
         except Exception as exc:  # pragma: no cover - externo
             raise EmailSendError(f"graph_send_error: {exc}") from exc
+        self._check_response(resp)
 
-    def _ensure_token(self) -> str:
-        if self._token and self._token_expires_at and time() < self._token_expires_at - 60:
-            return self._token
-        token, expires_in = self._fetch_token()
-        self._token = token
-        self._token_expires_at = time() + expires_in
-        return token
-
-    def _fetch_token(self) -> tuple[str, int]:
-        data = {
-            "client_id": self.cfg.client_id,
-            "client_secret": self.cfg.client_secret,
-            "scope": "https://graph.microsoft.com/.default",
-            "grant_type": "client_credentials",
+    async def asend(
+        self,
+        to: Iterable[str],
+        subject: str,
+        plain_body: str,
+        html_body: Optional[str] = None,
+        *,
+        message_id: Optional[str] = None,
+    ) -> None:
+        token = await self._aensure_token()
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
         }
-        resp = httpx.post(
-            f"https://login.microsoftonline.com/{self.cfg.tenant_id}/oauth2/v2.0/token",
-            data=data,
-            timeout=10,
-        )
+        payload = self._build_payload(to, subject, plain_body, html_body, message_id)
+        try:
+            resp = await get_mail_http_client().post(self.send_url, headers=headers, json=payload)
+        except Exception as exc:  # pragma: no cover - externo
+            raise EmailSendError(f"graph_send_error: {exc}") from exc
+        self._check_response(resp)
+
+    async def asend_batch(self, mails: Sequence[OutgoingMail]) -> List[BatchItemResult]:
+        """
+        Send up to GRAPH_BATCH_LIMIT messages in one Graph ``$batch`` call.
+
+        Results follow the input order. Throttled items (429/503/504) carry
+        ``retry_after`` so the caller can resend them later.
+        """
+        if len(mails) > GRAPH_BATCH_LIMIT:
+            raise ValueError(f"graph_batch_limit_exceeded ({len(mails)} > {GRAPH_BATCH_LIMIT})")
+        if not mails:
+            return []
+        token = await self._aensure_token()
+        requests = [
+            {
+                "id": str(idx),
+                "method": "POST",
+                "url": f"/users/{self.cfg.sender}/sendMail",
+                "headers": {"Content-Type": "application/json"},
+                "body": self._build_payload(mail.to, mail.subject, mail.plain_body, mail.html_body, mail.message_id),
+            }
+            for idx, mail in enumerate(mails)
+        ]
         try:
-            resp.raise_for_status()
-        except Exception as exc:
+            resp = await get_mail_http_client().post(
+                GRAPH_BATCH_URL,
+                headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+                json={"requests": requests},
+            )
+        except Exception as exc:  # pragma: no cover - externo
+            raise EmailSendError(f"graph_batch_error: {exc}") from exc
+        if resp.status_code in (429, 503, 504):
+            retry_after = _retry_after(resp.headers.get("Retry-After"))
+            return [BatchItemResult(ok=False, error=f"graph_throttled {resp.status_code}", retry_after=retry_after)] * len(mails)
+        self._check_response(resp)
+
+        by_id: Dict[str, BatchItemResult] = {}
+        for item in (resp.json() or {}).get("responses", []) or []:
+            code = int(item.get("status") or 0)
+            if 200 <= code < 300:
+                by_id[str(item.get("id"))] = BatchItemResult(ok=True)
+                continue
+            body = item.get("body") or {}
+            message = (body.get("error") or {}).get("message") if isinstance(body, dict) else None
+            retry_after = None
+            if code in (429, 503, 504):
+                retry_after = _retry_after((item.get("headers") or {}).get("Retry-After"))
+            by_id[str(item.get("id"))] = BatchItemResult(
+                ok=False,
+                error=f"graph_send_error {code}: {message or ''}".strip(),
+                retry_after=retry_after,
+            )
+        return [by_id.get(str(idx), BatchItemResult(ok=False, error="graph_batch_missing_response")) for idx in range(len(mails))]
+
+    def _check_response(self, resp: httpx.Response) -> None:
+        if resp.status_code == 401:
+            # Token revocado o rotado: el próximo envío pide uno nuevo.
+            token_cache.invalidate(self.credentials)
+        if resp.status_code >= 400:
+            # devolver detalle para entender 403/401
+            raise EmailSendError(f"graph_send_error {resp.status_code}: {resp.text}")
+
+    def _ensure_token(self) -> str:
+        try:
+            return token_cache.get_token_sync(self.credentials)
+        except OAuthTokenError as exc:
+            raise EmailSendError(f"graph_token_error: {exc}") from exc
+
+    async def _aensure_token(self) -> str:
+        try:
+            return await token_cache.get_token(self.credentials)
+        except OAuthTokenError as exc:
             raise EmailSendError(f"graph_token_error: {exc}") from exc
-        payload = resp.json()
-        return payload["access_token"], int(payload.get("expires_in", 3600))
 
 
 # ---------- helpers ----------
@@ -234,14 +440,18 @@ SMTP_SETTING_KEYS = {
 }
 
 
-async def get_email_client_from_db(db: AsyncSession) -> EmailClient:
+async def _mail_setting_values() -> Dict[str, Any]:
+    """SMTP/Graph overrides from the copilot.settings snapshot (no DB round trip)."""
+    snapshot = await get_config()
+    return {key: value for key, value in snapshot.settings.items() if key in SMTP_SETTING_KEYS}
+
+
+async def get_email_client() -> EmailClient:
     """
-    Build EmailClient using overrides stored in copilot.settings table.
+    Build EmailClient using the copilot.settings overrides (config snapshot).
     Falls back to environment values if a key is missing.
     """
-    result = await db.execute(select(Setting).where(Setting.key.in_(SMTP_SETTING_KEYS)))
-    rows = result.scalars().all()
-    values = {row.key: row.value for row in rows}
+    values = await _mail_setting_values()
 
     def val(key: str, default):
         v = values.get(key, default)
@@ -263,14 +473,12 @@ async def get_email_client_from_db(db: AsyncSession) -> EmailClient:
     return EmailClient(cfg)
 
 
-async def get_mail_sender_from_db(db: AsyncSession) -> MailSender:
+async def get_mail_sender() -> MailSender:
     """
     Devuelve GraphMailClient si hay credenciales completas en settings,
     de lo contrario cae a SMTP (EmailClient).
     """
-    result = await db.execute(select(Setting).where(Setting.key.in_(SMTP_SETTING_KEYS)))
-    rows = result.scalars().all()
-    values = {row.key: row.value for row in rows}
+    values = await _mail_setting_values()
 
     def val(key: str, default):
         return values.get(key, default)
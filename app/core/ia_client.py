@@ -1,24 +1,109 @@
 """Cliente IA para Azure OpenAI."""
 
-from typing import Any, Dict, List
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from openai import AsyncAzureOpenAI, OpenAIError
+import httpx
+from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient, OpenAIError, Timeout
 
 from app.core.config import settings
+from app.core.config_store import ConfigSnapshot, get_config
+
+# Un cliente (y un pool httpx hacia Azure) por worker; se recrea si cambia la api-version o el
+# deployment en copilot.settings (endpoint y key vienen del entorno).
+_ia_client: Optional["IAClient"] = None
+_retired_clients: List["IAClient"] = []
+
+# Primera api-version de Azure OpenAI que acepta stream_options (las versiones empiezan con la fecha).
+_STREAM_OPTIONS_MIN_API_VERSION = "2024-09-01"
+
+
+def _supports_stream_options(api_version: str) -> bool:
+    return api_version[:10] >= _STREAM_OPTIONS_MIN_API_VERSION
+
+
+def _config_key(snapshot: Optional[ConfigSnapshot]) -> Tuple[str, str, str, str]:
+    """(endpoint, key, api-version, deployment); the last two overridable from copilot.settings."""
+
+    def value(key: str, default: str) -> str:
+        override = snapshot.setting(key) if snapshot is not None else None
+        return str(override or default)
+
+    return (
+        settings.azure_openai_endpoint,
+        settings.azure_openai_api_key,
+        value("azure_openai_api_version", settings.azure_openai_api_version),
+        value("azure_openai_deployment", settings.azure_openai_deployment_gpt),
+    )
+
+
+@dataclass
+class TokenUsage:
+    """Tokens reportados por Azure para una llamada; ``cached_tokens`` es parte de ``prompt_tokens``."""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    reported: bool = False
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def update(self, usage: Any) -> None:
+        """Copy an OpenAI ``CompletionUsage`` (no-op when the response carried none)."""
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+        self.completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+        self.cached_tokens = int(getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+        self.reported = True
+
+
+def estimate_cost(deployment: str, usage: TokenUsage) -> Optional[float]:
+    """USD cost of a call from IA_PRICES_PER_MILLION; None without usage or price for the deployment."""
+    prices = settings.ia_prices_per_million.get(deployment)
+    if not usage.reported or not prices:
+        return None
+    prompt_price = prices.get("prompt", 0.0)
+    cached_price = prices.get("cached_prompt", prompt_price)
+    cached = min(usage.cached_tokens, usage.prompt_tokens)
+    cost = (
+        (usage.prompt_tokens - cached) * prompt_price
+        + cached * cached_price
+        + usage.completion_tokens * prices.get("completion", 0.0)
+    ) / 1_000_000
+    return round(cost, 6)
 
 
 class IAClient:
     """Encapsula llamadas al deployment GPT en Azure OpenAI."""
 
-    def __init__(self) -> None:
-        if not settings.azure_openai_endpoint or not settings.azure_openai_api_key:
+    def __init__(self, config_key: Optional[Tuple[str, str, str, str]] = None) -> None:
+        self.config_key = config_key or _config_key(None)
+        endpoint, api_key, self.api_version, self.deployment = self.config_key
+        if not endpoint or not api_key:
             raise ValueError("azure_openai_not_configured")
+        # Cliente httpx del SDK (conserva sus defaults de transporte) con límites de pool propios.
+        self.http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.azure_openai_max_connections,
+                max_keepalive_connections=settings.azure_openai_max_keepalive_connections,
+                keepalive_expiry=settings.azure_openai_keepalive_expiry_seconds,
+            ),
+        )
         self.client = AsyncAzureOpenAI(
-            api_key=settings.azure_openai_api_key,
-            api_version=settings.azure_openai_api_version,
-            azure_endpoint=settings.azure_openai_endpoint,
+            api_key=api_key,
+            api_version=self.api_version,
+            azure_endpoint=endpoint,
+            max_retries=settings.azure_openai_max_retries,
+            timeout=Timeout(settings.azure_openai_timeout_seconds, connect=settings.azure_openai_connect_timeout_seconds),
+            http_client=self.http_client,
         )
-        self.deployment = settings.azure_openai_deployment_gpt
+
+    async def aclose(self) -> None:
+        await self.client.close()
 
     async def generate_reply(
         self,
@@ -26,8 +111,9 @@ class IAClient:
         *,
         temperature: float = 0.3,
         max_tokens: int = 400,
+        usage: Optional[TokenUsage] = None,
     ) -> str:
-        """Genera un mensaje de respuesta usando chat completions."""
+        """Genera un mensaje de respuesta usando chat completions (tokens en ``usage`` si se pasa)."""
         try:
             resp = await self.client.chat.completions.create(
                 model=self.deployment,
@@ -38,15 +124,55 @@ class IAClient:
         except OpenAIError as exc:
             # Propagar para que el endpoint registre en ia_logs y devuelva error claro.
             raise
+        if usage is not None:
+            usage.update(resp.usage)
         content = resp.choices[0].message.content if resp.choices else ""
         return content or ""
 
+    async def stream_reply(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        temperature: float = 0.3,
+        max_tokens: int = 400,
+        usage: Optional[TokenUsage] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Igual que generate_reply pero entrega los fragmentos de texto a medida que llegan.
+
+        Con AZURE_OPENAI_STREAM_USAGE (y api-version >= 2024-09-01-preview) el último
+        chunk (sin choices) trae el uso de tokens.
+        """
+        extra: Dict[str, Any] = {}
+        if settings.azure_openai_stream_usage and _supports_stream_options(self.api_version):
+            extra["stream_options"] = {"include_usage": True}
+        stream = await self.client.chat.completions.create(
+            model=self.deployment,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **extra,
+        )
+        try:
+            async for chunk in stream:
+                if usage is not None:
+                    usage.update(getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            await stream.close()
+
     async def interpret_conversation(
         self,
         messages: List[Dict[str, str]],
         *,
         temperature: float = 0.3,
         max_tokens: int = 400,
+        usage: Optional[TokenUsage] = None,
     ) -> str:
         """Interpreta historial/conversación y devuelve sugerencia de enfoque."""
         try:
@@ -58,5 +184,43 @@ class IAClient:
             )
         except OpenAIError as exc:
             raise
+        if usage is not None:
+            usage.update(resp.usage)
         content = resp.choices[0].message.content if resp.choices else ""
         return content or ""
+
+
+def _shared_client(config_key: Tuple[str, str, str, str]) -> IAClient:
+    global _ia_client
+    if _ia_client is None or _ia_client.config_key != config_key:
+        new_client = IAClient(config_key)
+        if _ia_client is not None:
+            # Puede haber requests en curso con el cliente anterior; se cierra en el shutdown.
+            _retired_clients.append(_ia_client)
+        _ia_client = new_client
+    return _ia_client
+
+
+async def get_ia_client() -> IAClient:
+    """FastAPI dependency: shared IAClient, rebuilt when the api-version/deployment in copilot.settings change."""
+    return _shared_client(_config_key(await get_config()))
+
+
+async def start_ia_client() -> Optional[IAClient]:
+    """Warm the shared client at startup; stays lazy if Azure OpenAI is not configured or the DB is down."""
+    try:
+        return await get_ia_client()
+    except Exception:
+        return None
+
+
+async def reset_ia_client() -> None:
+    """Close every IAClient built by this worker (shutdown or forced reload)."""
+    global _ia_client
+    clients = _retired_clients[:]
+    if _ia_client is not None:
+        clients.append(_ia_client)
+    _ia_client = None
+    _retired_clients.clear()
+    for client in clients:
+        await client.aclose()
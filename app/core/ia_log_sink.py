@@ -0,0 +1,154 @@
+"""Escritura en lote de ia_logs fuera del request."""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.ia_logs import IALog
+
+_STOP = object()
+
+
+class IALogSink:
+    """
+    Async queue of ia_logs rows flushed as multi-row INSERTs.
+
+    A batch is written when ``batch_size`` rows are queued or ``flush_interval_ms``
+    after its first row, whichever comes first. ``submit`` never waits: when the
+    queue holds ``max_queue`` rows new entries are dropped and counted. Failed
+    flushes are retried a few times before the batch is dropped. ``stop`` writes
+    whatever is still queued.
+    """
+
+    def __init__(
+        self,
+        *,
+        batch_size: int,
+        flush_interval_ms: float,
+        max_queue: int,
+        delay_warn_ms: float,
+        max_attempts: int = 3,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.max_queue = max_queue
+        self.delay_warn_ms = delay_warn_ms
+        self.max_attempts = max_attempts
+        self._queue: Optional["asyncio.Queue[Any]"] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.delayed = 0
+        self.flush_errors = 0
+        self.max_delay_ms = 0
+
+    @property
+    def queue(self) -> "asyncio.Queue[Any]":
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+        return self._queue
+
+    def submit(self, log: IALog) -> bool:
+        """Queue a log row (snapshot of its current values). Returns False if it was dropped."""
+        row = {column.key: getattr(log, column.key) for column in IALog.__table__.columns if column.key != "id"}
+        # El timestamp es el del evento, no el del INSERT diferido.
+        if row.get("timestamp") is None:
+            row["timestamp"] = datetime.now(tz=timezone.utc)
+        try:
+            self.queue.put_nowait((time.monotonic(), row))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> None:
+        async with SessionLocal() as session:
+            await session.execute(insert(IALog), rows)
+            await session.commit()
+
+    async def _flush(self, batch: List[Tuple[float, Dict[str, Any]]]) -> None:
+        rows = [row for _, row in batch]
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self._write(rows)
+                break
+            except Exception:
+                self.flush_errors += 1
+                if attempt == self.max_attempts:
+                    self.dropped += len(rows)
+                    return
+                await asyncio.sleep(0 if self._stopping else 0.5 * 2 ** (attempt - 1))
+        self.written += len(rows)
+        now = time.monotonic()
+        for queued_at, _ in batch:
+            delay_ms = int((now - queued_at) * 1000)
+            self.max_delay_ms = max(self.max_delay_ms, delay_ms)
+            if delay_ms > self.delay_warn_ms:
+                self.delayed += 1
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self.queue
+        while not (self._stopping and queue.empty()):
+            item = await queue.get()
+            batch = [] if item is _STOP else [item]
+            deadline = loop.time() + self.flush_interval_ms / 1000
+            while len(batch) < self.batch_size:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if self._stopping or timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is not _STOP:
+                    batch.append(item)
+            if batch:
+                await self._flush(batch)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="ia-log-sink")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Flush the queued rows (up to ``timeout``), then cancel."""
+        if self._task is None:
+            return
+        self._stopping = True
+        try:
+            self.queue.put_nowait(_STOP)
+        except asyncio.QueueFull:
+            pass  # el loop está ocupado vaciando la cola y verá _stopping
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self.dropped += self.queue.qsize()
+        self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "delayed": self.delayed,
+            "max_delay_ms": self.max_delay_ms,
+            "flush_errors": self.flush_errors,
+        }
+
+
+ia_log_sink = IALogSink(
+    batch_size=settings.ia_log_batch_size,
+    flush_interval_ms=settings.ia_log_flush_interval_ms,
+    max_queue=settings.ia_log_max_queue,
+    delay_warn_ms=settings.ia_log_delay_warn_ms,
+)
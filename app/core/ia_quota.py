@@ -0,0 +1,155 @@
+"""
+Cuotas de tokens IA por usuario y por equipo en una ventana deslizante.
+
+El consumo se acumula por minuto en ``ia_quota_usage`` (compartido entre
+instancias). Cada worker cachea el total de la ventana por sujeto y lo relee
+cada IA_QUOTA_REFRESH_SECONDS; lo consumido aquí desde esa lectura se suma
+encima, así la verificación previa a cada llamada no toca la BD.
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.db.session import SessionLocal
+from app.models.ia_usage import IAQuotaUsage
+
+
+@dataclass
+class _Window:
+    base: int = 0  # total de la ventana leído de la BD
+    fetched_at: float = -math.inf
+    # Consumo local aún no reflejado en ``base``: [tokens, monotonic del commit o None si pendiente].
+    pending: List[List[Optional[float]]] = field(default_factory=list)
+
+    def used(self) -> int:
+        return self.base + int(sum(entry[0] for entry in self.pending))  # type: ignore[misc]
+
+
+def estimate_tokens(chars: int) -> int:
+    """Rough token count (~4 chars per token) when the provider reported no usage."""
+    return (chars + 3) // 4
+
+
+class IAQuotaTracker:
+    """In-memory sliding-window view of ia_quota_usage (see module docstring)."""
+
+    def __init__(self, *, window_seconds: float, refresh_seconds: float) -> None:
+        self.window_seconds = window_seconds
+        self.refresh_seconds = refresh_seconds
+        self._windows: Dict[str, _Window] = {}
+        self._flights = SingleFlight()
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._next_prune = 0.0
+        self.rejected = 0
+        self.refresh_errors = 0
+        self.write_errors = 0
+
+    def _limits(self, user_upn: str, team: Optional[str]) -> List[Tuple[str, int]]:
+        limits = []
+        if settings.ia_quota_user_tokens > 0:
+            limits.append((f"user:{user_upn.lower()}", settings.ia_quota_user_tokens))
+        if team and settings.ia_quota_team_tokens > 0:
+            limits.append((f"team:{team}", settings.ia_quota_team_tokens))
+        return limits
+
+    async def _load(self, subject: str) -> None:
+        window = self._windows.setdefault(subject, _Window())
+        started = time.monotonic()
+        since = datetime.now(tz=timezone.utc) - timedelta(seconds=self.window_seconds)
+        async with SessionLocal() as session:
+            total = await session.scalar(
+                select(func.coalesce(func.sum(IAQuotaUsage.tokens), 0)).where(
+                    IAQuotaUsage.subject == subject, IAQuotaUsage.bucket_start > since
+                )
+            )
+        window.base = int(total or 0)
+        window.fetched_at = time.monotonic()
+        # Lo confirmado antes de la lectura ya está en ``base``.
+        window.pending = [entry for entry in window.pending if entry[1] is None or entry[1] > started]
+
+    async def used(self, subject: str) -> int:
+        window = self._windows.get(subject)
+        if window is None or time.monotonic() - window.fetched_at >= self.refresh_seconds:
+            try:
+                await self._flights.do(subject, lambda: self._load(subject))
+            except Exception:
+                # BD no disponible: se sigue con el último total conocido (fail-open).
+                self.refresh_errors += 1
+                self._windows.setdefault(subject, _Window()).fetched_at = time.monotonic()
+            window = self._windows[subject]
+        return window.used()
+
+    async def exceeded(self, user_upn: str, team: Optional[str]) -> Optional[str]:
+        """Subject ("user:…"/"team:…") whose quota is used up, or None."""
+        for subject, limit in self._limits(user_upn, team):
+            if await self.used(subject) >= limit:
+                self.rejected += 1
+                return subject
+        return None
+
+    def record(self, user_upn: str, team: Optional[str], tokens: int) -> None:
+        """Count ``tokens`` against the user/team windows; the DB write runs in the background."""
+        if tokens <= 0:
+            return
+        entries = []
+        for subject, _ in self._limits(user_upn, team):
+            entry: List[Optional[float]] = [tokens, None]
+            self._windows.setdefault(subject, _Window()).pending.append(entry)
+            entries.append((subject, entry))
+        if entries:
+            task = asyncio.create_task(self._write(entries, tokens), name="ia-quota-write")
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, entries: List[Tuple[str, List[Optional[float]]]], tokens: int) -> None:
+        bucket = datetime.now(tz=timezone.utc).replace(second=0, microsecond=0)
+        stmt = insert(IAQuotaUsage).values(
+            [{"subject": subject, "bucket_start": bucket, "tokens": tokens} for subject, _ in entries]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IAQuotaUsage.subject, IAQuotaUsage.bucket_start],
+            set_={"tokens": IAQuotaUsage.tokens + stmt.excluded.tokens},
+        )
+        try:
+            async with SessionLocal() as session:
+                await session.execute(stmt)
+                if time.monotonic() >= self._next_prune:
+                    self._next_prune = time.monotonic() + self.window_seconds
+                    cutoff = bucket - timedelta(seconds=2 * self.window_seconds)
+                    await session.execute(delete(IAQuotaUsage).where(IAQuotaUsage.bucket_start < cutoff))
+                await session.commit()
+        except Exception:
+            # El consumo queda solo en memoria y se descarta en el siguiente refresco.
+            self.write_errors += 1
+        finally:
+            committed = time.monotonic()
+            for _, entry in entries:
+                entry[1] = committed
+
+    async def stop(self) -> None:
+        """Wait for the pending usage writes."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "subjects": len(self._windows),
+            "rejected": self.rejected,
+            "pending_writes": len(self._tasks),
+            "refresh_errors": self.refresh_errors,
+            "write_errors": self.write_errors,
+        }
+
+
+ia_quota_tracker = IAQuotaTracker(
+    window_seconds=settings.ia_quota_window_seconds, refresh_seconds=settings.ia_quota_refresh_seconds
+)
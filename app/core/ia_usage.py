@@ -0,0 +1,277 @@
+"""
+Mantenimiento de ia_logs (particionada por mes) y rollups de uso IA.
+
+Cada ciclo, en una sola instancia a la vez (advisory lock):
+- crea las particiones de los próximos meses y separa (DETACH) las que salen
+  de la retención. Lo insertado sin partición mensual (mantenimiento apagado
+  o atrasado) cae en ``ia_logs_default``: en el ciclo siguiente se crea la
+  partición de cada mes que tenga filas ahí y se mueven (lo más viejo que la
+  retención se borra);
+- recalcula los buckets horarios/diarios de ``ia_usage_rollups`` tocados desde
+  el último ciclo (los percentiles no se pueden sumar, así que el bucket se
+  recalcula entero desde ia_logs; el índice BRIN acota el rango leído).
+"""
+
+import asyncio
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, literal, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.ia_logs import IALog
+from app.models.ia_usage import IAUsageRollup
+
+_LOCK_KEY = "copilot_ia_usage_maintenance"
+_PARTITION_RE = re.compile(r"^ia_logs_p(\d{4})(\d{2})$")
+_DEFAULT_PARTITION = "ia_logs_default"
+GRANULARITIES = ("hour", "day")
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"ia_logs_p{month:%Y%m}"
+
+
+async def _try_lock(session: AsyncSession) -> bool:
+    """Transaction-scoped advisory lock so only one instance maintains at a time."""
+    return bool(await session.scalar(text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"), {"key": _LOCK_KEY}))
+
+
+async def list_partitions(session: AsyncSession) -> Dict[date, str]:
+    """Attached monthly partitions of ia_logs: {first day of month: table name}."""
+    result = await session.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "JOIN pg_namespace n ON n.oid = p.relnamespace "
+            "WHERE p.relname = 'ia_logs' AND n.nspname = :schema"
+        ),
+        {"schema": settings.db_schema},
+    )
+    partitions: Dict[date, str] = {}
+    for (name,) in result.all():
+        match = _PARTITION_RE.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def _month_bounds(month: date) -> str:
+    return f"\"timestamp\" >= '{month.isoformat()}' AND \"timestamp\" < '{_add_months(month, 1).isoformat()}'"
+
+
+async def _default_months(session: AsyncSession) -> List[date]:
+    """Months with rows in the DEFAULT partition (none if it does not exist)."""
+    schema = settings.db_schema
+    exists = await session.scalar(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f'"{schema}".{_DEFAULT_PARTITION}'}
+    )
+    if not exists:
+        return []
+    result = await session.execute(
+        text(f'SELECT DISTINCT date_trunc(\'month\', "timestamp")::date FROM "{schema}".{_DEFAULT_PARTITION}')
+    )
+    return sorted(result.scalars().all())
+
+
+async def maintain_partitions(session: AsyncSession, *, today: Optional[date] = None) -> Dict[str, List[str]]:
+    """
+    Create upcoming monthly partitions (and those of months stranded in the
+    DEFAULT partition) and apply retention. Does not commit.
+
+    Postgres refuses a new partition while the default holds rows of its range,
+    so the default is detached, those rows moved and the default reattached,
+    all in this transaction.
+    """
+    today = today or datetime.now(tz=timezone.utc).date()
+    current = today.replace(day=1)
+    schema = settings.db_schema
+    default = f'"{schema}".{_DEFAULT_PARTITION}'
+    existing = await list_partitions(session)
+    cutoff = _add_months(current, -settings.ia_logs_retention_months) if settings.ia_logs_retention_months > 0 else None
+
+    stranded = await _default_months(session)
+    if cutoff is not None and stranded and stranded[0] < cutoff:
+        await session.execute(text(f"DELETE FROM {default} WHERE \"timestamp\" < '{cutoff.isoformat()}'"))
+        stranded = [month for month in stranded if month >= cutoff]
+
+    upcoming = [_add_months(current, offset) for offset in range(settings.ia_logs_partition_months_ahead + 1)]
+    missing = sorted({month for month in upcoming + stranded if month not in existing})
+    if stranded:
+        await session.execute(text(f'ALTER TABLE "{schema}".ia_logs DETACH PARTITION {default}'))
+    created: List[str] = []
+    for month in missing:
+        name = _partition_name(month)
+        await session.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS "{schema}"."{name}" PARTITION OF "{schema}".ia_logs '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+            )
+        )
+        created.append(name)
+    moved: List[str] = []
+    if stranded:
+        columns = ", ".join(f'"{column.name}"' for column in IALog.__table__.columns)
+        for month in stranded:
+            name, bounds = _partition_name(month), _month_bounds(month)
+            await session.execute(
+                text(f'INSERT INTO "{schema}"."{name}" ({columns}) SELECT {columns} FROM {default} WHERE {bounds}')
+            )
+            await session.execute(text(f"DELETE FROM {default} WHERE {bounds}"))
+            moved.append(name)
+        await session.execute(text(f'ALTER TABLE "{schema}".ia_logs ATTACH PARTITION {default} DEFAULT'))
+
+    detached: List[str] = []
+    if cutoff is not None:
+        for month, name in sorted(existing.items()):
+            if month >= cutoff:
+                break
+            await session.execute(text(f'ALTER TABLE "{schema}".ia_logs DETACH PARTITION "{schema}"."{name}"'))
+            if settings.ia_logs_drop_detached:
+                await session.execute(text(f'DROP TABLE "{schema}"."{name}"'))
+            detached.append(name)
+    return {"created": created, "moved": moved, "detached": detached}
+
+
+async def refresh_rollups(session: AsyncSession) -> int:
+    """
+    Recompute the hourly and daily buckets touched since the last refresh.
+
+    The latest hourly bucket already stored (minus one hour, for rows the
+    batched log writer delivers late) marks where to start. Does not commit.
+    """
+    latest = await session.scalar(
+        select(func.max(IAUsageRollup.bucket_start)).where(IAUsageRollup.granularity == "hour")
+    )
+    since = latest - timedelta(hours=1) if latest is not None else None
+
+    upserted = 0
+    for granularity in GRANULARITIES:
+        # Sin parámetros ligados: el GROUP BY debe repetir exactamente la expresión del SELECT.
+        bucket = func.date_trunc(literal_column(f"'{granularity}'"), IALog.timestamp)
+        user_upn = func.coalesce(IALog.user_upn, literal_column("''"))
+        operation = func.coalesce(IALog.operation, literal_column("''"))
+        model = func.coalesce(IALog.model, literal_column("''"))
+        source = select(
+            literal(granularity).label("granularity"),
+            bucket.label("bucket_start"),
+            user_upn.label("user_upn"),
+            operation.label("operation"),
+            model.label("model"),
+            func.count().label("calls"),
+            func.count().filter(IALog.success.is_(False)).label("errors"),
+            func.count().filter(IALog.cache_hit.is_(True)).label("cache_hits"),
+            func.percentile_cont(0.5).within_group(IALog.latency_ms).label("latency_p50_ms"),
+            func.percentile_cont(0.95).within_group(IALog.latency_ms).label("latency_p95_ms"),
+            func.coalesce(func.sum(IALog.prompt_chars), 0).label("prompt_chars"),
+            func.coalesce(func.sum(IALog.response_chars), 0).label("response_chars"),
+            func.coalesce(func.sum(IALog.prompt_tokens), 0).label("prompt_tokens"),
+            func.coalesce(func.sum(IALog.completion_tokens), 0).label("completion_tokens"),
+            func.coalesce(func.sum(IALog.cost_usd), 0).label("cost_usd"),
+        ).group_by(bucket, user_upn, operation, model)
+        if since is not None:
+            source = source.where(IALog.timestamp >= func.date_trunc(granularity, since))
+
+        columns = [
+            "granularity",
+            "bucket_start",
+            "user_upn",
+            "operation",
+            "model",
+            "calls",
+            "errors",
+            "cache_hits",
+            "latency_p50_ms",
+            "latency_p95_ms",
+            "prompt_chars",
+            "response_chars",
+            "prompt_tokens",
+            "completion_tokens",
+            "cost_usd",
+        ]
+        stmt = insert(IAUsageRollup).from_select(columns, source)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["granularity", "bucket_start", "user_upn", "operation", "model"],
+            set_={**{col: stmt.excluded[col] for col in columns[5:]}, "updated_at": func.now()},
+        )
+        result = await session.execute(stmt)
+        upserted += result.rowcount or 0
+    return upserted
+
+
+class IAUsageMaintainer:
+    """Periodic partition maintenance + rollup refresh (see module docstring)."""
+
+    def __init__(self, *, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_result: Dict[str, object] = {}
+
+    async def run_once(self) -> Dict[str, object]:
+        # Transacciones separadas: DETACH bloquea ia_logs y no debe esperar al rollup.
+        async with SessionLocal() as session:
+            if not await _try_lock(session):
+                self.skipped += 1
+                return {}
+            partitions = await maintain_partitions(session)
+            await session.commit()
+        async with SessionLocal() as session:
+            if not await _try_lock(session):
+                self.skipped += 1
+                return partitions
+            upserted = await refresh_rollups(session)
+            await session.commit()
+        self.runs += 1
+        self.last_run_at = datetime.now(tz=timezone.utc)
+        self.last_result = {**partitions, "rollup_rows": upserted}
+        return self.last_result
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - BD caída: siguiente ciclo
+                self.errors += 1
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None and self.interval_seconds > 0:
+            self._task = asyncio.create_task(self._run(), name="ia-usage-maintainer")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_result": self.last_result,
+        }
+
+
+ia_usage_maintainer = IAUsageMaintainer(interval_seconds=settings.ia_usage_rollup_interval_seconds)
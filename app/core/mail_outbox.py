@@ -0,0 +1,131 @@
+"""Outbox transaccional de correos y worker async que lo drena."""
+
+import asyncio
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.email_client import EmailSendError, get_mail_sender
+from app.core.outbox import OutboxWorker
+from app.core.sdp_client import get_sdp_client
+from app.models.mail_outbox import MailOutbox
+
+
+def new_idempotency_key() -> str:
+    return uuid.uuid4().hex
+
+
+def message_id_for(idempotency_key: str) -> str:
+    """Message-ID estable por envío: reintentos del mismo correo son identificables como duplicados."""
+    return f"<outbox.{idempotency_key}@{settings.app_name}>"
+
+
+async def enqueue_mail(
+    db: AsyncSession,
+    *,
+    idempotency_key: str,
+    to: List[str],
+    subject: str,
+    plain_body: str,
+    html_body: Optional[str] = None,
+    ticket_id: Optional[str] = None,
+    requested_by: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Add a message to the outbox inside the caller's transaction (does not commit).
+
+    Returns the outbox id, or None when the idempotency key was already queued.
+    """
+    stmt = (
+        insert(MailOutbox)
+        .values(
+            idempotency_key=idempotency_key,
+            ticket_id=ticket_id,
+            requested_by=requested_by,
+            to_addresses=[addr for addr in to if addr],
+            subject=subject,
+            plain_body=plain_body,
+            html_body=html_body,
+        )
+        .on_conflict_do_nothing(index_elements=[MailOutbox.idempotency_key])
+        .returning(MailOutbox.id)
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+@dataclass
+class _Job:
+    id: int
+    idempotency_key: str
+    ticket_id: Optional[str]
+    to: List[str]
+    subject: str
+    plain_body: str
+    html_body: Optional[str]
+    attempts: int
+
+
+class MailOutboxWorker(OutboxWorker[_Job]):
+    """Delivers mail_outbox rows through the configured MailSender (see OutboxWorker)."""
+
+    model = MailOutbox
+    name = "mail-outbox-worker"
+
+    def _job(self, row: MailOutbox) -> _Job:
+        return _Job(
+            id=row.id,
+            idempotency_key=row.idempotency_key,
+            ticket_id=row.ticket_id,
+            to=list(row.to_addresses or []),
+            subject=row.subject,
+            plain_body=row.plain_body,
+            html_body=row.html_body,
+            attempts=row.attempts,
+        )
+
+    async def _deliver(self, sender: Any, job: _Job, semaphore: asyncio.Semaphore) -> Optional[str]:
+        async with semaphore:
+            try:
+                await sender.asend(
+                    job.to,
+                    job.subject,
+                    job.plain_body,
+                    job.html_body,
+                    message_id=message_id_for(job.idempotency_key),
+                )
+            except EmailSendError as exc:
+                return str(exc) or "email_send_error"
+            except Exception as exc:  # pragma: no cover - transporte externo
+                return f"{type(exc).__name__}: {exc}"
+        return None
+
+    async def _deliver_batch(self, jobs: List[_Job]) -> Dict[int, Optional[str]]:
+        try:
+            sender = await get_mail_sender()
+        except Exception as exc:
+            return {job.id: f"mail_sender_unavailable: {getattr(exc, 'detail', exc)}" for job in jobs}
+        semaphore = asyncio.Semaphore(max(self.concurrency, 1))
+        outcomes = await asyncio.gather(*(self._deliver(sender, job, semaphore) for job in jobs))
+        return {job.id: outcome for job, outcome in zip(jobs, outcomes)}
+
+    async def _after_sent(self, jobs: List[_Job]) -> None:
+        for job in jobs:
+            if job.ticket_id:
+                # El correo llega a SDP por Bcc: el historial cacheado deja de ser válido.
+                await get_sdp_client().invalidate_ticket(job.ticket_id)
+
+
+mail_outbox_worker = MailOutboxWorker(
+    batch_size=settings.mail_outbox_batch_size,
+    concurrency=settings.mail_outbox_concurrency,
+    max_attempts=settings.mail_outbox_max_attempts,
+    base_backoff_seconds=settings.mail_outbox_base_backoff_seconds,
+    max_backoff_seconds=settings.mail_outbox_max_backoff_seconds,
+    poll_interval_seconds=settings.mail_outbox_poll_interval_seconds,
+    lease_seconds=settings.mail_outbox_lease_seconds,
+)
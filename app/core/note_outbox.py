@@ -0,0 +1,113 @@
+"""Write-behind de notas internas al gateway SDP."""
+
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.outbox import OutboxWorker
+from app.core.sdp_client import get_sdp_client
+from app.models.note_outbox import NoteOutbox
+from app.models.ticket_flags import TicketFlags
+
+
+def review_dedup_key(ticket_id: str, token: str) -> str:
+    """One note per review link: double clicks and retried submits collapse."""
+    return f"review:{ticket_id}:{hashlib.sha256(token.encode('utf-8')).hexdigest()[:32]}"
+
+
+async def flag_review_and_enqueue_note(
+    db: AsyncSession,
+    *,
+    ticket_id: str,
+    text: str,
+    dedup_key: str,
+    requested_at: datetime,
+) -> Optional[int]:
+    """
+    Mark the review flag and queue the gateway note in one statement.
+
+    ``WITH flag AS (INSERT ... ON CONFLICT DO UPDATE RETURNING ticket_id)
+    INSERT INTO note_outbox SELECT ... FROM flag ON CONFLICT DO NOTHING``.
+    Returns the outbox id, or None when the note was already queued. Does not commit.
+    """
+    flag = (
+        insert(TicketFlags)
+        .values(ticket_id=ticket_id, experience_review_requested=True, last_review_request_at=requested_at)
+        .on_conflict_do_update(
+            index_elements=[TicketFlags.ticket_id],
+            set_={
+                "experience_review_requested": True,
+                "last_review_request_at": requested_at,
+                "updated_at": func.now(),
+            },
+        )
+        .returning(TicketFlags.ticket_id)
+        .cte("flag")
+    )
+    stmt = (
+        insert(NoteOutbox)
+        .from_select(
+            ["dedup_key", "ticket_id", "text"],
+            select(literal(dedup_key), flag.c.ticket_id, literal(text)),
+        )
+        .on_conflict_do_nothing(index_elements=[NoteOutbox.dedup_key])
+        .returning(NoteOutbox.id)
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+@dataclass
+class _Note:
+    id: int
+    ticket_id: str
+    technician_id: Optional[str]
+    text: str
+    attempts: int
+
+
+class NoteOutboxWorker(OutboxWorker[_Note]):
+    """Posts note_outbox rows as internal notes through the gateway (see OutboxWorker)."""
+
+    model = NoteOutbox
+    name = "note-outbox-worker"
+
+    def _job(self, row: NoteOutbox) -> _Note:
+        return _Note(
+            id=row.id,
+            ticket_id=row.ticket_id,
+            technician_id=row.technician_id,
+            text=row.text,
+            attempts=row.attempts,
+        )
+
+    async def _post(self, note: _Note, semaphore: asyncio.Semaphore) -> Optional[str]:
+        async with semaphore:
+            try:
+                await get_sdp_client().post_internal_note(note.ticket_id, note.text, note.technician_id)
+            except Exception as exc:
+                return str(getattr(exc, "detail", None) or exc) or type(exc).__name__
+        return None
+
+    async def _deliver_batch(self, jobs: List[_Note]) -> Dict[int, Optional[str]]:
+        semaphore = asyncio.Semaphore(max(self.concurrency, 1))
+        outcomes = await asyncio.gather(*(self._post(note, semaphore) for note in jobs))
+        return {note.id: outcome for note, outcome in zip(jobs, outcomes)}
+
+
+note_outbox_worker = NoteOutboxWorker(
+    batch_size=settings.note_outbox_batch_size,
+    concurrency=settings.note_outbox_concurrency,
+    max_attempts=settings.note_outbox_max_attempts,
+    base_backoff_seconds=settings.note_outbox_base_backoff_seconds,
+    max_backoff_seconds=settings.note_outbox_max_backoff_seconds,
+    poll_interval_seconds=settings.note_outbox_poll_interval_seconds,
+    lease_seconds=settings.note_outbox_lease_seconds,
+)
@@ -0,0 +1,163 @@
+"""Cache de tokens OAuth2 client_credentials compartido por todo el proceso."""
+
+import asyncio
+import threading
+from dataclasses import dataclass
+from time import time
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import httpx
+
+from app.core.singleflight import SingleFlight
+
+TokenKey = Tuple[str, str, str]
+
+
+class OAuthTokenError(Exception):
+    """Raised when the token endpoint rejects or cannot serve a request."""
+
+
+@dataclass(frozen=True)
+class ClientCredentials:
+    tenant_id: str
+    client_id: str
+    client_secret: str
+    scope: str
+
+    @property
+    def key(self) -> TokenKey:
+        # El secreto no forma parte de la clave: un token emitido sigue siendo válido si se rota.
+        return (self.tenant_id, self.client_id, self.scope)
+
+    @property
+    def token_url(self) -> str:
+        return f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/v2.0/token"
+
+    def form(self) -> Dict[str, str]:
+        return {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "scope": self.scope,
+            "grant_type": "client_credentials",
+        }
+
+
+@dataclass(frozen=True)
+class _Token:
+    access_token: str
+    expires_at: float
+
+
+def _parse_token(resp: httpx.Response) -> _Token:
+    try:
+        resp.raise_for_status()
+        data = resp.json()
+        return _Token(data["access_token"], time() + int(data.get("expires_in", 3600)))
+    except Exception as exc:
+        raise OAuthTokenError(str(exc)) from exc
+
+
+class OAuthTokenCache:
+    """
+    Tokens keyed by (tenant, client_id, scope), shared by every mail sender.
+
+    A token is served as-is until ``refresh_margin_seconds`` before expiry;
+    inside that window async callers still get it while one background refresh
+    runs. Only when less than ``min_validity_seconds`` remain do callers wait.
+    Concurrent async refreshes for the same key share one request
+    (SingleFlight); sync callers (SMTP in a worker thread) serialize on a
+    per-key lock and reuse whatever the first one fetched.
+    """
+
+    def __init__(
+        self,
+        http_client: Callable[[], httpx.AsyncClient],
+        *,
+        refresh_margin_seconds: float,
+        min_validity_seconds: float = 60.0,
+    ) -> None:
+        self._http_client = http_client
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.min_validity_seconds = min_validity_seconds
+        self._tokens: Dict[TokenKey, _Token] = {}
+        self._locks: Dict[TokenKey, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self._flights = SingleFlight()
+        self._background: Set["asyncio.Task[None]"] = set()
+        self.hits = 0
+        self.fetches = 0
+
+    def _usable(self, key: TokenKey) -> Tuple[Optional[_Token], bool]:
+        """Returns (token still usable, should refresh soon)."""
+        token = self._tokens.get(key)
+        if token is None:
+            return None, True
+        remaining = token.expires_at - time()
+        if remaining <= self.min_validity_seconds:
+            return None, True
+        return token, remaining <= self.refresh_margin_seconds
+
+    def _store(self, key: TokenKey, token: _Token) -> None:
+        with self._guard:
+            self.fetches += 1
+            self._tokens[key] = token
+
+    async def _fetch(self, creds: ClientCredentials) -> _Token:
+        try:
+            resp = await self._http_client().post(creds.token_url, data=creds.form())
+        except httpx.HTTPError as exc:
+            raise OAuthTokenError(str(exc)) from exc
+        token = _parse_token(resp)
+        self._store(creds.key, token)
+        return token
+
+    async def _refresh_quietly(self, creds: ClientCredentials) -> None:
+        try:
+            await self._flights.do(creds.key, lambda: self._fetch(creds))
+        except Exception:  # pragma: no cover - el token actual sigue vigente; se reintenta en el próximo uso
+            pass
+
+    async def get_token(self, creds: ClientCredentials) -> str:
+        token, refresh = self._usable(creds.key)
+        if token is not None:
+            self.hits += 1
+            if refresh:
+                task = asyncio.ensure_future(self._refresh_quietly(creds))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            return token.access_token
+        fetch: Callable[[], Awaitable[_Token]] = lambda: self._fetch(creds)
+        return (await self._flights.do(creds.key, fetch)).access_token
+
+    def get_token_sync(self, creds: ClientCredentials) -> str:
+        """Blocking variant for code running in a worker thread."""
+        token, refresh = self._usable(creds.key)
+        if token is not None and not refresh:
+            self.hits += 1
+            return token.access_token
+        with self._guard:
+            lock = self._locks.setdefault(creds.key, threading.Lock())
+        with lock:
+            # Otro hilo pudo renovarlo mientras esperábamos.
+            fresh, refresh = self._usable(creds.key)
+            if fresh is not None and not refresh:
+                self.hits += 1
+                return fresh.access_token
+            try:
+                resp = httpx.post(creds.token_url, data=creds.form(), timeout=10)
+            except httpx.HTTPError as exc:
+                if fresh is not None:
+                    return fresh.access_token
+                raise OAuthTokenError(str(exc)) from exc
+            new_token = _parse_token(resp)
+            self._store(creds.key, new_token)
+            return new_token.access_token
+
+    def invalidate(self, creds: ClientCredentials) -> None:
+        """Drop a token the resource server rejected (401)."""
+        with self._guard:
+            self._tokens.pop(creds.key, None)
+        self._flights.forget(creds.key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"tokens": len(self._tokens), "hits": self.hits, "fetches": self.fetches}
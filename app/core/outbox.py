@@ -0,0 +1,175 @@
+"""Worker genérico para tablas outbox (pending → sending → sent/failed)."""
+
+import abc
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Generic, List, Optional, TypeVar
+
+from sqlalchemy import and_, func, or_, select, update
+
+from app.db.session import SessionLocal
+
+J = TypeVar("J")
+
+
+class OutboxWorker(abc.ABC, Generic[J]):
+    """
+    Drains an outbox table with bounded concurrency.
+
+    The model needs ``id``, ``status``, ``attempts``, ``next_attempt_at``,
+    ``last_error``, ``sent_at`` and ``updated_at``. Rows are claimed with FOR
+    UPDATE SKIP LOCKED (safe across instances) and marked ``sending``; rows
+    stuck in ``sending`` longer than the lease (crash mid-delivery) are claimed
+    again. Failures are retried with exponential backoff until
+    ``max_attempts``, then marked ``failed``.
+
+    Subclasses turn rows into plain jobs (``_job``, read while the row is
+    locked) and deliver a claimed batch (``_deliver_batch``).
+    """
+
+    model: Any = None
+    name = "outbox-worker"
+
+    def __init__(
+        self,
+        *,
+        batch_size: int,
+        concurrency: int,
+        max_attempts: int,
+        base_backoff_seconds: float,
+        max_backoff_seconds: float,
+        poll_interval_seconds: float,
+        lease_seconds: float,
+    ) -> None:
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.lease_seconds = lease_seconds
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    # -- hooks --
+
+    @abc.abstractmethod
+    def _job(self, row: Any) -> J:
+        """Detached job built from the claimed row."""
+
+    @abc.abstractmethod
+    async def _deliver_batch(self, jobs: List[J]) -> Dict[int, Optional[str]]:
+        """Deliver the batch; returns {job id: error or None}."""
+
+    async def _after_sent(self, jobs: List[J]) -> None:
+        """Called with the jobs delivered in this batch, after their status is committed."""
+
+    # -- loop --
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** max(attempts - 1, 0)))
+        return delay * (0.8 + random.random() * 0.4)
+
+    async def _claim(self) -> List[J]:
+        model = self.model
+        lease_cutoff = datetime.now(tz=timezone.utc) - timedelta(seconds=self.lease_seconds)
+        async with SessionLocal() as session:
+            result = await session.execute(
+                select(model)
+                .where(
+                    or_(
+                        and_(model.status == "pending", model.next_attempt_at <= func.now()),
+                        and_(model.status == "sending", model.updated_at < lease_cutoff),
+                    )
+                )
+                .order_by(model.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = result.scalars().all()
+            jobs: List[J] = []
+            for row in rows:
+                row.status = "sending"
+                row.attempts = (row.attempts or 0) + 1
+                jobs.append(self._job(row))
+            await session.commit()
+        return jobs
+
+    async def drain_once(self) -> int:
+        """Claim one batch, deliver it and record the outcome. Returns the batch size."""
+        jobs = await self._claim()
+        if not jobs:
+            return 0
+        errors = await self._deliver_batch(jobs)
+
+        now = datetime.now(tz=timezone.utc)
+        delivered: List[J] = []
+        async with SessionLocal() as session:
+            for job in jobs:
+                error = errors.get(job.id)  # type: ignore[attr-defined]
+                if error is None:
+                    values: Dict[str, Any] = {"status": "sent", "sent_at": now, "last_error": None}
+                    delivered.append(job)
+                    self.sent += 1
+                elif job.attempts >= self.max_attempts:  # type: ignore[attr-defined]
+                    values = {"status": "failed", "last_error": error}
+                    self.failed += 1
+                else:
+                    values = {
+                        "status": "pending",
+                        "last_error": error,
+                        "next_attempt_at": now + timedelta(seconds=self._backoff(job.attempts)),  # type: ignore[attr-defined]
+                    }
+                    self.retried += 1
+                await session.execute(
+                    update(self.model).where(self.model.id == job.id).values(**values, updated_at=func.now())  # type: ignore[attr-defined]
+                )
+            await session.commit()
+
+        if delivered:
+            await self._after_sent(delivered)
+        return len(jobs)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                processed = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - BD caída: reintentar en el próximo ciclo
+                processed = 0
+            if processed:
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Let the current batch finish (up to ``timeout``), then cancel."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self.wake()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"sent": self.sent, "retried": self.retried, "failed": self.failed}
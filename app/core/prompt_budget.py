@@ -0,0 +1,152 @@
+"""
+Armado de prompts IA dentro de un presupuesto de tokens.
+
+Las secciones reservan presupuesto en el orden en que se empaquetan (prioridad)
+y el llamador las ubica después en el orden de la plantilla. Los tokens se
+cuentan con tiktoken si está instalado; si no, ~4 caracteres por token.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.ia_quota import estimate_tokens
+
+_encoder: Any = None
+_encoder_loaded = False
+
+# Truncado: se conserva el inicio y el final (en logs pegados el error suele estar al final).
+_HEAD_SHARE = 0.6
+_OMITTED = "\n[… {} caracteres omitidos …]\n"
+
+
+def load_encoder() -> None:
+    """
+    Load the tiktoken encoding (the first time it may download the BPE file).
+    Blocking: the lifespan runs it in a thread so requests never pay for it.
+    """
+    global _encoder, _encoder_loaded
+    if _encoder_loaded:
+        return
+    try:
+        import tiktoken
+
+        _encoder = tiktoken.get_encoding("o200k_base")
+    except Exception:  # no instalado o sin acceso a los BPE: aproximación
+        _encoder = None
+    _encoder_loaded = True
+
+
+def _get_encoder() -> Any:
+    if not _encoder_loaded:
+        load_encoder()
+    return _encoder
+
+
+def count_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return estimate_tokens(len(text))
+
+
+def _snap(text: str, index: int, *, forward: bool) -> int:
+    """Move a cut point to the nearest line break (or space) within a short distance."""
+    window = 200
+    for sep in ("\n", " "):
+        if forward:
+            pos = text.find(sep, index, index + window)
+            if pos != -1:
+                return pos + 1
+        else:
+            pos = text.rfind(sep, max(0, index - window), index)
+            if pos != -1:
+                return pos
+    return index
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Shorten ``text`` to about ``max_tokens``, keeping head and tail around an omission marker."""
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    # Caracteres por token del propio texto, para que el corte sirva también con tiktoken.
+    keep_chars = int(len(text) * max_tokens / tokens) - len(_OMITTED)
+    if keep_chars <= 0:
+        return text[: max(0, int(len(text) * max_tokens / tokens))]
+    head_end = _snap(text, int(keep_chars * _HEAD_SHARE), forward=False)
+    tail_start = _snap(text, len(text) - (keep_chars - head_end), forward=True)
+    if tail_start <= head_end:
+        return text
+    return text[:head_end].rstrip() + _OMITTED.format(tail_start - head_end) + text[tail_start:].lstrip()
+
+
+@dataclass
+class PromptPacker:
+    """Token budget shared by the sections of one prompt; records what was cut or dropped."""
+
+    budget: int
+    max_item_tokens: int
+    min_item_tokens: int = 24
+    used: int = 0
+    dropped: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.budget - self.used)
+
+    def reserve(self, text: str) -> str:
+        """Mandatory text (system prompt, ticket header): always kept, counted against the budget."""
+        self.used += count_tokens(text)
+        return text
+
+    def text(self, name: str, value: Optional[str]) -> str:
+        """Single optional section, truncated to the item cap and to what is left."""
+        if not value:
+            return ""
+        limit = min(self.max_item_tokens, self.remaining)
+        if limit < self.min_item_tokens:
+            self.dropped[name] = "omitida"
+            return ""
+        packed = truncate_text(value, limit)
+        if packed != value:
+            self.dropped[name] = "truncada"
+        self.used += count_tokens(packed)
+        return packed
+
+    def items(self, name: str, values: Sequence[str], *, limit: int = 0) -> List[str]:
+        """
+        Pack the newest entries of a chronological list (up to ``limit``, 0 = all)
+        while they fit; each one is truncated to the item cap. Returns them in
+        chronological order.
+        """
+        candidates = list(values[-limit:] if limit > 0 else values)
+        packed: List[str] = []
+        truncated = 0
+        for value in reversed(candidates):
+            cap = min(self.max_item_tokens, self.remaining)
+            if cap < self.min_item_tokens:
+                break
+            item = truncate_text(value, cap)
+            truncated += item != value
+            self.used += count_tokens(item)
+            packed.append(item)
+        packed.reverse()
+        dropped = len(candidates) - len(packed)
+        notes = []
+        if dropped:
+            notes.append(f"{dropped} omitidos")
+        if truncated:
+            notes.append(f"{truncated} truncados")
+        if notes:
+            self.dropped[name] = ", ".join(notes)
+        return packed
+
+    def report(self) -> Optional[str]:
+        """Summary for ia_logs.prompt_dropped, e.g. ``historial: 4 omitidos; descripcion: truncada``."""
+        if not self.dropped:
+            return None
+        return "; ".join(f"{name}: {note}" for name, note in self.dropped.items())
@@ -0,0 +1,393 @@
+"""Invitaciones masivas de review de experiencia: job reanudable sobre Graph $batch."""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from string import Template
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import quote
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.config_store import get_config
+from app.core.email_client import (
+    GRAPH_BATCH_LIMIT,
+    BatchItemResult,
+    EmailSendError,
+    MailSender,
+    OutgoingMail,
+    get_mail_sender,
+)
+from app.core.review_tokens import generate_token, get_review_config
+from app.core.sdp_client import get_sdp_client
+from app.db.session import SessionLocal
+from app.models.review_invitations import ReviewInvitation, ReviewInvitationJob
+
+DEFAULT_SUBJECT = "[SDP #${display_id}] ¿Cómo fue tu experiencia?"
+DEFAULT_BODY = """Hola ${requester_name},
+
+Tu ticket #${display_id} "${ticket_subject}" fue cerrado.
+Si la atención no fue la esperada, puedes solicitar una revisión aquí:
+${review_link}
+
+El enlace vence en ${ttl_hours} horas.
+"""
+
+# Reintento por defecto cuando el batch completo falla sin Retry-After (red, 5xx).
+_TRANSIENT_RETRY_SECONDS = 30.0
+
+
+@lru_cache(maxsize=16)
+def _compile(text: str) -> Template:
+    return Template(text)
+
+
+def _setting_text(settings_map: Any, key: str) -> Optional[str]:
+    value = settings_map.get(key)
+    if isinstance(value, dict) and "v" in value:
+        value = value.get("v")
+    return str(value) if value else None
+
+
+@dataclass(frozen=True)
+class InvitationTemplate:
+    """Subject/body compiled once per job run, plus the token parameters."""
+
+    subject: Template
+    body: Template
+    secret: str
+    ttl_hours: int
+    base_url: str
+
+    def render(self, invitation: ReviewInvitation, job_id: int) -> OutgoingMail:
+        token = generate_token(invitation.ticket_id, self.secret, self.ttl_hours)
+        values = {
+            "display_id": invitation.display_id or invitation.ticket_id,
+            "ticket_id": invitation.ticket_id,
+            "ticket_subject": invitation.ticket_subject or "",
+            "requester_name": invitation.requester_name or "",
+            "review_link": f"{self.base_url}?token={quote(token)}",
+            "ttl_hours": self.ttl_hours,
+        }
+        return OutgoingMail(
+            to=[invitation.email or ""],
+            subject=self.subject.safe_substitute(values),
+            plain_body=self.body.safe_substitute(values),
+            message_id=f"<review.{invitation.ticket_id}.{job_id}@{settings.app_name}>",
+        )
+
+
+async def load_invitation_template() -> InvitationTemplate:
+    snapshot = await get_config()
+    secret, ttl_hours = get_review_config(snapshot.settings)
+    return InvitationTemplate(
+        subject=_compile(_setting_text(snapshot.settings, "review_invitation_subject") or DEFAULT_SUBJECT),
+        body=_compile(_setting_text(snapshot.settings, "review_invitation_body") or DEFAULT_BODY),
+        secret=secret,
+        ttl_hours=ttl_hours,
+        base_url=(_setting_text(snapshot.settings, "review_link_base_url") or settings.review_link_base_url).rstrip("?"),
+    )
+
+
+def _invitation_row(job_id: int, ticket: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    ticket_id = ticket.get("id")
+    if not ticket_id:
+        return None
+    requester = ticket.get("requester") or {}
+    email = requester.get("email") or requester.get("email_id") or ticket.get("requester_email")
+    return {
+        "job_id": job_id,
+        "ticket_id": str(ticket_id),
+        "display_id": str(ticket.get("display_id") or ticket_id),
+        "ticket_subject": ticket.get("subject"),
+        "requester_name": requester.get("name") or ticket.get("requester_name"),
+        "email": email,
+        "status": "pending" if email else "skipped",
+        "error": None if email else "requester_email_missing",
+    }
+
+
+async def create_job(
+    db: AsyncSession,
+    *,
+    requested_by: str,
+    closed_after: datetime,
+    closed_before: Optional[datetime] = None,
+) -> ReviewInvitationJob:
+    job = ReviewInvitationJob(requested_by=requested_by, closed_after=closed_after, closed_before=closed_before)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+@dataclass
+class _ClaimedJob:
+    id: int
+    phase: str
+    closed_after: datetime
+    closed_before: Optional[datetime]
+    next_page: int
+
+
+class ReviewInvitationRunner:
+    """
+    Runs invitation jobs in the background of this instance.
+
+    A job is claimed with a conditional UPDATE (queued, failed, or running
+    with a heartbeat older than the lease), so a crashed run is picked up by
+    the next startup and two instances never run the same job. Discovery
+    commits each gateway page together with ``next_page``; the send phase
+    only reads ``pending`` invitations, so both resume where they stopped.
+    """
+
+    def __init__(
+        self,
+        *,
+        page_size: int,
+        batch_concurrency: int,
+        batch_interval_seconds: float,
+        max_attempts: int,
+        lease_seconds: float,
+    ) -> None:
+        self.page_size = page_size
+        self.batch_concurrency = batch_concurrency
+        self.batch_interval_seconds = batch_interval_seconds
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self._tasks: Dict[int, "asyncio.Task[None]"] = {}
+
+    def launch(self, job_id: int) -> bool:
+        """Start the job here unless this instance is already running it."""
+        if self.is_running(job_id):
+            return False
+        task = asyncio.create_task(self._run(job_id), name=f"review-invitations-{job_id}")
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _t, k=job_id: self._tasks.pop(k, None))
+        return True
+
+    def is_running(self, job_id: int) -> bool:
+        task = self._tasks.get(job_id)
+        return task is not None and not task.done()
+
+    async def resume_pending(self) -> List[int]:
+        """Launch queued jobs and running jobs whose owner stopped heartbeating."""
+        cutoff = datetime.now(tz=timezone.utc) - timedelta(seconds=self.lease_seconds)
+        async with SessionLocal() as session:
+            result = await session.execute(
+                select(ReviewInvitationJob.id).where(
+                    or_(
+                        ReviewInvitationJob.status == "queued",
+                        and_(ReviewInvitationJob.status == "running", ReviewInvitationJob.heartbeat_at < cutoff),
+                    )
+                )
+            )
+            job_ids = list(result.scalars().all())
+        return [job_id for job_id in job_ids if self.launch(job_id)]
+
+    async def _claim(self, job_id: int) -> Optional[_ClaimedJob]:
+        cutoff = datetime.now(tz=timezone.utc) - timedelta(seconds=self.lease_seconds)
+        async with SessionLocal() as session:
+            result = await session.execute(
+                update(ReviewInvitationJob)
+                .where(
+                    ReviewInvitationJob.id == job_id,
+                    or_(
+                        ReviewInvitationJob.status.in_(("queued", "failed")),
+                        and_(
+                            ReviewInvitationJob.status == "running",
+                            or_(ReviewInvitationJob.heartbeat_at.is_(None), ReviewInvitationJob.heartbeat_at < cutoff),
+                        ),
+                    ),
+                )
+                .values(status="running", heartbeat_at=func.now(), last_error=None, finished_at=None, updated_at=func.now())
+                .returning(
+                    ReviewInvitationJob.id,
+                    ReviewInvitationJob.phase,
+                    ReviewInvitationJob.closed_after,
+                    ReviewInvitationJob.closed_before,
+                    ReviewInvitationJob.next_page,
+                )
+            )
+            row = result.one_or_none()
+            await session.commit()
+        return _ClaimedJob(*row) if row is not None else None
+
+    async def _update_job(self, session: AsyncSession, job_id: int, **values: Any) -> None:
+        await session.execute(
+            update(ReviewInvitationJob)
+            .where(ReviewInvitationJob.id == job_id)
+            .values(**values, heartbeat_at=func.now(), updated_at=func.now())
+        )
+
+    async def _discover(self, job: _ClaimedJob) -> None:
+        sdp_client = get_sdp_client()
+        async for page, tickets in sdp_client.iter_closed_requests(
+            job.closed_after,
+            job.closed_before,
+            page_size=self.page_size,
+            start_page=job.next_page,
+        ):
+            rows: Dict[str, Dict[str, Any]] = {}
+            for ticket in tickets:
+                row = _invitation_row(job.id, ticket)
+                if row is not None:
+                    rows[row["ticket_id"]] = row
+            async with SessionLocal() as session:
+                statuses: List[str] = []
+                if rows:
+                    result = await session.execute(
+                        insert(ReviewInvitation)
+                        .values(list(rows.values()))
+                        .on_conflict_do_nothing(index_elements=[ReviewInvitation.ticket_id])
+                        .returning(ReviewInvitation.status)
+                    )
+                    statuses = list(result.scalars().all())
+                # Ya invitados en otro job (conflicto) o sin correo del solicitante.
+                skipped = len(tickets) - len(statuses) + statuses.count("skipped")
+                await self._update_job(
+                    session,
+                    job.id,
+                    next_page=page + 1,
+                    discovered=ReviewInvitationJob.discovered + len(tickets),
+                    skipped=ReviewInvitationJob.skipped + skipped,
+                )
+                await session.commit()
+        async with SessionLocal() as session:
+            await self._update_job(session, job.id, phase="send")
+            await session.commit()
+
+    async def _send_chunk(
+        self,
+        sender: MailSender,
+        mails: Sequence[OutgoingMail],
+        semaphore: asyncio.Semaphore,
+    ) -> List[BatchItemResult]:
+        async with semaphore:
+            try:
+                return await sender.asend_batch(mails)
+            except EmailSendError as exc:
+                failure = BatchItemResult(ok=False, error=str(exc), retry_after=_TRANSIENT_RETRY_SECONDS)
+                return [failure] * len(mails)
+
+    async def _send(self, job: _ClaimedJob) -> None:
+        template = await load_invitation_template()
+        sender = await get_mail_sender()
+        semaphore = asyncio.Semaphore(max(self.batch_concurrency, 1))
+        round_size = GRAPH_BATCH_LIMIT * max(self.batch_concurrency, 1)
+        while True:
+            async with SessionLocal() as session:
+                result = await session.execute(
+                    select(ReviewInvitation)
+                    .where(ReviewInvitation.job_id == job.id, ReviewInvitation.status == "pending")
+                    .order_by(ReviewInvitation.id)
+                    .limit(round_size)
+                )
+                invitations = list(result.scalars().all())
+            if not invitations:
+                return
+
+            chunks = [invitations[i : i + GRAPH_BATCH_LIMIT] for i in range(0, len(invitations), GRAPH_BATCH_LIMIT)]
+            outcomes = await asyncio.gather(
+                *(
+                    self._send_chunk(sender, [template.render(inv, job.id) for inv in chunk], semaphore)
+                    for chunk in chunks
+                )
+            )
+
+            now = datetime.now(tz=timezone.utc)
+            sent = failed = 0
+            wait = 0.0
+            updates: List[Dict[str, Any]] = []
+            for chunk, results in zip(chunks, outcomes):
+                for invitation, outcome in zip(chunk, results):
+                    attempts = invitation.attempts + 1
+                    values: Dict[str, Any] = {"id": invitation.id, "attempts": attempts, "updated_at": now}
+                    if outcome.ok:
+                        values.update(status="sent", sent_at=now, error=None)
+                        sent += 1
+                    elif outcome.retry_after is not None and attempts < self.max_attempts:
+                        values.update(status="pending", error=outcome.error)
+                        wait = max(wait, outcome.retry_after)
+                    else:
+                        values.update(status="failed", error=outcome.error)
+                        failed += 1
+                    updates.append(values)
+            async with SessionLocal() as session:
+                # UPDATE por PK en bloque (executemany): un round trip por ronda.
+                await session.execute(update(ReviewInvitation), updates)
+                await self._update_job(
+                    session,
+                    job.id,
+                    sent=ReviewInvitationJob.sent + sent,
+                    failed=ReviewInvitationJob.failed + failed,
+                )
+                await session.commit()
+            # Respeta Retry-After de Graph; si no hubo throttling, pausa fija entre rondas.
+            await self._pause(job.id, wait or self.batch_interval_seconds)
+
+    async def _pause(self, job_id: int, seconds: float) -> None:
+        """Sleep ``seconds`` refreshing the heartbeat, so a long Retry-After does not outlive the lease."""
+        step = max(self.lease_seconds / 3, 1.0)
+        while seconds > 0:
+            await asyncio.sleep(min(seconds, step))
+            seconds -= step
+            if seconds > 0:
+                async with SessionLocal() as session:
+                    await self._update_job(session, job_id)
+                    await session.commit()
+
+    async def _run(self, job_id: int) -> None:
+        job = await self._claim(job_id)
+        if job is None:
+            return
+        try:
+            if job.phase == "discover":
+                await self._discover(job)
+            await self._send(job)
+        except asyncio.CancelledError:
+            # Shutdown: stop() lo devuelve a "queued".
+            raise
+        except Exception as exc:
+            error = str(getattr(exc, "detail", None) or exc) or type(exc).__name__
+            async with SessionLocal() as session:
+                await self._update_job(session, job.id, status="failed", last_error=error)
+                await session.commit()
+            return
+        async with SessionLocal() as session:
+            await self._update_job(session, job.id, status="completed", finished_at=func.now())
+            await session.commit()
+
+    async def stop(self) -> None:
+        """Cancel local runs and hand them back as queued so the next startup resumes them."""
+        job_ids = list(self._tasks)
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        if not job_ids:
+            return
+        try:
+            async with SessionLocal() as session:
+                await session.execute(
+                    update(ReviewInvitationJob)
+                    .where(ReviewInvitationJob.id.in_(job_ids), ReviewInvitationJob.status == "running")
+                    .values(status="queued", updated_at=func.now())
+                )
+                await session.commit()
+        except Exception:  # pragma: no cover - sin BD al apagar: se reanuda al vencer el lease
+            pass
+
+
+review_invitation_runner = ReviewInvitationRunner(
+    page_size=settings.review_invitation_page_size,
+    batch_concurrency=settings.review_invitation_batch_concurrency,
+    batch_interval_seconds=settings.review_invitation_batch_interval_seconds,
+    max_attempts=settings.review_invitation_max_attempts,
+    lease_seconds=settings.review_invitation_lease_seconds,
+)
@@ -5,7 +5,11 @@ import hashlib
 import hmac
 import json
 import time
-from typing import Dict
+from typing import Any, Dict, Mapping
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
 
 
 def _b64encode(data: bytes) -> str:
@@ -57,3 +61,27 @@ def decode_token(token: str, secret: str) -> Dict[str, str]:
     if now > exp:
         raise ValueError("token_expired")
     return payload
+
+
+def get_review_config(settings_map: Mapping[str, Any]) -> tuple[str, int]:
+    """HMAC secret and TTL (hours) from copilot.settings, falling back to env."""
+
+    def _extract(key: str):
+        val = settings_map.get(key) if settings_map else None
+        if isinstance(val, dict) and "v" in val:
+            return val.get("v")
+        return val
+
+    secret = _extract("review_token_secret")
+    ttl_hours = _extract("review_token_ttl_hours")
+    if not secret:
+        secret = settings.review_token_secret
+    if not secret:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="review_secret_missing")
+    if ttl_hours is None:
+        ttl_hours = settings.experience_review_token_ttl_hours
+    try:
+        ttl_hours_int = int(ttl_hours)
+    except Exception as exc:  # pragma: no cover - defensive
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="review_ttl_invalid") from exc
+    return secret, ttl_hours_int
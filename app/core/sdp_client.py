@@ -1,20 +1,266 @@
 """HTTP client to talk to SDP_API_GW_OP."""
 
-from typing import Any, Dict, List, Optional
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
 import httpx
 from fastapi import HTTPException, status
 
+from app.core.cache import CacheNamespace, shared_cache, shared_namespace
 from app.core.config import settings
+from app.core.singleflight import SingleFlight
+
+# Un único pool de conexiones por worker; se abre/cierra en el lifespan de la app.
+_http_client: Optional[httpx.AsyncClient] = None
+_sdp_client: Optional["SdpClient"] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    """Create the pooled AsyncClient used for every gateway call."""
+    limits = httpx.Limits(
+        max_connections=settings.gateway_max_connections,
+        max_keepalive_connections=settings.gateway_max_keepalive_connections,
+        keepalive_expiry=settings.gateway_keepalive_expiry_seconds,
+    )
+    timeout = httpx.Timeout(
+        settings.gateway_timeout_seconds,
+        connect=settings.gateway_connect_timeout_seconds,
+    )
+    return httpx.AsyncClient(
+        base_url=settings.gateway_base_url.rstrip("/"),
+        limits=limits,
+        timeout=timeout,
+        # HTTP/2 requiere el extra httpx[http2]; si no está instalado seguimos en HTTP/1.1.
+        http2=settings.gateway_http2 and _http2_available(),
+    )
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Open the shared gateway connection pool (idempotent)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared pool on shutdown, releasing keep-alive connections."""
+    global _http_client, _sdp_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _sdp_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared pool, creating it lazily outside the app lifespan (scripts, shell)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class GatewayCache:
+    """
+    Bounded LRU cache for gateway GETs with per-resource TTL.
+
+    Expired entries that carry ETag/Last-Modified are kept so the next call can
+    revalidate with If-None-Match / If-Modified-Since instead of a full download.
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int, ttls: Dict[str, float]) -> None:
+        self.max_entries = max_entries
+        self.ttls = ttls
+        self._entries: "OrderedDict[Tuple[str, str], _CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Se incrementa en cada invalidación: una descarga iniciada antes de una escritura no se guarda.
+        self.generation = 0
+
+    def ttl(self, kind: str) -> float:
+        return float(self.ttls.get(kind, 0) or 0)
+
+    def lookup(self, kind: str, key: str) -> Tuple[Optional[Any], Optional[_CacheEntry]]:
+        """Return (fresh value, None) on hit, or (None, stale entry usable for revalidation)."""
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            self.misses += 1
+            return None, None
+        self._entries.move_to_end((kind, key))
+        if entry.expires_at > time.monotonic():
+            self.hits += 1
+            return entry.value, None
+        self.misses += 1
+        if entry.revalidatable:
+            return None, entry
+        del self._entries[(kind, key)]
+        return None, None
+
+    def store(
+        self,
+        kind: str,
+        key: str,
+        value: Any,
+        *,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        generation: Optional[int] = None,
+    ) -> None:
+        ttl = self.ttl(kind)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[(kind, key)] = _CacheEntry(
+            value=value,
+            expires_at=time.monotonic() + ttl,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        self._entries.move_to_end((kind, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def refresh(self, kind: str, key: str, entry: _CacheEntry) -> Any:
+        """Extend a stale entry after a 304 Not Modified."""
+        self.revalidated += 1
+        entry.expires_at = time.monotonic() + self.ttl(kind)
+        self._entries[(kind, key)] = entry
+        self._entries.move_to_end((kind, key))
+        return entry.value
+
+    def invalidate(self, key: str, kinds: Optional[List[str]] = None) -> None:
+        self.generation += 1
+        for kind in kinds or list(self.ttls):
+            if self._entries.pop((kind, key), None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "revalidated": self.revalidated,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "ttl_seconds": dict(self.ttls),
+        }
+
+
+inflight = SingleFlight()
+
+response_cache = GatewayCache(
+    max_entries=settings.gateway_cache_max_entries,
+    ttls={
+        "detail": settings.gateway_cache_detail_ttl_seconds,
+        "history": settings.gateway_cache_history_ttl_seconds,
+    },
+)
+
+
+def _shared_namespace(kind: str) -> Optional[CacheNamespace]:
+    """Shared (cross-instance) tier for a gateway resource, when enabled and cacheable."""
+    ttl = response_cache.ttl(kind)
+    return shared_namespace(f"gateway:{kind}", ttl) if ttl > 0 else None
+
+
+# La versión sobrevive a las entradas que versiona (más el margen de un fetch en curso).
+_VERSION_TTL_MARGIN_SECONDS = 300.0
+
+
+def _shared_versions() -> Optional[CacheNamespace]:
+    """Per-ticket write version in the shared tier; it is part of every shared gateway key."""
+    ttl = max(response_cache.ttls.values(), default=0)
+    return shared_namespace("gateway:version", ttl + _VERSION_TTL_MARGIN_SECONDS) if ttl > 0 else None
+
+
+async def _shared_key(key: str) -> str:
+    """
+    Shared-tier key for a ticket at its current write version. A write bumps the
+    version, so entries stored before it (including late ``set_later`` calls of
+    fetches that started earlier) can no longer be read.
+    """
+    versions = _shared_versions()
+    version = await versions.get(key) if versions is not None else None
+    return f"{key}@{version}" if version else key
+
+
+# Callbacks con el ticket_id invalidado (p. ej. el historial local en ticket_events).
+_invalidation_listeners: List[Callable[[str], None]] = []
+
+
+def on_ticket_invalidated(callback: Callable[[str], None]) -> None:
+    """Register a callback run by ``SdpClient.invalidate_ticket`` after a write to the ticket."""
+    _invalidation_listeners.append(callback)
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the gateway response cache and single-flight registry (per worker)."""
+    return {
+        **response_cache.stats(),
+        "single_flight": inflight.stats(),
+        "shared": shared_cache.stats() if shared_cache is not None else None,
+    }
+
+
+def _flight_key(method: str, path: str, params: Optional[Dict[str, str]] = None) -> Tuple[str, str, Tuple]:
+    return (method, path, tuple(sorted((params or {}).items())))
 
 
 class SdpClient:
     """Lightweight async client for the SDP gateway."""
 
-    def __init__(self) -> None:
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None) -> None:
         self.base_url = settings.gateway_base_url.rstrip("/")
         self.client_name = settings.gateway_client
         self.api_key = settings.gateway_api_key
+        self._client = http_client
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._client is not None and not self._client.is_closed:
+            return self._client
+        return get_http_client()
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "X-Cliente": self.client_name,
+            "X-Api-Key": self.api_key,
+        }
 
     async def get_assigned_requests(
         self,
@@ -24,18 +270,19 @@ class SdpClient:
         priorities: Optional[List[str]] = None,
     ) -> List[Dict[str, Any]]:
         """Call /request/assigned in the gateway."""
-        headers = {
-            "X-Cliente": self.client_name,
-            "X-Api-Key": self.api_key,
-        }
         params: Dict[str, str] = {"technician_id": str(technician_id)}
         if statuses:
             params["status"] = ",".join(statuses)
         if priorities:
             params["priority"] = ",".join(priorities)
 
-        async with httpx.AsyncClient(base_url=self.base_url, timeout=30) as client:
-            resp = await client.get("/request/assigned", params=params, headers=headers)
+        return await inflight.do(
+            _flight_key("GET", "/request/assigned", params),
+            lambda: self._fetch_assigned(params),
+        )
+
+    async def _fetch_assigned(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        resp = await self.http.get("/request/assigned", params=params, headers=self._headers())
 
         # Parse and bubble up gateway errors with more context.
         try:
@@ -57,14 +304,124 @@ class SdpClient:
 
         return data.get("tickets", []) or []
 
+    async def iter_closed_requests(
+        self,
+        closed_after: datetime,
+        closed_before: Optional[datetime] = None,
+        *,
+        page_size: int = 100,
+        start_page: int = 1,
+    ) -> AsyncIterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Stream /request/closed page by page as (page, tickets); resumable from ``start_page``.
+
+        The gateway does not expose this listing yet: only used with REVIEW_INVITATIONS_ENABLED.
+        """
+        page = max(start_page, 1)
+        while True:
+            params: Dict[str, str] = {
+                "closed_after": closed_after.isoformat(),
+                "page": str(page),
+                "page_size": str(page_size),
+            }
+            if closed_before is not None:
+                params["closed_before"] = closed_before.isoformat()
+            resp = await self.http.get("/request/closed", params=params, headers=self._headers())
+            try:
+                data = resp.json()
+            except Exception as exc:  # pragma: no cover - defensive
+                raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="gateway_invalid_json") from exc
+            if resp.status_code != 200 or not isinstance(data, dict) or not data.get("ok"):
+                raise HTTPException(
+                    status_code=status.HTTP_502_BAD_GATEWAY,
+                    detail=(data.get("error") if isinstance(data, dict) else None)
+                    or f"gateway_request_failed (status={resp.status_code})",
+                )
+            tickets = data.get("tickets", []) or []
+            yield page, tickets
+            if not data.get("has_more", len(tickets) >= page_size):
+                return
+            page += 1
+
+    async def _cached_get(self, kind: str, ticket_id: str, path: str, parse: Callable[[httpx.Response], Any]) -> Any:
+        """GET through the response cache, revalidating with ETag/Last-Modified when available."""
+        key = str(ticket_id)
+        value, stale = response_cache.lookup(kind, key)
+        if value is not None:
+            return value
+
+        return await inflight.do(
+            _flight_key("GET", path),
+            lambda: self._fetch_and_store(kind, key, path, parse, stale),
+        )
+
+    async def _fetch_and_store(
+        self,
+        kind: str,
+        key: str,
+        path: str,
+        parse: Callable[[httpx.Response], Any],
+        stale: Optional[_CacheEntry],
+    ) -> Any:
+        generation = response_cache.generation
+        shared = _shared_namespace(kind)
+        shared_key = await _shared_key(key) if shared is not None else key
+        if stale is None and shared is not None:
+            # Otra instancia pudo haberlo descargado ya: tier compartido antes que el gateway.
+            hit = await shared.get(shared_key)
+            if isinstance(hit, dict) and "value" in hit:
+                response_cache.store(
+                    kind,
+                    key,
+                    hit["value"],
+                    etag=hit.get("etag"),
+                    last_modified=hit.get("last_modified"),
+                    generation=generation,
+                )
+                return hit["value"]
+
+        headers = self._headers()
+        if stale is not None:
+            if stale.etag:
+                headers["If-None-Match"] = stale.etag
+            if stale.last_modified:
+                headers["If-Modified-Since"] = stale.last_modified
+
+        resp = await self.http.get(path, headers=headers)
+        if resp.status_code == 304 and stale is not None:
+            return response_cache.refresh(kind, key, stale)
+
+        value = parse(resp)
+        etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        response_cache.store(kind, key, value, etag=etag, last_modified=last_modified, generation=generation)
+        if shared is not None and generation == response_cache.generation:
+            shared.set_later(shared_key, {"value": value, "etag": etag, "last_modified": last_modified})
+        return value
+
+    async def invalidate_ticket(self, ticket_id: str) -> None:
+        """
+        Drop cached detail/history for a ticket after a write.
+
+        The shared-tier version is bumped (and awaited) before the local cache
+        is cleared, so no read on this instance can refill it from a pre-write
+        shared entry.
+        """
+        key = str(ticket_id)
+        versions = _shared_versions()
+        if versions is not None:
+            await versions.set(key, str(time.time_ns()))
+        response_cache.invalidate(key)
+        inflight.forget(_flight_key("GET", f"/request/{ticket_id}"))
+        inflight.forget(_flight_key("GET", f"/request/{ticket_id}/history"))
+        for callback in _invalidation_listeners:
+            callback(key)
+
     async def get_request_detail(self, ticket_id: str) -> Dict[str, Any]:
         """Call /request/{ticket_id} in the gateway."""
-        headers = {
-            "X-Cliente": self.client_name,
-            "X-Api-Key": self.api_key,
-        }
-        async with httpx.AsyncClient(base_url=self.base_url, timeout=30) as client:
-            resp = await client.get(f"/request/{ticket_id}", headers=headers)
+        return await self._cached_get("detail", ticket_id, f"/request/{ticket_id}", self._parse_detail)
+
+    @staticmethod
+    def _parse_detail(resp: httpx.Response) -> Dict[str, Any]:
         try:
             data = resp.json()
         except Exception as exc:  # pragma: no cover - defensive
@@ -82,12 +439,10 @@ class SdpClient:
 
     async def get_request_history(self, ticket_id: str) -> List[Dict[str, Any]]:
         """Call /request/{ticket_id}/history in the gateway."""
-        headers = {
-            "X-Cliente": self.client_name,
-            "X-Api-Key": self.api_key,
-        }
-        async with httpx.AsyncClient(base_url=self.base_url, timeout=30) as client:
-            resp = await client.get(f"/request/{ticket_id}/history", headers=headers)
+        return await self._cached_get("history", ticket_id, f"/request/{ticket_id}/history", self._parse_history)
+
+    @staticmethod
+    def _parse_history(resp: httpx.Response) -> List[Dict[str, Any]]:
         try:
             data = resp.json()
         except Exception as exc:  # pragma: no cover - defensive
@@ -105,18 +460,31 @@ class SdpClient:
             events = data if isinstance(data, list) else []
         return events
 
+    async def get_request_history_since(self, ticket_id: str, since_event_id: int) -> List[Dict[str, Any]]:
+        """
+        Call /request/{ticket_id}/history?since_event_id=N (not cached).
+
+        Gateways that do not support the filter return the full history; callers
+        must tolerate both.
+        """
+        path = f"/request/{ticket_id}/history"
+        params = {"since_event_id": str(since_event_id)}
+
+        async def _fetch() -> List[Dict[str, Any]]:
+            resp = await self.http.get(path, params=params, headers=self._headers())
+            return self._parse_history(resp)
+
+        return await inflight.do(_flight_key("GET", path, params), _fetch)
+
     async def post_internal_note(self, ticket_id: str, text: str, technician_id: Optional[str] = None) -> None:
         """Send an internal note to SDP via gateway."""
-        headers = {
-            "X-Cliente": self.client_name,
-            "X-Api-Key": self.api_key,
-        }
         payload: Dict[str, Any] = {"text": text}
         if technician_id:
             payload["technician_id"] = str(technician_id)
 
-        async with httpx.AsyncClient(base_url=self.base_url, timeout=30) as client:
-            resp = await client.post(f"/request/{ticket_id}/note_internal", json=payload, headers=headers)
+        resp = await self.http.post(f"/request/{ticket_id}/note_internal", json=payload, headers=self._headers())
+        # La nota cambia el historial (y posiblemente el detalle): invalidar aunque falle.
+        await self.invalidate_ticket(ticket_id)
 
         try:
             data = resp.json()
@@ -128,3 +496,11 @@ class SdpClient:
                 status_code=status.HTTP_502_BAD_GATEWAY,
                 detail=data.get("error") or f"gateway_request_failed (status={resp.status_code})",
             )
+
+
+def get_sdp_client() -> SdpClient:
+    """FastAPI dependency: one SdpClient per worker sharing the pooled connection."""
+    global _sdp_client
+    if _sdp_client is None:
+        _sdp_client = SdpClient(get_http_client())
+    return _sdp_client
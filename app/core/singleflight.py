@@ -0,0 +1,44 @@
+"""Coalescing de llamadas async concurrentes con la misma clave."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Registry of in-flight calls keyed by an arbitrary hashable (e.g. method, path, params).
+
+    Concurrent callers with the same key await one shared task; its result or
+    exception is delivered to every waiter. A cancelled waiter does not cancel
+    the shared call for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Marca la excepción como leída aunque todos los waiters se hayan cancelado.
+        if not task.cancelled():
+            task.exception()
+
+    def forget(self, key: Hashable) -> None:
+        """Stop new callers from joining a call started before a write."""
+        self._calls.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls), "leaders": self.leaders, "coalesced": self.coalesced}
@@ -0,0 +1,205 @@
+"""Pool de sesiones SMTP autenticadas (STARTTLS + login/XOAUTH2) reutilizables."""
+
+import smtplib
+import threading
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+PoolKey = Tuple[str, int, str, bool]
+Authenticate = Callable[[smtplib.SMTP], None]
+
+
+def _is_dead_session(exc: BaseException) -> bool:
+    """Conexión caída (no un rechazo del mensaje): se puede reintentar con otra sesión."""
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException hereda de OSError: solo cuentan los errores de socket puros.
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+@dataclass
+class _Session:
+    smtp: smtplib.SMTP
+    created_at: float = field(default_factory=monotonic)
+    last_used: float = field(default_factory=monotonic)
+    messages: int = 0
+
+
+def _close(session: _Session) -> None:
+    try:
+        session.smtp.quit()
+    except Exception:  # pragma: no cover - la conexión ya estaba rota
+        session.smtp.close()
+
+
+class SmtpSessionPool:
+    """
+    Up to ``max_size`` authenticated sessions to one server/account.
+
+    Sends run in worker threads, so the pool is guarded by a threading lock.
+    A session idle longer than ``noop_after_seconds`` is probed with NOOP
+    before reuse; one idle longer than ``idle_timeout_seconds`` is closed
+    (also by a timer, so nothing lingers after a burst). A session is retired
+    after ``max_messages_per_connection`` messages.
+    """
+
+    def __init__(
+        self,
+        server: str,
+        port: int,
+        *,
+        max_size: int,
+        max_messages_per_connection: int,
+        idle_timeout_seconds: float,
+        noop_after_seconds: float,
+        timeout: float = 15.0,
+    ) -> None:
+        self.server = server
+        self.port = port
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.noop_after_seconds = noop_after_seconds
+        self.timeout = timeout
+        self._idle: List[_Session] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(max_size, 1))
+        self._timer: Optional[threading.Timer] = None
+        self.opened = 0
+        self.reused = 0
+
+    def _connect(self, authenticate: Authenticate) -> _Session:
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            smtp.starttls()
+            authenticate(smtp)
+        except Exception:
+            smtp.close()
+            raise
+        self.opened += 1
+        return _Session(smtp)
+
+    def _take_idle(self) -> Optional[_Session]:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                session = self._idle.pop()
+            idle_for = monotonic() - session.last_used
+            if idle_for >= self.idle_timeout_seconds:
+                _close(session)
+                continue
+            if idle_for >= self.noop_after_seconds:
+                try:
+                    code, _ = session.smtp.noop()
+                except (smtplib.SMTPException, OSError):
+                    code = 0
+                if code != 250:
+                    _close(session)
+                    continue
+            self.reused += 1
+            return session
+
+    def _release(self, session: _Session) -> None:
+        session.messages += 1
+        session.last_used = monotonic()
+        if session.messages >= self.max_messages_per_connection:
+            _close(session)
+            return
+        with self._lock:
+            self._idle.append(session)
+            self._schedule_sweep()
+
+    def _schedule_sweep(self) -> None:
+        if self._timer is None and self.idle_timeout_seconds > 0:
+            self._timer = threading.Timer(self.idle_timeout_seconds, self._sweep)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _sweep(self) -> None:
+        now = monotonic()
+        with self._lock:
+            self._timer = None
+            expired = [s for s in self._idle if now - s.last_used >= self.idle_timeout_seconds]
+            self._idle = [s for s in self._idle if s not in expired]
+            if self._idle:
+                self._schedule_sweep()
+        for session in expired:
+            _close(session)
+
+    def send_message(self, msg, authenticate: Authenticate) -> None:  # noqa: ANN001 - EmailMessage
+        """Send on a pooled session; a dead reused session is replaced once."""
+        with self._slots:
+            session = self._take_idle()
+            reused = session is not None
+            if session is None:
+                session = self._connect(authenticate)
+            try:
+                session.smtp.send_message(msg)
+            except Exception as exc:
+                if not (reused and _is_dead_session(exc)):
+                    # Rechazo del servidor (destinatario, tamaño...): la sesión puede quedar a medias.
+                    _close(session)
+                    raise
+                session.smtp.close()
+                session = self._connect(authenticate)
+                try:
+                    session.smtp.send_message(msg)
+                except Exception:
+                    _close(session)
+                    raise
+            self._release(session)
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._idle = self._idle, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for session in sessions:
+            _close(session)
+
+    def stats(self) -> Dict[str, int]:
+        return {"idle": len(self._idle), "opened": self.opened, "reused": self.reused}
+
+
+_pools: Dict[PoolKey, SmtpSessionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_smtp_pool(server: str, port: int, username: str, use_oauth: bool) -> SmtpSessionPool:
+    """One pool per server/account, shared by every EmailClient in the process."""
+    key = (server, port, username, use_oauth)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SmtpSessionPool(
+                server,
+                port,
+                max_size=settings.smtp_pool_size,
+                max_messages_per_connection=settings.smtp_pool_max_messages_per_connection,
+                idle_timeout_seconds=settings.smtp_pool_idle_timeout_seconds,
+                noop_after_seconds=settings.smtp_pool_noop_after_seconds,
+            )
+            _pools[key] = pool
+        return pool
+
+
+def close_smtp_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def get_smtp_pool_stats() -> Dict[str, Dict[str, int]]:
+    """Counters per ``server:port`` (pools of different accounts are summed; no usernames exposed)."""
+    stats: Dict[str, Dict[str, int]] = {}
+    for (server, port, _username, _use_oauth), pool in list(_pools.items()):
+        totals = stats.setdefault(f"{server}:{port}", {})
+        for name, value in pool.stats().items():
+            totals[name] = totals.get(name, 0) + value
+    return stats
@@ -0,0 +1,80 @@
+"""Cache de sugerencias IA por contenido exacto del prompt."""
+
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from app.core.cache import tiered_namespace
+from app.core.config import settings
+
+
+def suggestion_key(
+    operation: str,
+    messages: List[Dict[str, str]],
+    *,
+    temperature: float,
+    max_tokens: int,
+    deployment: str,
+) -> str:
+    """Hash of everything that determines the completion for a given prompt."""
+    payload = json.dumps(
+        {
+            "operation": operation,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "deployment": deployment,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SuggestionCache:
+    """
+    Generated suggestions with a single TTL.
+
+    Local LRU per worker; with SHARED_CACHE_ENABLED the suggestion is also
+    shared with the other instances through the Postgres tier (see app.core.cache).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._store = tiered_namespace("ia:suggestion", ttl_seconds, local_max_entries=max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._store.get(key) if self.enabled else None
+        if not isinstance(value, str):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        if not self.enabled or not value:
+            return
+        await self._store.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            **self._store.backend.stats(),
+        }
+
+
+suggestion_cache = SuggestionCache(
+    max_entries=settings.ia_suggestion_cache_max_entries,
+    ttl_seconds=settings.ia_suggestion_cache_ttl_seconds,
+)
@@ -0,0 +1,72 @@
+"""Resolución UPN → técnico SDP con cache en memoria invalidada por NOTIFY."""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.technician_mapping import TechnicianMapping
+
+# Canal emitido por el trigger de la migración 0005 con el user_upn afectado como payload.
+TECHNICIAN_MAPPING_CHANNEL = "copilot_technician_mapping"
+
+
+@dataclass(frozen=True)
+class TechnicianInfo:
+    user_upn: str
+    technician_id_sdp: str
+    team: Optional[str] = None
+
+
+class TechnicianDirectory:
+    """Per-worker map of active technician mappings (negative results are cached too)."""
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[float, Optional[TechnicianInfo]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, db: AsyncSession, user_upn: str) -> Optional[TechnicianInfo]:
+        cached = self._entries.get(user_upn)
+        if cached is not None and cached[0] > time.monotonic():
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        result = await db.execute(
+            select(TechnicianMapping).where(TechnicianMapping.user_upn == user_upn, TechnicianMapping.active.is_(True))
+        )
+        mapping = result.scalar_one_or_none()
+        info = TechnicianInfo(mapping.user_upn, mapping.technician_id_sdp, mapping.team) if mapping else None
+        if self.ttl_seconds > 0:
+            self._entries[user_upn] = (time.monotonic() + self.ttl_seconds, info)
+        return info
+
+    def invalidate(self, user_upn: str = "") -> None:
+        """Drop one UPN, or everything when the payload is empty."""
+        if user_upn:
+            self._entries.pop(user_upn, None)
+        else:
+            self._entries.clear()
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+technician_directory = TechnicianDirectory(ttl_seconds=settings.technician_cache_ttl_seconds)
+
+
+async def get_technician(db: AsyncSession, user_upn: str) -> TechnicianInfo:
+    """Return the active mapping for the UPN or raise 403 user_not_configured."""
+    info = await technician_directory.get(db, user_upn)
+    if info is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="user_not_configured")
+    return info
+
+
+async def resolve_technician_id(db: AsyncSession, user_upn: str) -> str:
+    return (await get_technician(db, user_upn)).technician_id_sdp
@@ -0,0 +1,124 @@
+"""Carga concurrente del contexto de un ticket para los prompts IA."""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Dict, List, Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config_store import OrgSnapshot, PersonaSnapshot, get_config
+from app.core.conversation_clean import conversation_cleaner
+from app.core.sdp_client import SdpClient
+from app.core.technicians import resolve_technician_id
+from app.core.ticket_events import get_ticket_events
+from app.models.services_catalog import ServiceCatalog
+
+
+@dataclass
+class TicketContext:
+    """Everything the IA prompt builders need for one ticket."""
+
+    ticket_id: str
+    technician_id: str
+    detail: Dict[str, Any]
+    history: List[Dict[str, Any]]
+    settings_map: Mapping[str, Any]
+    persona: PersonaSnapshot
+    org: OrgSnapshot
+    service: Optional[ServiceCatalog] = None
+    timings_ms: Dict[str, int] = field(default_factory=dict)
+
+
+async def load_service(db: AsyncSession, service_code: Optional[str]) -> Optional[ServiceCatalog]:
+    if not service_code:
+        return None
+    result = await db.execute(
+        select(ServiceCatalog).where(ServiceCatalog.service_code == str(service_code))
+    )
+    return result.scalar_one_or_none()
+
+
+async def _gather_or_cancel(*aws: Awaitable[Any]) -> List[Any]:
+    """Like asyncio.gather, but cancels the siblings as soon as one fails and re-raises it as-is."""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()  # type: ignore[misc]
+        return [task.result() for task in tasks]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def load_ticket_context(
+    db: AsyncSession,
+    sdp_client: SdpClient,
+    user_upn: str,
+    ticket_id: str,
+    *,
+    with_service: bool = True,
+) -> TicketContext:
+    """
+    Fetch gateway detail, history (ticket_events), technician mapping and configuration concurrently.
+
+    An AsyncSession only holds one connection and cannot run statements in
+    parallel, so reads on the request session stay sequential inside one
+    branch; that branch runs concurrently with the gateway detail call and the
+    history load (which uses its own session, see ticket_events, and is then
+    cleaned for the prompt, see conversation_clean). The
+    configuration snapshot is normally served from memory (see config_store).
+    The service lookup, the only step that depends on the detail, waits for it
+    at the end of the DB branch.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    timings: Dict[str, int] = {}
+
+    def _mark(name: str) -> None:
+        timings[name] = int((loop.time() - started) * 1000)
+
+    async def _timed(name: str, aw: Awaitable[Any]) -> Any:
+        value = await aw
+        _mark(name)
+        return value
+
+    detail_task = asyncio.ensure_future(_timed("detail", sdp_client.get_request_detail(ticket_id)))
+
+    async def _history() -> List[Dict[str, Any]]:
+        events = await get_ticket_events(sdp_client, ticket_id)
+        _mark("history")
+        return await conversation_cleaner.clean_history(events)
+
+    async def _db_branch() -> tuple:
+        technician_id = await resolve_technician_id(db, user_upn)
+        _mark("technician")
+        service = None
+        if with_service:
+            detail = await detail_task
+            service = await load_service(db, detail.get("service_code"))
+            _mark("service")
+        return technician_id, service
+
+    (technician_id, service), config, detail, history = await _gather_or_cancel(
+        _db_branch(),
+        _timed("config", get_config()),
+        detail_task,
+        _timed("history_clean", _history()),
+    )
+    _mark("total")
+    return TicketContext(
+        ticket_id=ticket_id,
+        technician_id=technician_id,
+        detail=detail,
+        history=history,
+        settings_map=config.settings,
+        persona=config.require_persona(),
+        org=config.require_org(),
+        service=service,
+        timings_ms=timings,
+    )
@@ -0,0 +1,288 @@
+"""
+Historial de tickets sincronizado de forma incremental en ``ticket_events``.
+
+Cada evento se normaliza una sola vez al ingresar (timestamp parseado,
+visibilidad en minúsculas, texto limpio). Con un watermark previo se pide al
+gateway solo lo nuevo (``since_event_id``); si el gateway devuelve el historial
+completo se hace diff contra lo guardado.
+"""
+
+import base64
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import delete, func, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.conversation_clean import clean_text
+from app.core.sdp_client import SdpClient, on_ticket_invalidated
+from app.core.singleflight import SingleFlight
+from app.core.ticket_snapshots import is_gateway_failure, parse_datetime
+from app.db.session import SessionLocal
+from app.models.ticket_events import TicketEvent, TicketEventSync
+
+# asyncpg admite hasta 32767 parámetros por sentencia; partimos en lotes holgados.
+_INSERT_CHUNK_SIZE = 1000
+# Lo que SDP permite cambiar de un evento sin cambiar su event_id.
+_EDITABLE_COLUMNS = ("type", "author_name", "author_type", "visibility", "occurred_at", "text", "old_value", "new_value")
+
+
+def _as_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _as_str(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def normalize_event(ticket_id: str, raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Gateway history item → ticket_events row."""
+    event_id = _as_int(raw.get("event_id"))
+    if event_id is not None:
+        key = str(event_id)
+    else:
+        # Sin event_id: identidad por contenido, estable entre descargas.
+        fingerprint = "\x1f".join(
+            str(raw.get(field) or "") for field in ("type", "timestamp", "author_name", "visibility", "text")
+        )
+        key = "h:" + hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:32]
+    visibility = raw.get("visibility")
+    return {
+        "ticket_id": str(ticket_id),
+        "event_key": key,
+        "event_id": event_id,
+        "type": _as_str(raw.get("type")),
+        "author_name": _as_str(raw.get("author_name")),
+        "author_type": _as_str(raw.get("author_type")),
+        "visibility": str(visibility).strip().lower() if visibility else None,
+        "occurred_at": parse_datetime(raw.get("timestamp")),
+        "text": clean_text(raw.get("text")),
+        "old_value": _as_str(raw.get("old_value")),
+        "new_value": _as_str(raw.get("new_value")),
+    }
+
+
+def event_dict(row: TicketEvent) -> Dict[str, Any]:
+    """Stored event in the gateway's shape (what the history endpoint and IA prompts consume)."""
+    return {
+        "event_id": row.event_id,
+        "type": row.type,
+        "author_name": row.author_name,
+        "author_type": row.author_type,
+        "visibility": row.visibility,
+        "timestamp": row.occurred_at.isoformat() if row.occurred_at else None,
+        "text": row.text,
+        "old_value": row.old_value,
+        "new_value": row.new_value,
+    }
+
+
+_dirty: Set[str] = set()
+_flights = SingleFlight()
+
+
+def mark_dirty(ticket_id: str) -> None:
+    """Force a sync on the next read (the ticket was written through this instance)."""
+    _dirty.add(str(ticket_id))
+    # Una lectura posterior a la escritura no debe sumarse a un sync iniciado antes.
+    _flights.forget(str(ticket_id))
+
+
+on_ticket_invalidated(mark_dirty)
+
+
+async def sync_ticket_events(sdp_client: SdpClient, ticket_id: str) -> int:
+    """
+    Pull new (or edited) events for a ticket into ticket_events. Returns how many rows were written.
+
+    No session is held across the gateway call: the watermark is read in a
+    short session, the fetch runs outside any, and the result is written in one.
+    """
+    async with SessionLocal() as session:
+        watermark = (
+            await session.execute(
+                select(TicketEventSync.last_event_id).where(TicketEventSync.ticket_id == ticket_id)
+            )
+        ).scalar_one_or_none()
+    incremental = watermark is not None and settings.gateway_history_incremental
+    if incremental:
+        raw_events = await sdp_client.get_request_history_since(ticket_id, watermark)
+    else:
+        raw_events = await sdp_client.get_request_history(ticket_id)
+
+    rows: Dict[str, Dict[str, Any]] = {}
+    for raw in raw_events:
+        if isinstance(raw, dict):
+            row = normalize_event(ticket_id, raw)
+            rows[row["event_key"]] = row
+    # Un evento anterior al watermark indica que el gateway ignoró el filtro: es el historial completo.
+    complete = not incremental or any(
+        row["event_id"] is not None and row["event_id"] < watermark for row in rows.values()  # type: ignore[operator]
+    )
+
+    async with SessionLocal() as session:
+        written = 0
+        values = list(rows.values())
+        for start in range(0, len(values), _INSERT_CHUNK_SIZE):
+            stmt = insert(TicketEvent).values(values[start : start + _INSERT_CHUNK_SIZE])
+            # Un evento editado en SDP conserva su event_id: se actualiza solo si cambió algo.
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[TicketEvent.ticket_id, TicketEvent.event_key],
+                set_={col: stmt.excluded[col] for col in _EDITABLE_COLUMNS},
+                where=tuple_(*(getattr(TicketEvent, col) for col in _EDITABLE_COLUMNS)).is_distinct_from(
+                    tuple_(*(stmt.excluded[col] for col in _EDITABLE_COLUMNS))
+                ),
+            ).returning(TicketEvent.id)
+            written += len((await session.execute(stmt)).all())
+        if complete:
+            # Diff: eventos que el gateway ya no devuelve (borrados/editados con otra identidad).
+            await session.execute(
+                delete(TicketEvent).where(TicketEvent.ticket_id == ticket_id, TicketEvent.event_key.notin_(list(rows)))
+            )
+
+        summary = (
+            await session.execute(
+                select(func.max(TicketEvent.event_id), func.max(TicketEvent.occurred_at), func.count()).where(
+                    TicketEvent.ticket_id == ticket_id
+                )
+            )
+        ).one()
+        stmt = insert(TicketEventSync).values(
+            ticket_id=ticket_id,
+            last_event_id=summary[0],
+            last_event_at=summary[1],
+            event_count=summary[2],
+            synced_at=func.now(),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TicketEventSync.ticket_id],
+            set_={col: stmt.excluded[col] for col in ("last_event_id", "last_event_at", "event_count", "synced_at")},
+        )
+        await session.execute(stmt)
+        await session.commit()
+    return written
+
+
+async def _sync_if_due(sdp_client: SdpClient, ticket_id: str) -> None:
+    """
+    Sync when the ticket was never synced, was written through this instance,
+    or its last sync is older than ``TICKET_EVENTS_SYNC_TTL_SECONDS``. If that
+    sync fails on the gateway side and events are stored, they are served as is.
+    The sync state is read in a short session closed before any gateway call.
+    """
+    async with SessionLocal() as session:
+        synced_at = (
+            await session.execute(select(TicketEventSync.synced_at).where(TicketEventSync.ticket_id == ticket_id))
+        ).scalar_one_or_none()
+    cutoff = datetime.now(tz=timezone.utc) - timedelta(seconds=settings.ticket_events_sync_ttl_seconds)
+    if synced_at is not None and ticket_id not in _dirty and synced_at >= cutoff:
+        return
+    dirty = ticket_id in _dirty
+    _dirty.discard(ticket_id)
+    try:
+        await _flights.do(ticket_id, lambda: sync_ticket_events(sdp_client, ticket_id))
+    except Exception as exc:
+        if synced_at is None or not is_gateway_failure(exc):
+            raise
+        if dirty:
+            _dirty.add(ticket_id)
+
+
+# Orden del historial: timestamp (los eventos sin timestamp van primero) y luego orden de ingreso.
+_NO_TIMESTAMP = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_sort_ts = func.coalesce(TicketEvent.occurred_at, _NO_TIMESTAMP)
+
+
+def encode_cursor(row: TicketEvent) -> str:
+    """Opaque cursor for an event: its position in the history order (timestamp + local id)."""
+    raw = f"{(row.occurred_at or _NO_TIMESTAMP).isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of ``encode_cursor``; raises ValueError on anything else."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        ts, row_id = raw.rsplit("|", 1)
+        occurred_at = datetime.fromisoformat(ts)
+    except Exception as exc:
+        raise ValueError("invalid_cursor") from exc
+    if occurred_at.tzinfo is None:
+        raise ValueError("invalid_cursor")
+    return occurred_at, int(row_id)
+
+
+@dataclass
+class EventPage:
+    events: List[TicketEvent]
+    has_more: bool
+
+
+async def get_ticket_events(sdp_client: SdpClient, ticket_id: str) -> List[Dict[str, Any]]:
+    """
+    Full ticket history in chronological order, read from ticket_events (syncing
+    first if due). Uses its own session so it can run alongside the caller's DB work.
+    """
+    ticket_id = str(ticket_id)
+    await _sync_if_due(sdp_client, ticket_id)
+    async with SessionLocal() as session:
+        result = await session.execute(
+            select(TicketEvent).where(TicketEvent.ticket_id == ticket_id).order_by(_sort_ts, TicketEvent.id)
+        )
+        return [event_dict(row) for row in result.scalars().all()]
+
+
+async def page_ticket_events(
+    db: AsyncSession,
+    sdp_client: SdpClient,
+    ticket_id: str,
+    *,
+    limit: int,
+    before: Optional[Tuple[datetime, int]] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    visibility: Sequence[str] = (),
+    types: Sequence[str] = (),
+    author_types: Sequence[str] = (),
+) -> EventPage:
+    """
+    One window of the history in chronological order.
+
+    Without cursors it is the latest ``limit`` events; ``before`` pages towards
+    older events and ``after`` towards newer ones (keyset on the history order,
+    decoded with ``decode_cursor``). Filters match case-insensitively.
+    ``has_more`` tells whether more events exist in the paging direction.
+    """
+    ticket_id = str(ticket_id)
+    await _sync_if_due(sdp_client, ticket_id)
+
+    stmt = select(TicketEvent).where(TicketEvent.ticket_id == ticket_id)
+    for column, values in (
+        (TicketEvent.visibility, visibility),
+        (TicketEvent.type, types),
+        (TicketEvent.author_type, author_types),
+    ):
+        wanted = [value.strip().lower() for value in values if value and value.strip()]
+        if wanted:
+            stmt = stmt.where(func.lower(column).in_(wanted))
+
+    key = tuple_(_sort_ts, TicketEvent.id)
+    if after is not None:
+        stmt = stmt.where(key > tuple_(literal(after[0]), literal(after[1]))).order_by(_sort_ts, TicketEvent.id)
+    else:
+        if before is not None:
+            stmt = stmt.where(key < tuple_(literal(before[0]), literal(before[1])))
+        stmt = stmt.order_by(_sort_ts.desc(), TicketEvent.id.desc())
+
+    rows = list((await db.execute(stmt.limit(limit + 1))).scalars().all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if after is None:
+        rows.reverse()
+    return EventPage(events=rows, has_more=has_more)
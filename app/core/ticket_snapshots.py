@@ -0,0 +1,404 @@
+"""
+Snapshot local de tickets asignados, refrescado en segundo plano.
+
+``list_tickets`` lee de ``ticket_snapshots`` + ``ticket_flags`` en lugar de
+llamar al gateway en cada carga. Un worker sincroniza a cada técnico con una
+cadencia que depende de cuándo abrió la lista por última vez
+(``technician_sync_state.last_requested_at``): activo → cada pocos segundos,
+inactivo → cada varios minutos, dormido → no se sincroniza hasta que vuelva.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.sdp_client import SdpClient, get_sdp_client
+from app.db.session import SessionLocal
+from app.db.ticket_flags import upsert_ticket_flags
+from app.models.ticket_flags import TicketFlags
+from app.models.ticket_snapshots import TechnicianSyncState, TicketSnapshot
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    # Try ISO first
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.astimezone(timezone.utc)
+    except Exception:
+        return None
+
+
+def select_sla_hours(service_code: Optional[str], priority: Optional[str], comm_default: float) -> float:
+    # Placeholder: service_code is not available from gateway today.
+    # Return default SLA for now.
+    return comm_default
+
+
+def _communication(
+    last_contact_dt: Optional[datetime], comm_sla: Optional[float], now: datetime
+) -> Tuple[Optional[float], bool]:
+    """Hours since the last user contact and whether it breaches the communication SLA."""
+    if last_contact_dt is None:
+        return None, False
+    hours_since = (now - last_contact_dt).total_seconds() / 3600
+    return hours_since, comm_sla is not None and hours_since >= comm_sla
+
+
+def build_ticket_rows(tickets: Sequence[Dict[str, Any]], now: datetime) -> Tuple[List[dict], List[dict]]:
+    """Turn gateway /request/assigned items into (ticket_flags rows, TicketItem data)."""
+    comm_default = settings.comm_sla_default_hours
+    flag_rows: List[dict] = []
+    items_data: List[dict] = []
+
+    for t in tickets:
+        service_code = t.get("service_code")
+        if service_code is not None:
+            service_code = str(service_code)
+        # El gateway expone la última comunicación como last_user_contact_at (alias de last_public_reply_time).
+        last_contact_dt = parse_datetime(t.get("last_user_contact_at") or t.get("last_public_reply_time"))
+        comm_sla = select_sla_hours(t.get("service_code"), t.get("priority"), comm_default)
+        hours_since, is_silent = _communication(last_contact_dt, comm_sla, now)
+
+        flag_rows.append(
+            {
+                "ticket_id": str(t.get("id")),
+                "display_id": t.get("display_id"),
+                "service_code": service_code,
+                "status": t.get("status"),
+                "priority": t.get("priority"),
+                "last_user_contact_at": last_contact_dt,
+                "hours_since_last_user_contact": hours_since,
+                "communication_sla_hours": comm_sla,
+                "is_silent": is_silent,
+            }
+        )
+        items_data.append(
+            dict(
+                id=str(t.get("id")),
+                display_id=str(t.get("display_id") or t.get("id")),
+                subject=t.get("subject"),
+                requester=t.get("requester"),
+                status=t.get("status"),
+                priority=t.get("priority"),
+                service_code=service_code,
+                last_user_contact_at=last_contact_dt,
+                hours_since_last_user_contact=hours_since,
+                communication_sla_hours=comm_sla,
+                is_silent=is_silent,
+            )
+        )
+    return flag_rows, items_data
+
+
+def is_gateway_failure(exc: BaseException) -> bool:
+    """True for gateway outages/timeouts (served from the snapshot), not for our own errors."""
+    if isinstance(exc, HTTPException):
+        return exc.status_code >= 500
+    return isinstance(exc, (httpx.HTTPError, asyncio.TimeoutError))
+
+
+async def sync_technician(
+    db: AsyncSession, sdp_client: SdpClient, technician_id: str, *, timeout: Optional[float] = None
+) -> Tuple[List[dict], datetime]:
+    """
+    Fetch the technician's assigned tickets and store them (flags + snapshot).
+
+    Tickets no longer assigned to the technician leave its snapshot. Returns the
+    TicketItem data (with ``experience_review_requested``) and the sync time.
+    Gateway errors (and ``asyncio.TimeoutError`` past ``timeout``) propagate
+    before anything is written. Does not commit.
+    """
+    fetch = sdp_client.get_assigned_requests(technician_id)
+    tickets = await (asyncio.wait_for(fetch, timeout=timeout) if timeout else fetch)
+    now = datetime.now(tz=timezone.utc)
+    flag_rows, items_data = build_ticket_rows(tickets, now)
+
+    # Upsert ticket_flags en una sola sentencia; devuelve el flag de review almacenado.
+    review_flags = await upsert_ticket_flags(db, flag_rows)
+    for data in items_data:
+        data["experience_review_requested"] = review_flags.get(data["id"], False)
+
+    snapshot_rows: Dict[str, dict] = {}
+    for position, data in enumerate(items_data):
+        snapshot_rows.setdefault(
+            data["id"],
+            {
+                "ticket_id": data["id"],
+                "technician_id": str(technician_id),
+                "subject": data["subject"],
+                "requester": data["requester"] if isinstance(data["requester"], dict) else None,
+                "position": position,
+                "synced_at": now,
+            },
+        )
+    if snapshot_rows:
+        stmt = insert(TicketSnapshot).values(list(snapshot_rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TicketSnapshot.ticket_id],
+            set_={col: stmt.excluded[col] for col in ("technician_id", "subject", "requester", "position", "synced_at")},
+        )
+        await db.execute(stmt)
+    await db.execute(
+        delete(TicketSnapshot).where(
+            TicketSnapshot.technician_id == str(technician_id),
+            TicketSnapshot.ticket_id.notin_(list(snapshot_rows)),
+        )
+    )
+    await _record_sync(db, str(technician_id), synced_at=now, ticket_count=len(snapshot_rows))
+    return items_data, now
+
+
+async def load_snapshot(db: AsyncSession, technician_id: str) -> Optional[Tuple[List[dict], datetime]]:
+    """
+    Read the technician's snapshot as TicketItem data plus its sync time.
+
+    Hours since last contact and ``is_silent`` are recomputed against the
+    current time. Returns None when the technician was never synced.
+    """
+    synced_at = (
+        await db.execute(
+            select(TechnicianSyncState.last_synced_at).where(TechnicianSyncState.technician_id == str(technician_id))
+        )
+    ).scalar_one_or_none()
+    if synced_at is None:
+        return None
+
+    result = await db.execute(
+        select(TicketSnapshot, TicketFlags)
+        .outerjoin(TicketFlags, TicketFlags.ticket_id == TicketSnapshot.ticket_id)
+        .where(TicketSnapshot.technician_id == str(technician_id))
+        .order_by(TicketSnapshot.position)
+    )
+    now = datetime.now(tz=timezone.utc)
+    comm_default = settings.comm_sla_default_hours
+    items_data: List[dict] = []
+    for snapshot, flags in result.all():
+        comm_sla = float(flags.communication_sla_hours) if flags and flags.communication_sla_hours is not None else comm_default
+        last_contact_dt = flags.last_user_contact_at if flags else None
+        hours_since, is_silent = _communication(last_contact_dt, comm_sla, now)
+        items_data.append(
+            dict(
+                id=snapshot.ticket_id,
+                display_id=(flags.display_id if flags and flags.display_id else None) or snapshot.ticket_id,
+                subject=snapshot.subject,
+                requester=snapshot.requester,
+                status=flags.status if flags else None,
+                priority=flags.priority if flags else None,
+                service_code=flags.service_code if flags else None,
+                last_user_contact_at=last_contact_dt,
+                hours_since_last_user_contact=hours_since,
+                communication_sla_hours=comm_sla,
+                is_silent=is_silent,
+                experience_review_requested=bool(flags.experience_review_requested) if flags else False,
+            )
+        )
+    return items_data, synced_at
+
+
+_refreshing: Dict[str, "asyncio.Task[None]"] = {}
+
+
+async def _refresh(technician_id: str) -> None:
+    async with SessionLocal() as session:
+        try:
+            await sync_technician(
+                session, get_sdp_client(), technician_id, timeout=settings.ticket_list_gateway_timeout_seconds
+            )
+            await session.commit()
+            return
+        except Exception as exc:
+            await session.rollback()
+            error = str(getattr(exc, "detail", None) or exc) or type(exc).__name__
+        try:
+            await _record_sync(session, technician_id, error=error)
+            await session.commit()
+        except Exception:  # pragma: no cover - BD caída: el sync en background lo vuelve a intentar
+            pass
+
+
+def refresh_in_background(technician_id: str) -> None:
+    """Revalidate the technician's snapshot without waiting (one refresh per technician at a time)."""
+    technician_id = str(technician_id)
+    if technician_id in _refreshing:
+        return
+    task = asyncio.get_running_loop().create_task(_refresh(technician_id))
+    _refreshing[technician_id] = task
+    task.add_done_callback(lambda t, tid=technician_id: _refreshing.pop(tid, None))
+
+
+def sync_interval_seconds(idle_seconds: float) -> Optional[float]:
+    """Seconds until the next sync given how long ago the technician opened the list (None = dormant)."""
+    if idle_seconds <= settings.ticket_sync_active_window_seconds:
+        return settings.ticket_sync_active_interval_seconds
+    if idle_seconds <= settings.ticket_sync_warm_window_seconds:
+        return settings.ticket_sync_warm_interval_seconds
+    if idle_seconds <= settings.ticket_sync_dormant_after_seconds:
+        return settings.ticket_sync_idle_interval_seconds
+    return None
+
+
+async def touch_activity(db: AsyncSession, technician_id: str, user_upn: Optional[str]) -> None:
+    """
+    Record that the technician opened the list: registers it for background sync
+    and pulls its next sync forward to the active cadence. Does not commit.
+    """
+    now = datetime.now(tz=timezone.utc)
+    next_sync_at = now + timedelta(seconds=settings.ticket_sync_active_interval_seconds)
+    stmt = insert(TechnicianSyncState).values(
+        technician_id=str(technician_id), user_upn=user_upn, last_requested_at=now, next_sync_at=now
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TechnicianSyncState.technician_id],
+        set_={
+            "user_upn": stmt.excluded.user_upn,
+            "last_requested_at": now,
+            "next_sync_at": func.least(TechnicianSyncState.next_sync_at, next_sync_at),
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(stmt)
+
+
+async def _record_sync(
+    db: AsyncSession,
+    technician_id: str,
+    *,
+    synced_at: Optional[datetime] = None,
+    ticket_count: Optional[int] = None,
+    error: Optional[str] = None,
+    next_sync_at: Optional[datetime] = None,
+) -> None:
+    values: Dict[str, Any] = {"last_error": error, "updated_at": func.now()}
+    if synced_at is not None:
+        values["last_synced_at"] = synced_at
+    if ticket_count is not None:
+        values["ticket_count"] = ticket_count
+    if next_sync_at is not None:
+        values["next_sync_at"] = next_sync_at
+    await db.execute(
+        update(TechnicianSyncState).where(TechnicianSyncState.technician_id == technician_id).values(**values)
+    )
+
+
+class TicketSyncWorker:
+    """
+    Refreshes the snapshots of technicians whose ``next_sync_at`` is due.
+
+    Due rows are claimed with FOR UPDATE SKIP LOCKED and their ``next_sync_at``
+    pushed forward by a lease, so several instances share the work and a crash
+    mid-sync only delays that technician. Each sync then schedules the next one
+    from ``sync_interval_seconds``; dormant technicians are skipped.
+    """
+
+    name = "ticket-sync-worker"
+
+    def __init__(self, *, tick_seconds: float, batch_size: int, concurrency: int, lease_seconds: float = 120.0) -> None:
+        self.tick_seconds = tick_seconds
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self._stopping = False
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.synced = 0
+        self.errors = 0
+
+    async def _claim(self) -> List[Tuple[str, datetime]]:
+        now = datetime.now(tz=timezone.utc)
+        dormant_cutoff = now - timedelta(seconds=settings.ticket_sync_dormant_after_seconds)
+        async with SessionLocal() as session:
+            result = await session.execute(
+                select(TechnicianSyncState)
+                .where(
+                    TechnicianSyncState.next_sync_at <= func.now(),
+                    TechnicianSyncState.last_requested_at > dormant_cutoff,
+                )
+                .order_by(TechnicianSyncState.next_sync_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            claimed: List[Tuple[str, datetime]] = []
+            for row in result.scalars().all():
+                row.next_sync_at = now + timedelta(seconds=self.lease_seconds)
+                claimed.append((row.technician_id, row.last_requested_at))
+            await session.commit()
+        return claimed
+
+    async def _sync_one(self, technician_id: str, last_requested_at: datetime, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            async with SessionLocal() as session:
+                try:
+                    await sync_technician(session, get_sdp_client(), technician_id)
+                    error = None
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    await session.rollback()
+                    error = str(getattr(exc, "detail", None) or exc) or type(exc).__name__
+                now = datetime.now(tz=timezone.utc)
+                interval = sync_interval_seconds((now - last_requested_at).total_seconds())
+                next_sync_at = now + timedelta(seconds=interval or settings.ticket_sync_idle_interval_seconds)
+                await _record_sync(session, technician_id, error=error, next_sync_at=next_sync_at)
+                await session.commit()
+        if error is None:
+            self.synced += 1
+        else:
+            self.errors += 1
+
+    async def sync_due(self) -> int:
+        """Claim due technicians and sync them. Returns how many were claimed."""
+        claimed = await self._claim()
+        if claimed:
+            semaphore = asyncio.Semaphore(max(self.concurrency, 1))
+            await asyncio.gather(
+                *(self._sync_one(tid, requested_at, semaphore) for tid, requested_at in claimed),
+                return_exceptions=True,
+            )
+        return len(claimed)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                claimed = await self.sync_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - BD caída: reintentar en el próximo ciclo
+                claimed = 0
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.tick_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Let in-flight syncs finish (up to ``timeout``), then cancel."""
+        if self._task is None:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"synced": self.synced, "errors": self.errors}
+
+
+ticket_sync_worker = TicketSyncWorker(
+    tick_seconds=settings.ticket_sync_tick_seconds,
+    batch_size=settings.ticket_sync_batch_size,
+    concurrency=settings.ticket_sync_concurrency,
+)
@@ -0,0 +1,85 @@
+"""Postgres LISTEN/NOTIFY listener for cross-instance cache invalidation."""
+
+import asyncio
+from collections.abc import Callable
+from typing import Dict, List, Optional
+
+from app.db.session import engine
+
+NotifyHandler = Callable[[str], None]
+# Se llama tras (re)conectar: pudimos perder notificaciones mientras no escuchábamos.
+ResetHandler = Callable[[], None]
+
+
+class NotifyListener:
+    """
+    Keeps one dedicated connection LISTENing on registered channels.
+
+    Handlers receive the NOTIFY payload and must be cheap and synchronous
+    (typically dropping cache entries). On connection loss the listener
+    reconnects with backoff and calls every reset handler.
+    """
+
+    def __init__(self, reconnect_delay: float = 2.0, max_reconnect_delay: float = 60.0) -> None:
+        self._handlers: Dict[str, List[NotifyHandler]] = {}
+        self._reset_handlers: List[ResetHandler] = []
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+        self.connected = False
+
+    def subscribe(self, channel: str, handler: NotifyHandler, on_reset: Optional[ResetHandler] = None) -> None:
+        handlers = self._handlers.setdefault(channel, [])
+        if handler not in handlers:
+            handlers.append(handler)
+        if on_reset is not None and on_reset not in self._reset_handlers:
+            self._reset_handlers.append(on_reset)
+
+    def _dispatch(self, connection, pid, channel: str, payload: str) -> None:  # noqa: ANN001 - firma de asyncpg
+        for handler in self._handlers.get(channel, []):
+            handler(payload or "")
+
+    def _reset_all(self) -> None:
+        for handler in self._reset_handlers:
+            handler()
+
+    async def _run(self) -> None:
+        delay = self._reconnect_delay
+        while True:
+            try:
+                async with engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    driver_conn = raw.driver_connection
+                    closed = asyncio.Event()
+                    driver_conn.add_termination_listener(lambda _c: closed.set())
+                    for channel in self._handlers:
+                        await driver_conn.add_listener(channel, self._dispatch)
+                    self.connected = True
+                    self._reset_all()
+                    delay = self._reconnect_delay
+                    await closed.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - reconexión ante caídas de red/DB
+                pass
+            finally:
+                self.connected = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self._max_reconnect_delay)
+
+    def start(self) -> None:
+        if self._task is None and self._handlers:
+            self._task = asyncio.create_task(self._run(), name="pg-notify-listener")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+notify_listener = NotifyListener()
@@ -0,0 +1,48 @@
+"""Set-based persistence helpers for ticket_flags."""
+
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.ticket_flags import TicketFlags
+
+# asyncpg admite hasta 32767 parámetros por sentencia; partimos en lotes holgados.
+_UPSERT_CHUNK_SIZE = 1000
+
+
+async def upsert_ticket_flags(db: AsyncSession, rows: Sequence[Dict[str, Any]]) -> Dict[str, bool]:
+    """
+    Insert or update many ticket_flags rows with one INSERT ... ON CONFLICT per chunk.
+
+    Every row must carry ``ticket_id`` and the same set of columns; only those
+    columns are overwritten on conflict. Returns ``{ticket_id: experience_review_requested}``
+    as stored after the upsert. Does not commit.
+    """
+    if not rows:
+        return {}
+    columns = list(rows[0].keys())
+    if "ticket_id" not in columns:
+        raise ValueError("ticket_id_required")
+
+    # ON CONFLICT no puede tocar la misma fila dos veces en una sentencia: gana la última.
+    deduped: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        deduped[str(row["ticket_id"])] = {**row, "ticket_id": str(row["ticket_id"])}
+    values: List[Dict[str, Any]] = list(deduped.values())
+
+    review_flags: Dict[str, bool] = {}
+    for start in range(0, len(values), _UPSERT_CHUNK_SIZE):
+        chunk = values[start : start + _UPSERT_CHUNK_SIZE]
+        stmt = insert(TicketFlags).values(chunk)
+        update_cols = {col: stmt.excluded[col] for col in columns if col != "ticket_id"}
+        update_cols["updated_at"] = func.now()
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TicketFlags.ticket_id],
+            set_=update_cols,
+        ).returning(TicketFlags.ticket_id, TicketFlags.experience_review_requested)
+        result = await db.execute(stmt)
+        for ticket_id, requested in result.all():
+            review_flags[ticket_id] = bool(requested)
+    return review_flags
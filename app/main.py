@@ -1,16 +1,97 @@
 """FastAPI entrypoint for Criteria ServiceDesk Copilot API."""
 
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.api.admin import router as admin_router
 from app.api.health import router as health_router
 from app.api.ia import router as ia_router
 from app.api.me import router as me_router
 from app.api.tickets import router as tickets_router
 from app.api.experience import router as experience_router
+from app.core.cache import shared_cache
 from app.core.config import settings
+from app.core.config_store import CONFIG_CHANNEL, config_store
+from app.core.conversation_clean import conversation_cleaner
+from app.core.email_client import close_mail_http_client
+from app.core.ia_client import reset_ia_client, start_ia_client
+from app.core.ia_log_sink import ia_log_sink
+from app.core.ia_quota import ia_quota_tracker
+from app.core.ia_usage import ia_usage_maintainer
+from app.core.mail_outbox import mail_outbox_worker
+from app.core.note_outbox import note_outbox_worker
+from app.core.prompt_budget import load_encoder
+from app.core.review_invitations import review_invitation_runner
+from app.core.sdp_client import close_http_client, start_http_client
+from app.core.smtp_pool import close_smtp_pools
+from app.core.technicians import TECHNICIAN_MAPPING_CHANNEL, technician_directory
+from app.core.ticket_snapshots import ticket_sync_worker
+from app.db.notify import notify_listener
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Open shared outbound clients on startup and close them on shutdown."""
+    await start_http_client()
+    await start_ia_client()
+    ia_log_sink.start()
+    conversation_cleaner.start()
+    await asyncio.to_thread(load_encoder)
+    if settings.db_notify_listener_enabled:
+        notify_listener.subscribe(
+            TECHNICIAN_MAPPING_CHANNEL,
+            technician_directory.invalidate,
+            on_reset=technician_directory.clear,
+        )
+        notify_listener.subscribe(CONFIG_CHANNEL, config_store.invalidate, on_reset=config_store.invalidate)
+        notify_listener.start()
+    config_store.start_polling(lambda: notify_listener.connected)
+    try:
+        await asyncio.wait_for(config_store.reload(), timeout=10)
+    except Exception:  # pragma: no cover - sin DB al arrancar: se carga en el primer uso
+        pass
+    if shared_cache is not None:
+        shared_cache.start_sweeper()
+    if settings.mail_outbox_enabled:
+        mail_outbox_worker.start()
+    if settings.note_outbox_enabled:
+        note_outbox_worker.start()
+    if settings.ticket_sync_enabled:
+        ticket_sync_worker.start()
+    if settings.ia_usage_maintenance_enabled:
+        ia_usage_maintainer.start()
+    if settings.review_invitations_enabled:
+        try:
+            # Jobs de invitaciones interrumpidos (caída/redeploy) se reanudan desde su progreso persistido.
+            await asyncio.wait_for(review_invitation_runner.resume_pending(), timeout=10)
+        except Exception:  # pragma: no cover - sin DB al arrancar
+            pass
+    try:
+        yield
+    finally:
+        await review_invitation_runner.stop()
+        await mail_outbox_worker.stop()
+        await note_outbox_worker.stop()
+        await ticket_sync_worker.stop()
+        await ia_usage_maintainer.stop()
+        await close_mail_http_client()
+        await asyncio.to_thread(close_smtp_pools)
+        conversation_cleaner.shutdown()
+        if shared_cache is not None:
+            await shared_cache.stop_sweeper()
+        await config_store.stop()
+        await notify_listener.stop()
+        await ia_quota_tracker.stop()
+        await ia_log_sink.stop()
+        await reset_ia_client()
+        await close_http_client()
+
 
-app = FastAPI(title="Criteria ServiceDesk Copilot API")
+app = FastAPI(title="Criteria ServiceDesk Copilot API", lifespan=lifespan)
 
 
 @app.get("/", include_in_schema=False)
@@ -33,3 +114,4 @@ app.include_router(me_router)
 app.include_router(tickets_router)
 app.include_router(ia_router)
 app.include_router(experience_router)
+app.include_router(admin_router)
@@ -2,12 +2,19 @@
 
 from app.models.base import Base
 from app.models.ia_logs import IALog
+from app.models.ia_usage import IAQuotaUsage, IAUsageRollup
+from app.models.mail_outbox import MailOutbox
+from app.models.note_outbox import NoteOutbox
 from app.models.org_profile import OrgProfile
 from app.models.persona_config import PersonaConfig
+from app.models.review_invitations import ReviewInvitation, ReviewInvitationJob
 from app.models.services_catalog import ServiceCatalog
 from app.models.settings import Setting
+from app.models.shared_cache import SharedCacheEntry
 from app.models.technician_mapping import TechnicianMapping
+from app.models.ticket_events import TicketEvent, TicketEventSync
 from app.models.ticket_flags import TicketFlags
+from app.models.ticket_snapshots import TechnicianSyncState, TicketSnapshot
 
 __all__ = [
     "Base",
@@ -17,5 +24,16 @@ __all__ = [
     "PersonaConfig",
     "Setting",
     "TicketFlags",
+    "TicketEvent",
+    "TicketEventSync",
+    "TicketSnapshot",
+    "TechnicianSyncState",
     "IALog",
+    "IAUsageRollup",
+    "IAQuotaUsage",
+    "MailOutbox",
+    "NoteOutbox",
+    "SharedCacheEntry",
+    "ReviewInvitationJob",
+    "ReviewInvitation",
 ]
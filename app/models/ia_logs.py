@@ -2,7 +2,7 @@
 
 from datetime import datetime
 
-from sqlalchemy import Boolean, DateTime, Integer, String, Text, func
+from sqlalchemy import Boolean, DateTime, Index, Integer, Numeric, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base
@@ -12,9 +12,16 @@ class IALog(Base):
     """Trace IA operations for observability and audit."""
 
     __tablename__ = "ia_logs"
+    # Particionada por mes sobre timestamp (migración 0013); particiones nuevas/retención en app/core/ia_usage.py.
+    __table_args__ = (
+        Index("ix_ia_logs_timestamp_brin", "timestamp", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    timestamp: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True, nullable=False, server_default=func.now()
+    )
     user_upn: Mapped[str | None] = mapped_column(String, index=True)
     ticket_id: Mapped[str | None] = mapped_column(String, index=True)
     operation: Mapped[str | None] = mapped_column(String)  # generate_reply / interpret_conversation
@@ -22,6 +29,14 @@ class IALog(Base):
     model: Mapped[str | None] = mapped_column(String)
     success: Mapped[bool | None] = mapped_column(Boolean)
     latency_ms: Mapped[int | None] = mapped_column(Integer)
+    ttft_ms: Mapped[int | None] = mapped_column(Integer)  # time-to-first-token (solo streaming)
+    cache_hit: Mapped[bool | None] = mapped_column(Boolean)  # sugerencia servida desde cache, sin llamar al modelo
     prompt_chars: Mapped[int | None] = mapped_column(Integer)
     response_chars: Mapped[int | None] = mapped_column(Integer)
+    prompt_tokens_estimate: Mapped[int | None] = mapped_column(Integer)  # conteo local al armar el prompt
+    prompt_dropped: Mapped[str | None] = mapped_column(Text)  # secciones recortadas/omitidas por presupuesto
+    prompt_tokens: Mapped[int | None] = mapped_column(Integer)
+    completion_tokens: Mapped[int | None] = mapped_column(Integer)
+    cached_tokens: Mapped[int | None] = mapped_column(Integer)  # parte de prompt_tokens servida desde el cache de Azure
+    cost_usd: Mapped[float | None] = mapped_column(Numeric(12, 6))
     error_message: Mapped[str | None] = mapped_column(Text)
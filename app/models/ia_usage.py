@@ -0,0 +1,42 @@
+"""IA usage rollups model."""
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Float, Index, Integer, Numeric, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class IAUsageRollup(Base):
+    """Agregados por hora/día de ia_logs por usuario, operación y modelo ('' = sin valor)."""
+
+    __tablename__ = "ia_usage_rollups"
+    __table_args__ = (Index("ix_ia_usage_rollups_bucket", "granularity", "bucket_start"),)
+
+    granularity: Mapped[str] = mapped_column(String, primary_key=True)  # hour / day
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    user_upn: Mapped[str] = mapped_column(String, primary_key=True)
+    operation: Mapped[str] = mapped_column(String, primary_key=True)
+    model: Mapped[str] = mapped_column(String, primary_key=True)
+    calls: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    errors: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    cache_hits: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    latency_p50_ms: Mapped[float | None] = mapped_column(Float)
+    latency_p95_ms: Mapped[float | None] = mapped_column(Float)
+    prompt_chars: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+    response_chars: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+    prompt_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+    completion_tokens: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+    cost_usd: Mapped[float] = mapped_column(Numeric(14, 6), nullable=False, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class IAQuotaUsage(Base):
+    """Tokens consumidos por minuto y sujeto (user:<upn> / team:<team>) para las cuotas IA."""
+
+    __tablename__ = "ia_quota_usage"
+
+    subject: Mapped[str] = mapped_column(String, primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    tokens: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
@@ -0,0 +1,27 @@
+"""Gateway internal-note outbox model."""
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class NoteOutbox(Base):
+    """Notas internas pendientes de enviar al gateway SDP (write-behind)."""
+
+    __tablename__ = "note_outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    dedup_key: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    ticket_id: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    technician_id: Mapped[str | None] = mapped_column(String)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(String, nullable=False, server_default="pending")  # pending / sending / sent / failed
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error: Mapped[str | None] = mapped_column(Text)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,51 @@
+"""Review invitation job models."""
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class ReviewInvitationJob(Base):
+    """Envío masivo de invitaciones de review; el progreso permite reanudar tras una caída."""
+
+    __tablename__ = "review_invitation_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    status: Mapped[str] = mapped_column(String, nullable=False, server_default="queued")  # queued / running / completed / failed
+    phase: Mapped[str] = mapped_column(String, nullable=False, server_default="discover")  # discover / send
+    requested_by: Mapped[str | None] = mapped_column(String)
+    closed_after: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    closed_before: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    next_page: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+    discovered: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    sent: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    skipped: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    last_error: Mapped[str | None] = mapped_column(Text)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+class ReviewInvitation(Base):
+    """Una invitación por ticket (ticket_id único: nunca se invita dos veces)."""
+
+    __tablename__ = "review_invitations"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    job_id: Mapped[int] = mapped_column(Integer, ForeignKey("review_invitation_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    ticket_id: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    display_id: Mapped[str | None] = mapped_column(String)
+    ticket_subject: Mapped[str | None] = mapped_column(Text)
+    requester_name: Mapped[str | None] = mapped_column(String)
+    email: Mapped[str | None] = mapped_column(String)
+    status: Mapped[str] = mapped_column(String, nullable=False, server_default="pending")  # pending / sent / failed / skipped
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    error: Mapped[str | None] = mapped_column(Text)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
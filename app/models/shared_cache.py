@@ -0,0 +1,22 @@
+"""Shared cache entry model (UNLOGGED table)."""
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, String, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class SharedCacheEntry(Base):
+    """Entrada del tier compartido de cache; tabla UNLOGGED (se pierde en un crash, es solo cache)."""
+
+    __tablename__ = "shared_cache"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    namespace: Mapped[str] = mapped_column(String, primary_key=True)
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    value: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
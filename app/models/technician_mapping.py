@@ -16,6 +16,7 @@ class TechnicianMapping(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     user_upn: Mapped[str] = mapped_column(String, nullable=False, unique=True)
     technician_id_sdp: Mapped[str] = mapped_column(String, nullable=False)
+    team: Mapped[str | None] = mapped_column(String)  # agrupa técnicos para la cuota IA por equipo
     active: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="true")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
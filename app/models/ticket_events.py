@@ -0,0 +1,45 @@
+"""Ticket history events, normalized at ingest."""
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, Text, UniqueConstraint, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class TicketEvent(Base):
+    """Evento del historial de un ticket (conversación, notas, cambios de estado)."""
+
+    __tablename__ = "ticket_events"
+    __table_args__ = (
+        UniqueConstraint("ticket_id", "event_key", name="uq_ticket_events_ticket_event_key"),
+        Index("ix_ticket_events_ticket_occurred", "ticket_id", "occurred_at", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    ticket_id: Mapped[str] = mapped_column(String, nullable=False)
+    # event_id del gateway como texto, o hash del contenido si el gateway no lo envía.
+    event_key: Mapped[str] = mapped_column(String, nullable=False)
+    event_id: Mapped[int | None] = mapped_column(BigInteger)
+    type: Mapped[str | None] = mapped_column(String)
+    author_name: Mapped[str | None] = mapped_column(String)
+    author_type: Mapped[str | None] = mapped_column(String)
+    visibility: Mapped[str | None] = mapped_column(String)  # normalizada en minúsculas (publico / interno)
+    occurred_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    text: Mapped[str | None] = mapped_column(Text)
+    old_value: Mapped[str | None] = mapped_column(Text)
+    new_value: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class TicketEventSync(Base):
+    """Watermark de sincronización del historial por ticket."""
+
+    __tablename__ = "ticket_event_sync"
+
+    ticket_id: Mapped[str] = mapped_column(String, primary_key=True)
+    last_event_id: Mapped[int | None] = mapped_column(BigInteger)
+    last_event_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    event_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    synced_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -0,0 +1,38 @@
+"""Ticket snapshot models (lista de asignados sincronizada en segundo plano)."""
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Index, Integer, String, Text, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class TicketSnapshot(Base):
+    """Último estado conocido de un ticket asignado; los campos de comunicación viven en ticket_flags."""
+
+    __tablename__ = "ticket_snapshots"
+    __table_args__ = (Index("ix_ticket_snapshots_technician_id", "technician_id", "position"),)
+
+    ticket_id: Mapped[str] = mapped_column(String, primary_key=True)
+    technician_id: Mapped[str] = mapped_column(String, nullable=False)
+    subject: Mapped[str | None] = mapped_column(Text)
+    requester: Mapped[dict | None] = mapped_column(JSONB)
+    position: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    synced_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class TechnicianSyncState(Base):
+    """Cadencia de sincronización por técnico, ajustada según su actividad."""
+
+    __tablename__ = "technician_sync_state"
+
+    technician_id: Mapped[str] = mapped_column(String, primary_key=True)
+    user_upn: Mapped[str | None] = mapped_column(String)
+    last_requested_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_synced_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    next_sync_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+    ticket_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    last_error: Mapped[str | None] = mapped_column(Text)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,56 @@
+"""Schemas for admin endpoints."""
+
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class ReviewInvitationJobCreate(BaseModel):
+    closed_after: datetime
+    closed_before: Optional[datetime] = None
+
+
+class ReviewInvitationJobStatus(BaseModel):
+    id: int
+    status: str
+    phase: str
+    requested_by: Optional[str] = None
+    closed_after: datetime
+    closed_before: Optional[datetime] = None
+    next_page: int
+    discovered: int
+    sent: int
+    failed: int
+    skipped: int
+    pending: int = 0
+    last_error: Optional[str] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    created_at: datetime
+    running_here: bool = False
+
+
+class IAUsageRow(BaseModel):
+    bucket_start: datetime
+    user_upn: Optional[str] = None
+    operation: Optional[str] = None
+    model: Optional[str] = None
+    calls: int
+    errors: int
+    error_rate: float
+    cache_hits: int
+    latency_p50_ms: Optional[float] = None
+    latency_p95_ms: Optional[float] = None
+    prompt_chars: int
+    response_chars: int
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+
+
+class IAUsageResponse(BaseModel):
+    granularity: str
+    since: datetime
+    until: datetime
+    rows: List[IAUsageRow]
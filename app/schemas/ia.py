@@ -9,15 +9,19 @@ class GenerateReplyRequest(BaseModel):
     ticket_id: str = Field(..., description="ID del ticket en SDP")
     message_type: Literal["primera_respuesta", "actualizacion", "cierre"] = Field(...)
     draft: Optional[str] = Field(default=None, description="Borrador opcional del técnico")
+    force_regenerate: bool = Field(default=False, description="Ignora la sugerencia cacheada y llama al modelo")
 
 
 class GenerateReplyResponse(BaseModel):
     suggested_message: str
+    cached: bool = False
 
 
 class InterpretConversationRequest(BaseModel):
     ticket_id: str
+    force_regenerate: bool = Field(default=False, description="Ignora la sugerencia cacheada y llama al modelo")
 
 
 class InterpretConversationResponse(BaseModel):
     suggestion: str
+    cached: bool = False
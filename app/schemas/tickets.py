@@ -23,6 +23,10 @@ class TicketItem(BaseModel):
 
 class TicketsResponse(BaseModel):
     tickets: List[TicketItem] = Field(default_factory=list)
+    synced_at: Optional[datetime] = None
+    source: str = "gateway"  # "snapshot" (ticket_snapshots) o "gateway" (consulta en vivo)
+    age_seconds: Optional[float] = None
+    stale: bool = False  # gateway caído o lento: se devuelve el último snapshot aunque esté vencido
 
 
 class ServiceCatalogItem(BaseModel):
@@ -76,6 +80,9 @@ class TicketHistoryEvent(BaseModel):
 
 class TicketHistoryResponse(BaseModel):
     events: List[TicketHistoryEvent] = Field(default_factory=list)
+    has_more: bool = False  # quedan eventos en la dirección paginada
+    before_cursor: Optional[str] = None  # pasar como ?before= para eventos anteriores
+    after_cursor: Optional[str] = None  # pasar como ?after= para eventos posteriores
 
 
 class SendReplyRequest(BaseModel):
@@ -85,3 +92,6 @@ class SendReplyRequest(BaseModel):
 
 class SendReplyResponse(BaseModel):
     ok: bool = True
+    queued: bool = False
+    outbox_id: Optional[int] = None
+    message_id: Optional[str] = None
@@ -0,0 +1,164 @@
+import asyncio
+from concurrent.futures import Executor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.core.conversation_clean import ConversationCleaner, clean_message, drop_near_duplicates
+
+DISCLAIMER = (
+    "AVISO DE CONFIDENCIALIDAD: este mensaje y sus anexos son confidenciales y para uso exclusivo "
+    "del destinatario. Si lo recibió por error, notifique al remitente y elimínelo."
+)
+
+
+def test_html_to_text():
+    html_body = "<html><head><style>p{color:red}</style></head><body><p>Hola&nbsp;equipo</p><p>VPN &amp; correo</p></body></html>"
+    assert clean_message(html_body) == "Hola equipo\nVPN & correo"
+
+
+def test_strips_gmail_quote():
+    text = "Sigue fallando.\n\nOn Mon, Jan 1, 2024 at 10:00 AM Bob <b@x.com> wrote:\n> texto anterior\n> más"
+    assert clean_message(text) == "Sigue fallando."
+
+
+def test_strips_outlook_quote():
+    text = "Ya reinicié el equipo.\n\nDe: Mesa de ayuda\nEnviado: lunes\nPara: Juan\nAsunto: RE: VPN\n\nTexto previo"
+    assert clean_message(text) == "Ya reinicié el equipo."
+
+
+def test_keeps_message_that_is_only_a_forward():
+    text = "---------- Forwarded message ---------\nDe: x\nsolo reenvío"
+    assert clean_message(text) == text
+
+
+def test_strips_quoted_lines():
+    assert clean_message("Respuesta\n> citado\n> citado 2\nfin") == "Respuesta\nfin"
+
+
+def test_strips_signature_after_closing():
+    text = "El problema persiste.\n\nSaludos,\nJuan Pérez\nAnalista\nTel 123"
+    assert clean_message(text) == "El problema persiste."
+
+
+def test_keeps_closing_word_followed_by_long_content():
+    body = "\n".join(f"paso {i}" for i in range(15))
+    text = f"Saludos\n{body}"
+    assert clean_message(text) == text
+
+
+def test_strips_mobile_signature():
+    assert clean_message("Listo, gracias\n\nEnviado desde mi iPhone") == "Listo, gracias"
+
+
+def test_strips_external_banner():
+    text = "[EXTERNAL]: This email originated from outside the organization.\nNo tengo acceso al ERP."
+    assert clean_message(text) == "No tengo acceso al ERP."
+
+
+def test_strips_trailing_disclaimer():
+    assert clean_message(f"No funciona la impresora.\n\n{DISCLAIMER}") == "No funciona la impresora."
+
+
+def test_strips_short_trailing_disclaimer():
+    assert clean_message("Adjunto el log.\n\nDisclaimer: confidential.") == "Adjunto el log."
+
+
+def test_strips_long_leading_disclaimer_in_the_middle():
+    text = f"Primer párrafo.\n\n{DISCLAIMER}\n\nÚltimo párrafo con el detalle."
+    assert clean_message(text) == "Primer párrafo.\n\nÚltimo párrafo con el detalle."
+
+
+def test_keeps_content_that_mentions_disclaimer_words():
+    text = "Antes de imprimir el documento aparece un error.\n\nEl aviso legal del portal no carga."
+    assert clean_message(text) == text
+
+
+def test_keeps_short_boilerplate_mention_in_the_middle():
+    text = "El disclaimer del formulario no se muestra.\n\nPasa en Chrome y Edge."
+    assert clean_message(text) == text
+
+
+def test_never_drops_the_first_paragraph_as_trailing():
+    assert clean_message("Disclaimer: el texto del pie no aparece") == "Disclaimer: el texto del pie no aparece"
+
+
+def test_collapses_whitespace():
+    assert clean_message("  hola   mundo \r\n\r\n\r\n\r\n  chau\t\t ") == "hola mundo\n\nchau"
+
+
+def test_empty_values():
+    assert clean_message(None) is None
+    assert clean_message("   ") is None
+
+
+def _ev(text):
+    return {"text": text}
+
+
+def test_drop_near_duplicates_removes_repeated_message():
+    base = "El usuario reporta que la VPN no conecta desde su casa desde ayer por la tarde"
+    events = [_ev(base), _ev("Respuesta distinta del técnico con otros pasos a seguir hoy"), _ev(base + ".")]
+    assert drop_near_duplicates(events) == events[:2]
+
+
+def test_drop_near_duplicates_keeps_different_messages():
+    events = [
+        _ev("El usuario reporta que la VPN no conecta desde su casa desde ayer por la tarde"),
+        _ev("El usuario reporta que la impresora del piso tres no imprime desde ayer por la tarde"),
+    ]
+    assert drop_near_duplicates(events) == events
+
+
+def test_drop_near_duplicates_ignores_short_texts_and_empty_events():
+    events = [_ev("ok"), _ev("ok"), _ev(None), _ev(None), _ev("gracias"), _ev("gracias")]
+    assert drop_near_duplicates(events) == events
+
+
+def test_drop_near_duplicates_only_compares_recent_window():
+    base = "Mensaje repetido lo bastante largo para compararse con los anteriores del ticket"
+    fillers = [_ev(f"Mensaje de relleno número {i} con contenido propio y diferente al resto") for i in range(20)]
+    events = [_ev(base), *fillers, _ev(base)]
+    assert drop_near_duplicates(events) == events
+
+
+def test_strips_long_trailing_paragraph_mentioning_boilerplate():
+    text = "Reinicié el servicio.\n\nPor favor tenga en cuenta que " + DISCLAIMER[len("AVISO DE CONFIDENCIALIDAD: "):]
+    assert clean_message(text) == "Reinicié el servicio."
+
+
+class _FailingPool(Executor):
+    def __init__(self, exc: Exception) -> None:
+        self.exc = exc
+
+    def submit(self, fn, /, *args, **kwargs):
+        raise self.exc
+
+
+def _cleaner_with_pool(monkeypatch, exc: Exception) -> ConversationCleaner:
+    cleaner = ConversationCleaner(max_entries=10, offload_chars=10, workers=2)
+    cleaner._pool = _FailingPool(exc)
+    monkeypatch.setattr(cleaner, "start", lambda: None)
+    return cleaner
+
+
+def test_clean_history_memoizes():
+    cleaner = ConversationCleaner(max_entries=10, offload_chars=10_000, workers=0)
+    events = [{"text": "<p>Hola</p>"}, {"text": "<p>Hola</p>"}, {"text": None}]
+    assert asyncio.run(cleaner.clean_history(events)) == [{"text": "Hola"}, {"text": "Hola"}, {"text": None}]
+    asyncio.run(cleaner.clean_history(events[:1]))
+    assert (cleaner.misses, cleaner.hits) == (1, 1)
+
+
+def test_broken_pool_is_rebuilt_and_batch_cleaned_in_thread(monkeypatch):
+    cleaner = _cleaner_with_pool(monkeypatch, BrokenProcessPool("worker died"))
+    assert asyncio.run(cleaner.clean_history([{"text": "<b>texto largo</b>"}])) == [{"text": "texto largo"}]
+    assert cleaner._pool is None  # shutdown(); start() parcheado
+
+
+def test_cleaning_errors_propagate_without_rebuilding_pool(monkeypatch):
+    cleaner = _cleaner_with_pool(monkeypatch, ValueError("bug"))
+    pool = cleaner._pool
+    with pytest.raises(ValueError):
+        asyncio.run(cleaner.clean_history([{"text": "texto largo"}]))
+    assert cleaner._pool is pool
@@ -0,0 +1,105 @@
+import pytest
+
+from app.core import prompt_budget
+from app.core.prompt_budget import PromptPacker, count_tokens, truncate_text
+
+
+@pytest.fixture(autouse=True)
+def approximate_tokens(monkeypatch):
+    # Conteo aproximado (~4 caracteres por token) con o sin tiktoken instalado.
+    monkeypatch.setattr(prompt_budget, "_encoder", None)
+    monkeypatch.setattr(prompt_budget, "_encoder_loaded", True)
+
+
+def _log(lines: int) -> str:
+    return "\n".join(f"linea {i:04d} del log pegado por el usuario" for i in range(lines))
+
+
+def test_truncate_keeps_short_text():
+    text = "El usuario no puede ingresar al VPN."
+    assert truncate_text(text, 100) == text
+
+
+def test_truncate_zero_budget():
+    assert truncate_text(_log(10), 0) == ""
+
+
+def test_truncate_keeps_head_and_tail_around_marker():
+    text = _log(200)
+    result = truncate_text(text, 200)
+    assert "caracteres omitidos" in result
+    assert result.startswith("linea 0000 ")
+    assert result.endswith("linea 0199 del log pegado por el usuario")
+    assert count_tokens(result) <= 200
+    head, tail = result.split("[…")
+    assert len(head) > len(tail.split("…]")[1])  # el inicio se lleva la mayor parte
+
+
+def test_truncate_marker_counts_omitted_chars():
+    text = _log(200)
+    result = truncate_text(text, 200)
+    omitted = int(result.split("[… ")[1].split(" ")[0])
+    kept = len(result) - len(result[result.index("\n[…") : result.index("…]\n") + 3])
+    assert kept + omitted == len(text)
+
+
+def test_text_within_budget_is_unchanged():
+    packer = PromptPacker(budget=1000, max_item_tokens=500)
+    value = "Descripción corta del ticket."
+    assert packer.text("descripcion", value) == value
+    assert packer.used == count_tokens(value)
+    assert packer.report() is None
+
+
+def test_text_truncated_to_item_cap():
+    packer = PromptPacker(budget=10000, max_item_tokens=100)
+    packed = packer.text("descripcion", _log(100))
+    assert count_tokens(packed) <= 100
+    assert packer.dropped == {"descripcion": "truncada"}
+
+
+def test_text_dropped_when_budget_exhausted():
+    packer = PromptPacker(budget=100, max_item_tokens=100, min_item_tokens=24)
+    packer.reserve("x" * 320)  # 80 tokens: quedan 20 < 24
+    assert packer.text("notas", "nota interna") == ""
+    assert packer.report() == "notas: omitida"
+
+
+def test_text_empty_value_is_not_reported():
+    packer = PromptPacker(budget=0, max_item_tokens=100)
+    assert packer.text("descripcion", None) == ""
+    assert packer.report() is None
+
+
+def test_items_keep_newest_in_chronological_order():
+    packer = PromptPacker(budget=10000, max_item_tokens=100)
+    values = [f"mensaje {i}" for i in range(5)]
+    assert packer.items("historial", values, limit=3) == ["mensaje 2", "mensaje 3", "mensaje 4"]
+    assert packer.report() is None
+
+
+def test_items_stop_when_budget_exhausted():
+    value = "m" * 200  # 50 tokens
+    packer = PromptPacker(budget=130, max_item_tokens=100, min_item_tokens=24)
+    packed = packer.items("historial", [f"{i}{value}" for i in range(5)])
+    # 50 + 50 y luego 30 (truncado); lo que queda (0) no alcanza para más.
+    assert len(packed) == 3
+    assert packed[-1].startswith("4")
+    assert packer.remaining < packer.min_item_tokens
+    assert packer.report() == "historial: 2 omitidos, 1 truncados"
+
+
+def test_items_truncated_to_item_cap():
+    packer = PromptPacker(budget=10000, max_item_tokens=50)
+    packed = packer.items("historial", [_log(50), "respuesta corta"])
+    assert packed[1] == "respuesta corta"
+    assert "caracteres omitidos" in packed[0]
+    assert count_tokens(packed[0]) <= 50
+    assert packer.dropped == {"historial": "1 truncados"}
+
+
+def test_report_joins_sections():
+    packer = PromptPacker(budget=40, max_item_tokens=30, min_item_tokens=24)
+    packer.text("descripcion", _log(20))
+    packer.items("historial", ["hola", "chau"])
+    assert packer.report() == "descripcion: truncada; historial: 2 omitidos"
@@ -109,6 +109,62 @@ export async function generateIaReply(params: {
   return data;
 }
 
+export async function streamIaReply(
+  params: {
+    ticketId: string;
+    messageType: string;
+    draft: string;
+    close_status?: string;
+  },
+  onToken: (text: string) => void
+): Promise<IaSuggestionResponse> {
+  const resp = await fetch(`${baseURL}/api/ia/generate_reply/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Accept: "text/event-stream",
+      ...(authToken ? { Authorization: `Bearer ${authToken}` } : {})
+    },
+    body: JSON.stringify({
+      ticket_id: params.ticketId,
+      message_type: params.messageType,
+      draft: params.draft,
+      close_status: params.close_status
+    })
+  });
+  if (!resp.ok || !resp.body) {
+    throw new Error(`ia_stream_failed (status=${resp.status})`);
+  }
+
+  const reader = resp.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let message = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep: number;
+    while ((sep = buffer.indexOf("\n\n")) >= 0) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      const event = /^event: (.*)$/m.exec(raw)?.[1];
+      const data = /^data: (.*)$/m.exec(raw)?.[1];
+      if (!event || !data) continue;
+      const payload = JSON.parse(data);
+      if (event === "token") {
+        message += payload.text;
+        onToken(message);
+      } else if (event === "done") {
+        message = payload.suggested_message;
+      } else if (event === "error") {
+        throw new Error(payload.detail);
+      }
+    }
+  }
+  return { suggested_message: message };
+}
+
 export async function interpretConversation(ticketId: string): Promise<{ suggestion: string }> {
   const { data } = await client.post<{ suggestion: string }>(
     `/api/ia/interpret_conversation`,
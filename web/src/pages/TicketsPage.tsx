@@ -5,9 +5,9 @@ import {
   fetchTicketDetail,
   fetchTicketHistory,
   fetchTickets,
-  generateIaReply,
   interpretConversation,
   sendReply,
+  streamIaReply,
   Ticket,
   TicketDetail,
   HistoryEvent
@@ -53,12 +53,18 @@ export default function TicketsPage() {
 
   const iaMutation = useMutation({
     mutationFn: () =>
-      generateIaReply({
-        ticketId: selectedId || "",
-        messageType,
-        draft,
-        close_status: messageType === "cierre" ? closeStatus : undefined
-      }),
+      streamIaReply(
+        {
+          ticketId: selectedId || "",
+          messageType,
+          draft,
+          close_status: messageType === "cierre" ? closeStatus : undefined
+        },
+        (partial) => {
+          setSuggested(partial);
+          setReplyMessage(partial);
+        }
+      ),
     onSuccess: (data) => {
       setSuggested(data.suggested_message);
       setReplyMessage(data.suggested_message);